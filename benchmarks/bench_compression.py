@@ -0,0 +1,86 @@
+"""캐시에 든 목록/상세 응답을 압축하지 않을 때, 요청마다 압축할 때, 압축해 저장해 둔 본문을 쓸 때 비교
+
+응답 본문 크기(전송 바이트)와 요청 하나의 CPU 시간(process_time)을 잰다. 요청마다 압축하는 경우는
+GZipMiddleware 와 같은 django.utils.text.compress_string 을 쓴다.
+
+    $ python -m benchmarks.bench_compression --items 20000
+"""
+import argparse
+import time
+from benchmarks import common
+
+
+REQUEST_PATHS = (
+    ('products', '/products/?skin_type=oily'),
+    ('products', '/products/?skin_type=dry&category=skincare&page=3'),
+    ('product', '/product/7?skin_type=oily'),
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    options = parser.parse_args()
+
+    common.setup()
+
+    from django.test import RequestFactory
+    from django.utils.text import compress_string
+    from myapp.home.cache import ENCODERS
+    from myapp.home.views import product, products
+
+    factory = RequestFactory()
+
+    old_name = common.create_database()
+    try:
+        common.populate(options.items)
+        results = []
+
+        for view_name, path in REQUEST_PATHS:
+            if view_name == 'product':
+                def view(request) -> 'HttpResponse':
+                    return product(request, item_id=7)
+            else:
+                view = products
+
+            def run_identity() -> int:
+                return len(view(factory.get(path)).content)
+
+            def run_per_request() -> int:
+                return len(compress_string(view(factory.get(path)).content))
+
+            cases = [('identity', run_identity), ('gzip_per_request', run_per_request)]
+            for encoding in ENCODERS:
+                def run_stored(encoding=encoding) -> int:
+                    return len(view(factory.get(path, HTTP_ACCEPT_ENCODING=encoding)).content)
+
+                cases.append(('{}_stored'.format(encoding), run_stored))
+
+            for method, function in cases:
+                result = _measure_cpu(function, options.repeat)
+                result.update(common.measure(function, options.repeat))
+                result.update(items=options.items, path=path, method=method)
+                results.append(result)
+    finally:
+        common.destroy_database(old_name)
+
+    common.print_summary('compression', results)
+
+
+def _measure_cpu(function, repeat) -> '{str: float}':
+    """function 이 반환한 본문 크기와 한 번 실행할 때 쓴 CPU 시간(마이크로초)
+    """
+    assert callable(function)
+
+    wire_bytes = function()
+
+    start = time.process_time()
+    for _ in range(repeat):
+        function()
+
+    return {'wire_bytes': wire_bytes, 'cpu_us': (time.process_time() - start) / repeat * 1000000}
+
+
+if __name__ == '__main__':
+    main()
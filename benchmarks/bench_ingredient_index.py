@@ -0,0 +1,70 @@
+"""성분 포함/제외 조회 지연 시간을 카탈로그 크기별로 측정
+
+    $ python -m benchmarks.bench_ingredient_index --sizes 1000,10000,100000,1000000
+
+역색인을 쓰는 products() 와 예전 icontains LIKE 조회를 함께 잰다.
+드문 성분 조회는 게시 목록에서 시작하므로 카탈로그 크기와 관계없어야 한다. 가장 큰 크기의 p50 이
+가장 작은 크기의 --max-ratio 배를 넘으면 실패로 끝낸다.
+"""
+import argparse
+import functools
+import operator
+import sys
+from benchmarks import common
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--max-ratio', type=float, default=2.0)
+    options = parser.parse_args()
+
+    common.setup()
+
+    from django.db.models import Q
+    from django.test import RequestFactory
+    from myapp.home.views import products
+    from myapp.item.models import Item
+
+    # 역색인 조회 비용은 해당 성분의 게시 목록 길이에 비례하므로 드문 성분으로 잰다
+    include = (common.ingredient_name(common.INGREDIENT_COUNT - 1),)
+    exclude = (common.ingredient_name(common.INGREDIENT_COUNT - 2), common.ingredient_name(common.INGREDIENT_COUNT - 3))
+    path = '/products?skin_type=oily&category=skincare&include_ingredient={}&exclude_ingredient={}'.format(
+        ','.join(include), ','.join(exclude))
+    request = RequestFactory().get(path)
+
+    def run_view() -> None:
+        products(request)
+
+    def run_legacy() -> None:
+        entries = Item.objects.filter(category__iexact='skincare').order_by('-oilyScore', 'price')
+        entries = entries.exclude(functools.reduce(operator.or_, (Q(ingredients__icontains=x) for x in exclude)))
+        entries = entries.filter(functools.reduce(operator.and_, (Q(ingredients__icontains=x) for x in include)))
+        list(entries[:50])
+
+    old_name = common.create_database()
+    try:
+        rows = []
+        for size in (int(size) for size in options.sizes.split(',')):
+            common.populate(size)
+
+            for name, function in (('index', run_view), ('icontains', run_legacy)):
+                result = common.measure_uncached(function, options.repeat)
+
+                result.update(items=size, path=name)
+                rows.append(result)
+    finally:
+        common.destroy_database(old_name)
+
+    common.print_summary('ingredient_index', rows)
+
+    latencies = [row['p50'] for row in rows if row['path'] == 'index']
+    ratio = latencies[-1] / latencies[0]
+    print('index p50 ratio={:.2f} (max {:.2f})'.format(ratio, options.max_ratio))
+    if ratio > options.max_ratio:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
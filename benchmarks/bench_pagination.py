@@ -0,0 +1,54 @@
+"""깊은 페이지 조회 지연 시간을 page(OFFSET) 와 cursor(키셋) 로 비교
+
+    $ python -m benchmarks.bench_pagination --items 200000 --pages 1,100,1000,3000
+"""
+import argparse
+from benchmarks import common
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--pages', default='1,10,100,1000')
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+
+    common.setup()
+
+    from django.test import RequestFactory
+    from myapp.home.pagination import encode_cursor
+    from myapp.home.views import ITEM_PER_PAGE, _query_products, products
+    from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS
+
+    path = '/products?skin_type=oily&category=skincare'
+    factory = RequestFactory()
+
+    old_name = common.create_database()
+    try:
+        common.populate(options.items)
+        entries = _query_products({'category': 'skincare'}, 'oily')
+
+        rows = []
+        for page in (int(page) for page in options.pages.split(',')):
+            # 커서는 바로 앞 페이지의 마지막 상품으로 미리 만들어 둔다
+            last_entry = entries[ITEM_PER_PAGE * page - 1]
+            score = getattr(last_entry, SKIN_TYPE_TO_SCORE_FIELDS['oily'])
+            cursor = encode_cursor(score, last_entry.price, last_entry.id)
+
+            requests = (
+                ('page', factory.get('{}&page={}'.format(path, page))),
+                ('cursor', factory.get('{}&cursor={}'.format(path, cursor))),
+            )
+            for name, request in requests:
+                result = common.measure_uncached(lambda: products(request), options.repeat)
+
+                result.update(items=options.items, page=page, path=name)
+                rows.append(result)
+    finally:
+        common.destroy_database(old_name)
+
+    common.print_summary('pagination', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""가중치 목록(oily:0.7,sensitive:0.3) 정렬의 첫 페이지를 NumPy 점수 표와 ORM 식 정렬로 비교
+
+    $ python -m benchmarks.bench_profiles --items 100000
+"""
+import argparse
+from benchmarks import common
+
+
+PROFILE = 'oily:0.7,sensitive:0.3'
+CONDITIONS = (
+    ('all', {}),
+    ('category', {'category': 'skincare'}),
+    ('exclude', {'exclude_ingredient': {'ingredient1', 'ingredient2'}}),
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    options = parser.parse_args()
+
+    common.setup()
+
+    from django.db.models import ExpressionWrapper, F, FloatField
+    from myapp.home.profiles import get_score_table, parse_profile
+    from myapp.home.views import ITEM_PER_PAGE, _fetch_weighted_products, _query_products
+    from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS
+
+    profile = parse_profile(PROFILE)
+    weighted = sum(F(SKIN_TYPE_TO_SCORE_FIELDS[skin_type]) * weight for skin_type, weight in profile.items())
+    weighted = ExpressionWrapper(weighted, output_field=FloatField())
+
+    old_name = common.create_database()
+    try:
+        common.populate(options.items)
+        results = []
+
+        for name, conditions in CONDITIONS:
+            arguments = dict(conditions, skin_type=PROFILE)
+
+            def run_numpy() -> None:
+                _fetch_weighted_products(arguments, 0, ITEM_PER_PAGE)
+
+            def run_orm() -> None:
+                entries = _query_products(conditions, 'oily').annotate(weighted=weighted)
+                list(entries.order_by('-weighted', 'price', 'id')[:ITEM_PER_PAGE])
+
+            cases = (('numpy', run_numpy), ('orm', run_orm))
+            for method, function in cases:
+                result = common.measure(function, options.repeat)
+                result.update(items=options.items, condition=name, method=method)
+                results.append(result)
+
+        table = get_score_table()
+        table_bytes = sum(array.nbytes for array in (table.ids, table.prices, table.scores, table.categories))
+        print('score table {:.1f} MiB'.format(table_bytes / 1024 / 1024))
+    finally:
+        common.destroy_database(old_name)
+
+    common.print_summary('profiles', results)
+
+
+if __name__ == '__main__':
+    main()
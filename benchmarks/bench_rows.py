@@ -0,0 +1,82 @@
+"""목록/상세 조회를 Item 모델, values_list, 컴파일해 둔 SQL 의 열 튜플로 읽는 비용 비교
+
+지연 시간과 함께 tracemalloc 으로 한 번 조회할 때 쓰는 메모리의 최대치를 잰다.
+
+    $ python -m benchmarks.bench_rows --items 20000
+"""
+import argparse
+import tracemalloc
+from benchmarks import common
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=500)
+    options = parser.parse_args()
+
+    common.setup()
+
+    from myapp.home import rows
+    from myapp.home.views import ITEM_PER_PAGE, _fetch_products, _query_items, _query_products
+
+    old_name = common.create_database()
+    try:
+        common.populate(options.items)
+
+        arguments = {'category': 'skincare', 'exclude_ingredient': {'ingredient1', 'ingredient2'}}
+        list_fields = rows.PRODUCT_ROW_TYPES['oily']._fields
+        offset = ITEM_PER_PAGE * 3
+
+        def run_models() -> None:
+            list(_query_products(arguments, 'oily')[offset:offset + ITEM_PER_PAGE])
+
+        def run_values() -> None:
+            list(_query_products(arguments, 'oily').values_list(*list_fields)[offset:offset + ITEM_PER_PAGE])
+
+        def run_rows() -> None:
+            _fetch_products(arguments, 'oily', None, offset, ITEM_PER_PAGE)
+
+        def run_detail_model() -> None:
+            _query_items({'ids': [7]}).get()
+
+        def run_detail_rows() -> None:
+            rows.fetch_rows('items', rows.DetailRow, _query_items, {'ids': [7]})
+
+        cases = (
+            ('products', 'model', run_models),
+            ('products', 'values_list', run_values),
+            ('products', 'rows', run_rows),
+            ('product', 'model', run_detail_model),
+            ('product', 'rows', run_detail_rows),
+        )
+
+        results = []
+        for view, path, function in cases:
+            result = common.measure(function, options.repeat)
+            result.update(_measure_allocations(function))
+            result.update(items=options.items, view=view, path=path)
+            results.append(result)
+    finally:
+        common.destroy_database(old_name)
+
+    common.print_summary('rows', results)
+
+
+def _measure_allocations(function) -> '{str: float}':
+    """function 을 한 번 실행하는 동안 가장 많이 쓴 Python 메모리(KiB). 결과 객체를 만들고 버리는 비용을 본다
+    """
+    assert callable(function)
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'peak_kib': peak / 1024}
+
+
+if __name__ == '__main__':
+    main()
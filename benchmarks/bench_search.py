@@ -0,0 +1,71 @@
+"""상품 이름 검색의 첫 페이지 후보를 찾는 시간을 bigram 색인과 전체 스캔으로 비교
+
+데이터베이스 없이 generate_catalog 와 같은 합성 상품으로 색인을 만든다.
+
+    $ python -m benchmarks.bench_search --items 1000000
+"""
+import argparse
+import time
+from benchmarks import common
+
+
+QUERIES = ('토너', '콜라겐', '콜라겐 마스크', '시카 선크림', '리더스 링클', '없는이름')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--scan-repeat', type=int, default=3)
+    options = parser.parse_args()
+
+    common.setup()
+
+    import numpy
+    from myapp.home.search import SearchIndex, normalize_name
+    from myapp.home.views import ITEM_PER_PAGE
+    from myapp.item.synthetic import generate_ingredients, generate_items
+
+    ingredient_names = [ingredient['name'] for ingredient in generate_ingredients(1000)]
+    random = numpy.random.default_rng(0)
+    scores = random.integers(-8, 9, size=(options.items, 3)).tolist()
+    rows = [
+        (item['id'], item['name'], int(item['price'])) + tuple(item_scores)
+        for item, item_scores in zip(generate_items(options.items, ingredient_names), scores)]
+
+    start = time.perf_counter()
+    index = SearchIndex(rows, 0)
+    build_time = time.perf_counter() - start
+    index_bytes = sum(array.nbytes for arrays in (index.postings, index.ids) for array in arrays.values())
+    print('built {} items in {:.2f}s, {} grams, arrays {:.1f} MiB'.format(
+        options.items, build_time, len(index.gram_ids), index_bytes / 1024 / 1024))
+
+    names = [normalize_name(row[1]) for row in rows]
+
+    def run_index(query) -> None:
+        query = normalize_name(query)
+        count = 0
+        for item_ids in index.iter_search(query, 'oily'):
+            count += len(item_ids)
+            if count >= ITEM_PER_PAGE:
+                break
+
+    def run_scan(query) -> None:
+        query = normalize_name(query)
+        [row[0] for row, name in zip(rows, names) if query in name]
+
+    results = []
+    for query in QUERIES:
+        result = common.measure(lambda: run_index(query), options.repeat)
+        result.update(items=options.items, query=query, method='index', matches=len(index.search(query, 'oily')))
+        results.append(result)
+
+        result = common.measure(lambda: run_scan(query), options.scan_repeat)
+        result.update(items=options.items, query=query, method='scan')
+        results.append(result)
+
+    common.print_summary('search', results)
+
+
+if __name__ == '__main__':
+    main()
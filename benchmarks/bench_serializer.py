@@ -0,0 +1,60 @@
+"""목록 응답 직렬화 비용을 예전 방식과 JSON 조각 캐시로 비교
+
+    $ python -m benchmarks.bench_serializer --repeat 2000
+"""
+import argparse
+from benchmarks import common
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=1000)
+    options = parser.parse_args()
+
+    common.setup()
+
+    from django.http import JsonResponse
+    from myapp.home.serializers import extract_data_from_entry, invalidate_fragments, serialize_entries
+    from myapp.home.views import ITEM_PER_PAGE
+    from myapp.item.models import Item
+
+    fields = ('id', 'name', 'price', 'ingredients', 'monthlySales')
+    indent_parameters = {'ensure_ascii': False, 'indent': 4, 'sort_keys': True}
+    compact_parameters = {'ensure_ascii': False}
+
+    old_name = common.create_database()
+    try:
+        common.populate(ITEM_PER_PAGE)
+        entries = list(Item.objects.order_by('id'))
+    finally:
+        common.destroy_database(old_name)
+
+    def run_dictionary(parameters) -> None:
+        results = [extract_data_from_entry(entry, fields, True) for entry in entries]
+        JsonResponse(results, safe=False, json_dumps_params=parameters)
+
+    def run_cold_fragments() -> None:
+        invalidate_fragments()
+        serialize_entries(entries, fields, True)
+
+    def run_warm_fragments() -> None:
+        serialize_entries(entries, fields, True)
+
+    cases = (
+        ('dict+indent', lambda: run_dictionary(indent_parameters)),
+        ('dict', lambda: run_dictionary(compact_parameters)),
+        ('fragments-cold', run_cold_fragments),
+        ('fragments-warm', run_warm_fragments),
+    )
+
+    rows = []
+    for name, function in cases:
+        result = common.measure(function, options.repeat)
+        result.update(items=ITEM_PER_PAGE, path=name)
+        rows.append(result)
+
+    common.print_summary('serializer', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""전체 프로필과 API 프로필의 시작 시간과 요청 하나의 처리 시간 비교
+
+프로필마다 새 프로세스에서 django.setup(), WSGI 앱과 URLconf 를 읽는 시간과 불러온 모듈 수를 재고,
+합성 카탈로그를 채운 뒤 WSGI 앱을 직접 불러 응답 캐시에 든 목록/상세 요청의 처리 시간을 잰다.
+두 프로필의 차이가 미들웨어와 앱 구성에서 오는 요청당 비용이다.
+
+    $ python -m benchmarks.bench_startup --full-settings myapp.settings.production --api-settings myapp.settings.api
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+REQUEST_PATHS = ('/products/?skin_type=oily', '/product/7?skin_type=oily')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--full-settings', default='myapp.settings.production')
+    parser.add_argument('--api-settings', default='myapp.settings.api')
+    parser.add_argument('--startup-repeat', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--worker', choices=('startup', 'requests'))
+    parser.add_argument('--settings')
+    options = parser.parse_args()
+
+    if options.worker == 'startup':
+        print(json.dumps(_measure_startup(options.settings)))
+        return
+    elif options.worker == 'requests':
+        print(json.dumps(_measure_requests(options.settings, options.items, options.repeat)))
+        return
+
+    from benchmarks import common
+
+    rows = []
+    for profile, settings_module in (('full', options.full_settings), ('api', options.api_settings)):
+        startups = [_run_worker('startup', settings_module, options) for _ in range(options.startup_repeat)]
+        result = common.summarize_latencies([startup['elapsed'] for startup in startups])
+        result.update(profile=profile, path='startup', modules=startups[-1]['modules'])
+        rows.append(result)
+
+        for path, elapsed in _run_worker('requests', settings_module, options).items():
+            result = common.summarize_latencies(elapsed)
+            result.update(profile=profile, path=path)
+            rows.append(result)
+
+    common.print_summary('startup', rows)
+
+
+def _run_worker(worker, settings_module, options) -> dict:
+    command = [
+        sys.executable, '-m', 'benchmarks.bench_startup', '--worker', worker, '--settings', settings_module,
+        '--repeat', str(options.repeat), '--items', str(options.items)]
+    environment = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    output = subprocess.run(command, env=environment, stdout=subprocess.PIPE, check=True).stdout
+
+    return json.loads(output.decode('utf-8').splitlines()[-1])
+
+
+def _measure_startup(settings_module) -> '{str: float}':
+    """django.setup() 부터 WSGI 앱과 URLconf 를 읽을 때까지 걸린 시간(밀리초)과 불러온 모듈 수
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    start = time.perf_counter()
+
+    import django
+    django.setup()
+
+    from django.core.servers.basehttp import get_internal_wsgi_application
+    from django.urls import get_resolver
+    get_internal_wsgi_application()
+    get_resolver().url_patterns
+
+    return {'elapsed': (time.perf_counter() - start) * 1000, 'modules': len(sys.modules)}
+
+
+def _measure_requests(settings_module, items, repeat) -> '{str: [float]}':
+    """WSGI 앱에 같은 요청을 repeat 번 보낸 지연 시간(밀리초). 첫 요청으로 응답 캐시를 채운 뒤 잰다
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+
+    from benchmarks import common
+    common.setup()
+
+    from django.core.servers.basehttp import get_internal_wsgi_application
+
+    old_name = common.create_database()
+    try:
+        common.populate(items)
+        application = get_internal_wsgi_application()
+
+        def start_response(status, headers, exc_info=None) -> None:
+            assert status.startswith('200'), status
+
+        results = {}
+        for path in REQUEST_PATHS:
+            path_info, _, query_string = path.partition('?')
+
+            def run() -> None:
+                environ = {
+                    'REQUEST_METHOD': 'GET',
+                    'PATH_INFO': path_info,
+                    'QUERY_STRING': query_string,
+                    'SERVER_NAME': 'testserver',
+                    'SERVER_PORT': '80',
+                    'SERVER_PROTOCOL': 'HTTP/1.1',
+                    'wsgi.input': io.BytesIO(),
+                    'wsgi.errors': sys.stderr,
+                    'wsgi.url_scheme': 'http',
+                }
+                response = application(environ, start_response)
+                b''.join(response)
+                response.close()
+
+            run()
+
+            elapsed = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                elapsed.append((time.perf_counter() - start) * 1000)
+
+            results[path] = elapsed
+    finally:
+        common.destroy_database(old_name)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
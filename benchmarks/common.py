@@ -0,0 +1,161 @@
+"""벤치마크 공통 도구
+
+테스트 러너와 같은 방식으로 임시 데이터베이스를 만들고 합성 카탈로그를 채운다.
+DJANGO_SETTINGS_MODULE 을 지정하지 않으면 myapp.settings.local 을 쓴다.
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATEGORIES = ('skincare', 'basemakeup', 'maskpack', 'suncare')
+GENDERS = ('all', 'female', 'male')
+INGREDIENT_COUNT = 1000
+POPULATE_BATCH_SIZE = 5000
+
+
+def setup() -> None:
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myapp.settings.local')
+
+    import django
+    django.setup()
+
+
+def create_database() -> str:
+    """테스트 데이터베이스를 만들고 원래 이름을 반환
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    return old_name
+
+
+def destroy_database(old_name) -> None:
+    from django.db import connection
+
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def ingredient_name(index) -> str:
+    assert isinstance(index, int)
+
+    return 'ingredient{}'.format(index)
+
+
+def populate(count, seed=0) -> None:
+    """합성 상품을 count 개 채움. 기존 상품은 지움
+    """
+    assert isinstance(count, int)
+
+    from myapp.item.catalog import bump_catalog_version, rebuild_full_ingredient_index
+    from myapp.item.models import Item
+
+    Item.objects.all().delete()
+
+    generator = random.Random(seed)
+    # 앞쪽 성분일수록 자주 쓰이도록 가중치를 줌
+    ingredients = [ingredient_name(index) for index in range(INGREDIENT_COUNT)]
+    weights = [1 / (rank + 1) for rank in range(INGREDIENT_COUNT)]
+
+    batch = []
+    for item_id in range(1, count + 1):
+        item_ingredients = set(generator.choices(ingredients, weights, k=generator.randint(3, 8)))
+        item = Item(
+            id=item_id,
+            imageId='{:032x}'.format(generator.getrandbits(128)),
+            name='상품 {}'.format(item_id),
+            price=generator.randint(1, 500) * 10,
+            gender=generator.choice(GENDERS),
+            category=generator.choice(CATEGORIES),
+            ingredients=','.join(sorted(item_ingredients)),
+            monthlySales=generator.randint(0, 10000),
+            oilyScore=generator.randint(-4, 4),
+            dryScore=generator.randint(-4, 4),
+            sensitiveScore=generator.randint(-4, 4),
+        )
+        batch.append(item)
+
+        if len(batch) == POPULATE_BATCH_SIZE:
+            Item.objects.bulk_create(batch)
+            batch = []
+
+    Item.objects.bulk_create(batch)
+    rebuild_full_ingredient_index()
+    bump_catalog_version()
+
+
+def measure(function, repeat=50) -> '{str: float}':
+    """function 을 repeat 번 실행한 지연 시간 통계(밀리초)
+    """
+    assert callable(function)
+    assert isinstance(repeat, int)
+
+    function()
+
+    elapsed = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed.append((time.perf_counter() - start) * 1000)
+
+    return summarize_latencies(elapsed)
+
+
+def measure_uncached(function, repeat=50) -> '{str: float}':
+    """응답 캐시를 끄고 measure(). 같은 요청을 되풀이하므로 캐시를 켜 두면 조회 대신 캐시 적중을 잰다
+    """
+    from django.test import override_settings
+
+    with override_settings(CATALOG_CACHE_ENABLED=False):
+        return measure(function, repeat)
+
+
+def summarize_latencies(elapsed) -> '{str: float}':
+    """지연 시간 목록(밀리초)의 평균과 분위수
+    """
+    assert isinstance(elapsed, list)
+
+    elapsed = sorted(elapsed)
+    if not elapsed:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+
+    return {
+        'mean': statistics.mean(elapsed),
+        'p50': _percentile(elapsed, 0.5),
+        'p95': _percentile(elapsed, 0.95),
+        'p99': _percentile(elapsed, 0.99),
+    }
+
+
+def print_summary(name, rows) -> None:
+    """사람이 읽는 표와 커밋 간 비교용 JSON 한 줄을 출력
+    """
+    assert isinstance(name, str)
+    assert isinstance(rows, list)
+
+    for row in rows:
+        print('  '.join('{}={}'.format(key, _format(value)) for key, value in row.items()))
+
+    print(json.dumps({'benchmark': name, 'results': rows}, ensure_ascii=False, sort_keys=True))
+
+
+def _percentile(values, fraction) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _format(value) -> str:
+    if isinstance(value, float):
+        return '{:.3f}'.format(value)
+
+    return str(value)
@@ -0,0 +1,236 @@
+"""요청 로그를 재생해 처리량, 지연 시간 분위수, 요청당 쿼리 수를 측정
+
+    $ python -m benchmarks.replay --items 100000 --requests 5000
+    $ python -m benchmarks.replay --requests 5000 --write-log /tmp/replay.jsonl
+    $ python -m benchmarks.replay --log /tmp/replay.jsonl --url http://127.0.0.1:8000 --concurrency 8
+
+로그는 한 줄에 {"path": "/products/?skin_type=oily"} 하나씩인 JSON Lines 다. --log 가 없으면
+common.populate 로 만든 카탈로그에 맞춘 합성 로그를 만든다.
+
+--url 이 없으면 임시 데이터베이스에 카탈로그를 채우고 테스트 클라이언트로 프로세스 안에서 보낸다.
+--url 을 주면 이미 떠 있는 서버(gunicorn 등)로 보낸다. 이때 카탈로그는 서버 쪽에 미리 있어야 하고
+요청당 쿼리 수는 알 수 없다.
+"""
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import random
+import time
+import urllib.error
+import urllib.request
+from benchmarks import common
+from myapp.item.fields import SKIN_TYPES
+
+
+# 합성 로그의 요청 종류 비율
+KIND_WEIGHTS = (
+    ('products', 0.5),
+    ('product', 0.35),
+    ('batch', 0.15),
+)
+MAX_PAGE = 20
+BATCH_SIZE = 10
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--log', help='재생할 요청 로그. 없으면 합성 로그를 만든다')
+    parser.add_argument('--write-log', help='재생한 로그를 이 파일에 저장')
+    parser.add_argument('--url', help='이 주소의 서버로 보냄. 없으면 프로세스 안에서 테스트 클라이언트로 보냄')
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    if options.log is None:
+        paths = generate_log(options.requests + options.warmup, options.items, options.seed)
+    else:
+        with open(options.log, encoding='utf-8') as file:
+            paths = read_log(file)
+
+    if options.write_log is not None:
+        with open(options.write_log, 'w', encoding='utf-8') as file:
+            write_log(file, paths)
+
+    warmup_paths = paths[:options.warmup]
+    paths = paths[options.warmup:]
+
+    if options.url is None:
+        common.setup()
+
+        old_name = common.create_database()
+        try:
+            common.populate(options.items)
+            results, elapsed = replay_in_process(warmup_paths, paths)
+        finally:
+            common.destroy_database(old_name)
+    else:
+        results, elapsed = replay_over_http(options.url, warmup_paths, paths, options.concurrency)
+
+    target = 'in-process' if options.url is None else options.url
+    common.print_summary('replay', summarize(results, elapsed, target=target, concurrency=options.concurrency))
+
+
+def generate_log(count, item_count, seed=0) -> '[str]':
+    """합성 카탈로그(common.populate)를 대상으로 하는 요청 경로 목록
+
+    상품과 성분은 앞쪽일수록 자주 요청되도록(Zipf) 고른다
+    """
+    assert isinstance(count, int)
+    assert isinstance(item_count, int)
+
+    generator = random.Random(seed)
+    kinds, kind_weights = zip(*KIND_WEIGHTS)
+    item_ranks = _zipf_sampler(generator, item_count)
+    ingredient_ranks = _zipf_sampler(generator, common.INGREDIENT_COUNT)
+    page_ranks = _zipf_sampler(generator, MAX_PAGE)
+
+    paths = []
+    for kind in generator.choices(kinds, kind_weights, k=count):
+        skin_type = generator.choice(SKIN_TYPES)
+
+        if kind == 'products':
+            arguments = [('skin_type', skin_type)]
+            if generator.random() < 0.7:
+                arguments.append(('category', generator.choice(common.CATEGORIES)))
+            if generator.random() < 0.3:
+                arguments.append(('include_ingredient', common.ingredient_name(ingredient_ranks())))
+            if generator.random() < 0.2:
+                arguments.append(('exclude_ingredient', common.ingredient_name(ingredient_ranks())))
+            if generator.random() < 0.4:
+                arguments.append(('page', page_ranks() + 1))
+
+            path = '/products/?' + '&'.join('{}={}'.format(key, value) for key, value in arguments)
+        elif kind == 'product':
+            path = '/product/{}?skin_type={}'.format(item_ranks() + 1, skin_type)
+        else:
+            ids = ','.join(str(item_ranks() + 1) for _ in range(BATCH_SIZE))
+            path = '/products/batch?ids={}&skin_type={}'.format(ids, skin_type)
+
+        paths.append(path)
+
+    return paths
+
+
+def read_log(file) -> '[str]':
+    paths = []
+
+    for line in file:
+        line = line.strip()
+        if line:
+            paths.append(json.loads(line)['path'])
+
+    return paths
+
+
+def write_log(file, paths) -> None:
+    for path in paths:
+        file.write(json.dumps({'path': path}) + '\n')
+
+
+def replay_in_process(warmup_paths, paths) -> '([(str, int, float, int)], float)':
+    """테스트 클라이언트로 순서대로 보냄. (종류, 상태 코드, 지연 시간(밀리초), 쿼리 수) 목록과 전체 시간(초)을 반환
+    """
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    for path in warmup_paths:
+        client.get(path)
+
+    results = []
+    start = time.perf_counter()
+
+    for path in paths:
+        with CaptureQueriesContext(connection) as queries:
+            request_start = time.perf_counter()
+            response = client.get(path)
+            elapsed = (time.perf_counter() - request_start) * 1000
+
+        results.append((_get_kind(path), response.status_code, elapsed, len(queries)))
+
+    return results, time.perf_counter() - start
+
+
+def replay_over_http(url, warmup_paths, paths, concurrency) -> '([(str, int, float, None)], float)':
+    """url 의 서버로 concurrency 개의 스레드가 나눠 보냄
+    """
+    assert isinstance(concurrency, int)
+
+    url = url.rstrip('/')
+
+    def send(path):
+        request_start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url + path) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            status = error.code
+
+        return _get_kind(path), status, (time.perf_counter() - request_start) * 1000, None
+
+    with concurrent.futures.ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(send, warmup_paths))
+
+        start = time.perf_counter()
+        results = list(executor.map(send, paths))
+
+        return results, time.perf_counter() - start
+
+
+def summarize(results, elapsed, **extra) -> '[{str: object}]':
+    """요청 종류 별과 전체에 대해 처리량, 지연 시간 분위수, 요청당 쿼리 수를 계산
+    """
+    assert isinstance(results, list)
+    assert isinstance(elapsed, float)
+
+    groups = collections.defaultdict(list)
+    for result in results:
+        groups[result[0]].append(result)
+        groups['all'].append(result)
+
+    rows = []
+    for kind in sorted(groups):
+        group = groups[kind]
+        row = {'kind': kind, 'requests': len(group)}
+        row['errors'] = sum(1 for result in group if result[1] >= 400)
+        row['throughput'] = len(group) / elapsed if elapsed else 0.0
+        row.update(common.summarize_latencies([result[2] for result in group]))
+
+        queries = [result[3] for result in group if result[3] is not None]
+        row['queries'] = sum(queries) / len(queries) if queries else None
+        row['max_queries'] = max(queries) if queries else None
+        row.update(extra)
+        rows.append(row)
+
+    return rows
+
+
+def _get_kind(path) -> str:
+    if path.startswith('/products/batch'):
+        return 'batch'
+    elif path.startswith('/products'):
+        return 'products'
+    elif path.startswith('/product/'):
+        return 'product'
+
+    return 'other'
+
+
+def _zipf_sampler(generator, count) -> 'function':
+    # 순위 r 의 가중치가 1 / (r + 1) 인 순위를 뽑는 함수
+    weights = [1 / (rank + 1) for rank in range(count)]
+    cumulative_weights = list(itertools.accumulate(weights))
+    ranks = range(count)
+
+    return lambda: generator.choices(ranks, cum_weights=cumulative_weights)[0]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""데이터베이스 연결 관리
+
+카탈로그 조회 뷰는 read_from_replica 로 감싸 DATABASE_REPLICAS 중 하나에서 읽고, 쓰기와 admin 은 default 로 보낸다.
+영구 연결(CONN_MAX_AGE)은 요청 시작 때 check_connections 가 살아 있는지 확인한다.
+"""
+import contextlib
+import functools
+import itertools
+import threading
+import time
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_state = threading.local()
+_replica_cycle = None
+_replica_cycle_key = None
+_replica_cycle_lock = threading.Lock()
+
+
+class ReplicaRouter:
+    """read_from_replica 안의 읽기만 복제본으로 보냄
+    """
+
+    def db_for_read(self, model, **hints) -> 'str or None':
+        return getattr(_state, 'alias', None)
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # 복제본은 default 와 같은 데이터다
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool:
+        # 복제본의 스키마는 복제로 따라온다
+        return db not in settings.DATABASE_REPLICAS
+
+
+def read_from_replica(view) -> 'function':
+    """뷰 안의 읽기 쿼리를 복제본 하나로 보냄. 요청 하나는 한 복제본에서만 읽는다
+    """
+    assert callable(view)
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        with using_replica():
+            return view(*args, **kwargs)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def using_replica() -> 'iterator':
+    """감싼 구간의 읽기를 복제본 하나로 보냄
+
+    카탈로그가 바뀐 지 DATABASE_REPLICA_MAX_LAG 초가 지나지 않았으면 복제 지연 때문에 예전 데이터가 새 버전으로
+    캐시되지 않도록 default 에서 읽는다
+    """
+    previous_alias = getattr(_state, 'alias', None)
+    _state.alias = _choose_replica()
+
+    try:
+        yield _state.alias
+    finally:
+        _state.alias = previous_alias
+
+
+def check_connections(**kwargs) -> None:
+    """request_started 에서 불림. 마지막 확인 뒤 DATABASE_HEALTH_CHECK_INTERVAL 초가 지난 영구 연결이 끊겼으면 닫는다
+
+    닫힌 연결은 다음 쿼리가 새로 연다. 끊긴 연결로 보낸 첫 쿼리가 실패하는 것을 막는다
+    """
+    now = time.monotonic()
+
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+
+        checked_at = getattr(connection, 'health_checked_at', None)
+        if checked_at is not None and now - checked_at < settings.DATABASE_HEALTH_CHECK_INTERVAL:
+            continue
+
+        if not connection.is_usable():
+            connection.close()
+
+        connection.health_checked_at = now
+
+
+def _choose_replica() -> 'str or None':
+    global _replica_cycle, _replica_cycle_key
+
+    replicas = tuple(settings.DATABASE_REPLICAS)
+    if not replicas:
+        return None
+
+    # 순환 import 를 피한다. catalog 는 모델을 읽는다
+    from myapp.item.catalog import get_catalog_modified
+
+    if time.time() - get_catalog_modified() < settings.DATABASE_REPLICA_MAX_LAG:
+        return None
+
+    with _replica_cycle_lock:
+        if _replica_cycle_key != replicas:
+            _replica_cycle = itertools.cycle(replicas)
+            _replica_cycle_key = replicas
+
+        return next(_replica_cycle)
@@ -0,0 +1,39 @@
+"""gunicorn 설정
+
+    $ gunicorn myapp.wsgi -c python:myapp.gunicorn_config
+
+앱을 마스터에서 미리 읽고(preload) 카탈로그 객체를 만든 뒤 fork 한다. 워커들은 이 객체들을 copy-on-write 로 나눠 쓰므로
+첫 요청이 느리지 않고, 워커를 늘려도 메모리가 워커 수만큼 늘지 않는다.
+"""
+import gc
+import os
+
+
+preload_app = True
+workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+
+
+def when_ready(server) -> None:
+    # 마스터에서 첫 워커를 fork 하기 전에 불린다
+    from django.core.cache import close_caches
+    from django.db import connections
+    from myapp.home.warmup import warm_up
+
+    try:
+        timings = warm_up()
+    except Exception:
+        # 데이터베이스가 아직 준비되지 않았으면 워커가 첫 요청에서 만든다
+        server.log.exception('catalog warm-up failed')
+    else:
+        server.log.info('catalog warmed up: %s', ', '.join(
+            '{} {:.3f}s'.format(name, elapsed) for name, elapsed in timings.items()))
+    finally:
+        # 워커끼리 같은 소켓을 나눠 쓰지 않도록 fork 전에 DB 와 캐시(memcached 등) 연결을 닫는다
+        connections.close_all()
+        close_caches()
+
+    # 워커의 GC 가 물려받은 객체의 헤더를 고쳐 써서 페이지가 복사되지 않도록 영구 세대로 옮긴다.
+    # gc.freeze 는 파이썬 3.7 부터 있다
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
@@ -1,4 +1,14 @@
 from django.apps import AppConfig
 
 class HomeConfig(AppConfig):
-    name = 'home'
+    name = 'myapp.home'
+    label = 'home'
+
+    def ready(self) -> None:
+        from django.core.signals import request_started
+        from myapp.db import check_connections
+        from myapp.home.serializers import on_catalog_changed
+        from myapp.item.catalog import catalog_changed
+
+        catalog_changed.connect(on_catalog_changed, dispatch_uid='home.serializers')
+        request_started.connect(check_connections, dispatch_uid='home.db')
@@ -0,0 +1,423 @@
+import collections
+import hashlib
+import json
+import threading
+import zlib
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from myapp.home.snapshots import get_stale_count
+from myapp.item.catalog import get_catalog_version
+
+# brotli 는 설치되어 있을 때만 쓴다
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# 응답 하나를 저장할 때 본문과 헤더 외에 드는 대략적인 바이트 수
+ENTRY_OVERHEAD = 256
+# 이보다 작은 본문은 압축하지 않는다
+MIN_COMPRESS_BYTES = 200
+# 압축한 본문을 저장해 두고 다시 쓰므로 빠른 수준보다 작게 만드는 수준을 고른다
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+# 이전 카탈로그 버전의 구조로 만든 응답에 붙인다
+STALE_CACHE_CONTROL = 'no-store'
+
+CachedResponse = collections.namedtuple('CachedResponse', ('content', 'headers'))
+
+statistics = collections.Counter()
+
+_backend = None
+_backend_lock = threading.Lock()
+_flights = None
+
+
+class LRUCache:
+    """저장한 바이트 수에 상한이 있는 프로세스 내 LRU 캐시
+    """
+
+    def __init__(self, max_bytes) -> None:
+        assert isinstance(max_bytes, int)
+
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> 'object or None':
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            self._entries.move_to_end(key)
+
+            return entry[0]
+
+    def set(self, key, value, size) -> None:
+        assert isinstance(size, int)
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+            self._entries[key] = (value, size)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def delete(self, key) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SharedCache:
+    """장고 캐시 백엔드(memcached 등)를 워커끼리 나눠 쓰는 응답 캐시로 씀
+    """
+
+    def __init__(self, alias) -> None:
+        assert isinstance(alias, str)
+
+        self.alias = alias
+        self._cache = caches[alias]
+
+    def get(self, key) -> 'object or None':
+        return self._cache.get(key)
+
+    def set(self, key, value, size) -> None:
+        self._cache.set(key, value)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class SingleFlight:
+    """같은 키의 계산이 이미 진행 중이면 새로 시작하지 않고 그 결과를 기다려 나눠 씀
+
+    결과는 여러 스레드가 함께 읽으므로 바꾸지 않는 값이어야 한다. 계산이 예외를 내면 기다리던 쪽도 같은 예외를 낸다
+    """
+
+    def __init__(self) -> None:
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function) -> '(object, bool)':
+        """(function() 결과, 다른 요청의 결과를 나눠 받았는지) 를 반환
+        """
+        assert callable(function)
+
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+
+            return call.result, True
+
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+            call.event.set()
+
+        return call.result, False
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def get_response_cache() -> 'LRUCache or SharedCache':
+    """설정에 맞는 응답 캐시. CATALOG_CACHE_ALIAS 가 없으면 프로세스 내 LRU 를 쓴다
+    """
+    global _backend
+
+    alias = settings.CATALOG_CACHE_ALIAS
+    max_bytes = settings.CATALOG_CACHE_MAX_BYTES
+    backend = _backend
+
+    if alias is None:
+        if isinstance(backend, LRUCache) and backend.max_bytes == max_bytes:
+            return backend
+    elif isinstance(backend, SharedCache) and backend.alias == alias:
+        return backend
+
+    with _backend_lock:
+        if alias is None:
+            _backend = LRUCache(max_bytes)
+        else:
+            _backend = SharedCache(alias)
+
+        return _backend
+
+
+def build_cache_key(name, arguments) -> str:
+    """뷰 이름과 정규화한 인자, 카탈로그 버전으로 캐시 키를 만듦. 카탈로그가 바뀌면 키가 바뀐다
+    """
+    assert isinstance(name, str)
+    assert isinstance(arguments, collections.abc.Mapping)
+
+    normalized = {}
+    for key, value in arguments.items():
+        if isinstance(value, collections.abc.Set):
+            value = sorted(value)
+
+        normalized[key] = value
+
+    text = json.dumps(normalized, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    return 'catalog:{}:{}:{}'.format(get_catalog_version(), name, digest)
+
+
+def cached_response(request, name, arguments, render) -> 'HttpResponse':
+    """캐시에 있으면 저장해 둔 응답을, 없으면 render() 결과를 저장하고 반환
+
+    요청의 If-None-Match 가 현재 카탈로그의 ETag 와 맞으면 조회 없이 304 를 돌려준다. ETag 는 카탈로그 버전에서 만들므로
+    Last-Modified 는 보내지 않는다. 초 단위 시각으로는 같은 초에 두 번 바뀐 것을 구별할 수 없다.
+    Accept-Encoding 이 gzip(brotli 가 설치되어 있으면 br)을 받아들이면 압축해 저장해 둔 본문을 돌려준다
+    """
+    assert isinstance(request, HttpRequest)
+    assert isinstance(name, str)
+    assert callable(render)
+
+    key = build_cache_key(name, arguments)
+    # 키에 카탈로그 버전이 들어 있으므로 키가 같으면 본문도 같다
+    etag = hashlib.sha1(key.encode('ascii')).hexdigest()
+    # 압축한 본문은 다른 표현이므로 ETag 도 다르다
+    encoding = _choose_encoding(request)
+    if encoding is not None:
+        etag += '-' + encoding
+
+    etag = quote_etag(etag)
+
+    if _matches_etag(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+    else:
+        if encoding is None:
+            response = _get_response(key, render)
+        else:
+            response = _get_encoded_response(key, encoding, render)
+
+        # '*' 는 응답이 있는지 알아야 맞출 수 있으므로 만든 뒤에 확인한다
+        if response.status_code == 200 and not _is_stale(response):
+            response['ETag'] = etag
+            response = get_conditional_response(request, etag=etag, response=response)
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    return response
+
+
+def _matches_etag(request, etag) -> bool:
+    """If-None-Match 에 etag 가 들어 있으면 True
+
+    ETag 는 같은 버전에서 200 으로 만든 응답에만 붙으므로 맞으면 그 응답이 있다. '*' 는 여기서 맞추지 않는다
+    """
+    value = request.META.get('HTTP_IF_NONE_MATCH')
+    if not value:
+        return False
+
+    # 약한 비교. 압축하는 프록시가 W/ 를 붙일 수 있다
+    etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(value)]
+
+    return etag in etags
+
+
+def _get_response(key, render) -> 'HttpResponse':
+    """캐시에 없으면 render() 를 부름. 같은 키의 render() 가 다른 스레드에서 진행 중이면 그 결과를 기다려 쓴다
+    """
+    is_enabled = settings.CATALOG_CACHE_ENABLED
+    if is_enabled:
+        entry = get_response_cache().get(key)
+        if entry is not None:
+            statistics['hits'] += 1
+
+            return _build_response(200, entry.content, entry.headers)
+
+    rendered = []
+
+    def compute() -> '(int, bytes, ((str, str),))':
+        # 먼저 끝난 같은 키의 계산이 캐시를 채웠을 수 있다
+        if is_enabled:
+            entry = get_response_cache().get(key)
+            if entry is not None:
+                statistics['hits'] += 1
+
+                return 200, entry.content, entry.headers
+
+            statistics['misses'] += 1
+
+        stale_count = get_stale_count()
+        response = render()
+        rendered.append(response)
+
+        # 다시 만드는 중인 이전 구조로 만든 응답은 새 버전의 키에 저장하지 않고, 클라이언트도 저장하지 않게 한다
+        if get_stale_count() != stale_count:
+            response['Cache-Control'] = STALE_CACHE_CONTROL
+
+        # 호출한 쪽이 헤더를 더 붙이기 전의 값을 나눠 준다
+        result = response.status_code, response.content, tuple(response.items())
+
+        # 오류 응답은 저장하지 않는다
+        if is_enabled and response.status_code == 200 and not _is_stale(response):
+            _set_response(key, response.content, result[2])
+
+        return result
+
+    (status_code, content, headers), is_shared = _get_flights().do(key, compute)
+    if is_shared:
+        statistics['coalesced'] += 1
+    elif rendered:
+        return rendered[0]
+
+    return _build_response(status_code, content, headers)
+
+
+def _build_response(status_code, content, headers) -> 'HttpResponse':
+    response = HttpResponse(content, status=status_code)
+    for header, value in headers:
+        response[header] = value
+
+    return response
+
+
+def _get_encoded_response(key, encoding, render) -> 'HttpResponse':
+    """encoding 으로 압축한 응답. 압축한 본문도 캐시에 따로 저장해 두고 압축하지 않은 본문과 같은 키에서 만든 키를 쓴다
+
+    카탈로그가 바뀌면 두 키가 함께 바뀐다. 압축해도 작아지지 않으면 압축하지 않은 본문을 저장한다
+    """
+    encoded_key = '{}:{}'.format(key, encoding)
+    is_enabled = settings.CATALOG_CACHE_ENABLED
+    if is_enabled:
+        entry = get_response_cache().get(encoded_key)
+        if entry is not None:
+            statistics['hits'] += 1
+
+            return _build_response(200, entry.content, entry.headers)
+
+    def compute() -> '(int, bytes, ((str, str),))':
+        response = _get_response(key, render)
+        headers = tuple(response.items())
+        if response.status_code != 200 or _is_stale(response):
+            return response.status_code, response.content, headers
+
+        content = response.content
+        if len(content) >= MIN_COMPRESS_BYTES:
+            compressed = ENCODERS[encoding](content)
+            if len(compressed) < len(content):
+                content = compressed
+                headers += (('Content-Encoding', encoding),)
+
+        if is_enabled:
+            _set_response(encoded_key, content, headers)
+
+        return 200, content, headers
+
+    (status_code, content, headers), is_shared = _get_flights().do(encoded_key, compute)
+    if is_shared:
+        statistics['coalesced'] += 1
+
+    return _build_response(status_code, content, headers)
+
+
+def _is_stale(response) -> bool:
+    return response.get('Cache-Control') == STALE_CACHE_CONTROL
+
+
+def _set_response(key, content, headers) -> None:
+    size = len(content) + sum(len(header) + len(value) for header, value in headers) + ENTRY_OVERHEAD
+    get_response_cache().set(key, CachedResponse(content, headers), size)
+
+
+def _choose_encoding(request) -> 'str or None':
+    """Accept-Encoding 에서 받아들이는(q 가 0 이 아닌) 압축 방식 중 ENCODERS 의 앞에 있는 것
+    """
+    qualities = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, parameters = part.partition(';')
+        quality = 1.0
+        for parameter in parameters.split(';'):
+            name, _, value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        qualities[coding.strip().lower()] = quality
+
+    for encoding in ENCODERS:
+        if qualities.get(encoding, qualities.get('*', 0.0)) > 0:
+            return encoding
+
+    return None
+
+
+def _compress_gzip(content) -> bytes:
+    # gzip.compress 는 헤더에 현재 시각을 넣으므로 같은 본문이면 같은 결과가 나오도록 zlib 으로 만든다
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    return compressor.compress(content) + compressor.flush()
+
+
+def _compress_brotli(content) -> bytes:
+    return brotli.compress(content, quality=BROTLI_QUALITY)
+
+
+# 압축 방식과 압축 함수. 클라이언트가 여럿을 받아들이면 앞의 것을 고른다
+ENCODERS = collections.OrderedDict(
+    ((('br', _compress_brotli),) if brotli is not None else ()) + (('gzip', _compress_gzip),))
+
+
+def _get_flights() -> 'SingleFlight':
+    global _flights
+
+    if _flights is None:
+        with _backend_lock:
+            if _flights is None:
+                _flights = SingleFlight()
+
+    return _flights
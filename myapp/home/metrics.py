@@ -0,0 +1,196 @@
+import bisect
+import contextlib
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from myapp.home import cache
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PREFIX = 'myapp_'
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# 이름 -> (설명, 구간)
+HISTOGRAMS = {
+    'request_duration_seconds': ('Wall time spent in the view and middlewares.', DURATION_BUCKETS),
+    'db_queries': ('Database queries per request.', QUERY_BUCKETS),
+    'db_duration_seconds': ('Time spent executing database queries per request.', DURATION_BUCKETS),
+    'serialization_duration_seconds': ('Time spent encoding response bodies per request.', DURATION_BUCKETS),
+    'response_size_bytes': ('Response body size. Streaming responses are not counted.', SIZE_BUCKETS),
+}
+# 이름 -> (설명, 값을 읽는 함수)
+COUNTERS = {
+    'catalog_cache_hits_total': ('Catalog response cache hits.', lambda: cache.statistics['hits']),
+    'catalog_cache_misses_total': ('Catalog response cache misses.', lambda: cache.statistics['misses']),
+    'catalog_coalesced_requests_total': (
+        'Catalog requests that waited for an identical in-flight render instead of rendering.',
+        lambda: cache.statistics['coalesced']),
+}
+# URL 패턴 이름이 없는 요청(404 등)
+UNMATCHED_VIEW = 'unmatched'
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+_local = threading.local()
+
+
+class Histogram:
+    """Prometheus 히스토그램. 구간마다의 개수와 합계, 전체 개수를 센다
+    """
+
+    def __init__(self, buckets) -> None:
+        assert isinstance(buckets, tuple)
+
+        self.buckets = buckets
+        # 마지막은 +Inf 구간
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value) -> None:
+        # 구간의 경계값(le)도 그 구간에 들어간다
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestSample:
+    """요청 하나를 처리하는 동안 모은 값
+    """
+    __slots__ = ('queries', 'db_duration', 'serialization_duration')
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_duration = 0.0
+        self.serialization_duration = 0.0
+
+
+class MetricsMiddleware:
+    """URL 패턴 별로 처리 시간, 쿼리 수와 시간, 직렬화 시간, 응답 크기를 기록
+
+    METRICS_ENABLED 가 꺼져 있으면 미들웨어 목록에서 빠진다
+    """
+
+    def __init__(self, get_response) -> None:
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+
+    def __call__(self, request) -> 'HttpResponse':
+        sample = RequestSample()
+        _local.sample = sample
+        start = time.perf_counter()
+
+        try:
+            with contextlib.ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_count_query))
+
+                response = self.get_response(request)
+        finally:
+            _local.sample = None
+
+        duration = time.perf_counter() - start
+
+        resolver_match = request.resolver_match
+        if resolver_match is None or resolver_match.url_name is None:
+            view = UNMATCHED_VIEW
+        else:
+            view = resolver_match.url_name
+
+        values = [
+            ('request_duration_seconds', duration),
+            ('db_queries', sample.queries),
+            ('db_duration_seconds', sample.db_duration),
+            ('serialization_duration_seconds', sample.serialization_duration),
+        ]
+        if not response.streaming:
+            values.append(('response_size_bytes', len(response.content)))
+
+        record(view, values)
+
+        return response
+
+
+@contextlib.contextmanager
+def measure_serialization() -> 'iterator':
+    """감싼 구간을 현재 요청의 직렬화 시간에 더함. 요청 밖에서는 아무것도 하지 않는다
+    """
+    sample = getattr(_local, 'sample', None)
+    if sample is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.serialization_duration += time.perf_counter() - start
+
+
+def record(view, values) -> None:
+    """view 의 히스토그램들에 (이름, 값) 목록을 기록
+    """
+    assert isinstance(view, str)
+
+    with _histograms_lock:
+        for name, value in values:
+            histogram = _histograms.get((name, view))
+            if histogram is None:
+                histogram = Histogram(HISTOGRAMS[name][1])
+                _histograms[(name, view)] = histogram
+
+            histogram.observe(value)
+
+
+def reset() -> None:
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def render_metrics() -> str:
+    """Prometheus 텍스트 형식으로 출력. 값은 이 프로세스(워커)의 것이다
+    """
+    lines = []
+
+    with _histograms_lock:
+        for name, (description, _) in HISTOGRAMS.items():
+            metric = PREFIX + name
+            lines.append('# HELP {} {}'.format(metric, description))
+            lines.append('# TYPE {} histogram'.format(metric))
+
+            views = sorted(view for histogram_name, view in _histograms if histogram_name == name)
+            for view in views:
+                histogram = _histograms[(name, view)]
+                cumulative_count = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative_count += count
+                    lines.append('{}_bucket{{view="{}",le="{}"}} {}'.format(metric, view, bound, cumulative_count))
+
+                lines.append('{}_sum{{view="{}"}} {}'.format(metric, view, histogram.sum))
+                lines.append('{}_count{{view="{}"}} {}'.format(metric, view, histogram.count))
+
+    for name, (description, get_value) in COUNTERS.items():
+        metric = PREFIX + name
+        lines.append('# HELP {} {}'.format(metric, description))
+        lines.append('# TYPE {} counter'.format(metric))
+        lines.append('{} {}'.format(metric, get_value()))
+
+    return '\n'.join(lines) + '\n'
+
+
+def _count_query(execute, sql, params, many, context) -> 'object':
+    sample = getattr(_local, 'sample', None)
+    if sample is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.db_duration += time.perf_counter() - start
+        sample.queries += 1
@@ -0,0 +1,32 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(score, price, item_id) -> str:
+    """정렬 키 (점수, 가격, id) 를 불투명한 문자열로 만듦
+    """
+    assert isinstance(score, int)
+    assert isinstance(price, int)
+    assert isinstance(item_id, int)
+
+    value = json.dumps((score, price, item_id), separators=(',', ':')).encode('ascii')
+
+    return base64.urlsafe_b64encode(value).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor) -> '(int, int, int)':
+    """encode_cursor 의 반대. 잘못된 값이면 ValueError
+    """
+    assert isinstance(cursor, str)
+
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + padding).decode('ascii'))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise ValueError('cursor is wrong') from error
+
+    if not isinstance(value, list) or len(value) != 3 or not all(type(key) is int for key in value):
+        raise ValueError('cursor is wrong')
+
+    return tuple(value)
@@ -0,0 +1,149 @@
+"""여러 피부 타입을 가중치로 섞은 정렬
+
+skin_type=oily:0.7,sensitive:0.3 처럼 피부 타입 별 가중치를 주면 세 점수 열의 가중 합 내림차순, 가격, id 순으로 정렬한다.
+"""
+import collections
+import math
+import numpy
+from myapp.home.snapshots import CatalogSnapshot
+from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS, SKIN_TYPES
+from myapp.item.models import Item
+
+
+SCORE_TABLE_FIELDS = ('id', 'price', 'category') + tuple(SKIN_TYPE_TO_SCORE_FIELDS.values())
+# 가중 합을 이 자리에서 반올림한다. 수학적으로 같은 점수가 부동소수점 오차로 순서가 갈리지 않게 한다
+SCORE_DECIMALS = 6
+
+class ScoreTable:
+    """상품 전체의 id, 가격, 분류, 피부 타입 별 점수를 NumPy 배열로 들고 있는 표
+    """
+
+    def __init__(self, rows, version) -> None:
+        assert isinstance(rows, collections.abc.Iterable)
+        assert isinstance(version, int)
+
+        self.version = version
+
+        ids = []
+        prices = []
+        categories = []
+        scores = []
+        for item_id, price, category, *item_scores in rows:
+            ids.append(item_id)
+            prices.append(price)
+            categories.append(category)
+            scores.extend(item_scores)
+
+        self.ids = numpy.array(ids, dtype=numpy.int64)
+        self.prices = numpy.array(prices, dtype=numpy.int64)
+        self.scores = numpy.array(scores, dtype=numpy.float64).reshape(len(ids), len(SKIN_TYPES))
+
+        names, codes = numpy.unique(numpy.array(categories, dtype=object), return_inverse=True)
+        self.category_codes = {name: code for code, name in enumerate(names.tolist())}
+        self.categories = codes.astype(numpy.int32)
+
+    def rank(self, profile, category=None, item_ids=None, excluded_ids=None, count=None) -> 'numpy.ndarray':
+        """profile 순서로 정렬한 상품 id. category, item_ids 를 주면 그 안에서, excluded_ids 를 주면 그것을 빼고 고른다
+
+        count 를 주면 앞의 count 개만 정렬해서 반환한다
+        """
+        assert isinstance(profile, collections.abc.Mapping)
+        assert item_ids is None or isinstance(item_ids, numpy.ndarray)
+        assert excluded_ids is None or isinstance(excluded_ids, numpy.ndarray)
+        assert count is None or isinstance(count, int)
+
+        mask = numpy.ones(len(self.ids), dtype=bool)
+        if category is not None:
+            code = self.category_codes.get(category.lower())
+            if code is None:
+                return numpy.zeros(0, dtype=numpy.int64)
+
+            mask &= self.categories == code
+
+        if item_ids is not None:
+            mask &= numpy.isin(self.ids, item_ids)
+
+        if excluded_ids is not None:
+            mask &= ~numpy.isin(self.ids, excluded_ids)
+
+        ids, prices, scores = self.ids[mask], self.prices[mask], self.scores[mask]
+
+        weights = numpy.array([profile.get(skin_type, 0.0) for skin_type in SKIN_TYPES])
+        weighted = numpy.round(scores @ weights, SCORE_DECIMALS)
+
+        # 앞의 count 개에 들 수 있는 점수(count 번째 점수 이상)만 남겨 정렬한다
+        if count is not None and count < len(ids):
+            if count <= 0:
+                return numpy.zeros(0, dtype=numpy.int64)
+
+            threshold = -numpy.partition(-weighted, count - 1)[count - 1]
+            top = weighted >= threshold
+            ids, prices, weighted = ids[top], prices[top], weighted[top]
+
+        order = numpy.lexsort((ids, prices, -weighted))
+        if count is not None:
+            order = order[:count]
+
+        return ids[order]
+
+
+def parse_profile(value) -> '{str: float}':
+    """'oily:0.7,sensitive:0.3' 을 피부 타입 별 가중치로 바꿈. 가중치를 빼면 1 이다
+
+    합이 1 이 되도록 나누고 가중치가 0 인 피부 타입은 뺀다. 잘못된 값이면 ValueError
+    """
+    assert isinstance(value, str)
+
+    profile = {}
+    for part in value.split(','):
+        skin_type, separator, weight = part.partition(':')
+        skin_type = skin_type.strip()
+        weight = float(weight) if separator else 1.0
+
+        if skin_type not in SKIN_TYPE_TO_SCORE_FIELDS or skin_type in profile:
+            raise ValueError('skin_type is wrong')
+
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError('weight is wrong')
+
+        profile[skin_type] = weight
+
+    # 큰 가중치의 합은 inf 가 되어 나눈 값이 모두 0 이 된다
+    total = sum(profile.values())
+    if not total or not math.isfinite(total):
+        raise ValueError('weight is wrong')
+
+    profile = {skin_type: weight / total for skin_type, weight in profile.items() if weight / total}
+    if not profile:
+        raise ValueError('weight is wrong')
+
+    return profile
+
+
+def format_profile(profile) -> str:
+    """parse_profile 결과를 하나의 문자열로. 같은 가중치면 같은 문자열이 되어 응답 캐시 키로 쓸 수 있다
+
+    피부 타입이 하나뿐이면 그 이름이다
+    """
+    assert isinstance(profile, collections.abc.Mapping)
+
+    if len(profile) == 1:
+        return next(iter(profile))
+
+    return ','.join('{}:{}'.format(skin_type, round(profile[skin_type], SCORE_DECIMALS))
+                    for skin_type in SKIN_TYPES if skin_type in profile)
+
+
+def get_score_table(is_blocking=False) -> 'ScoreTable':
+    """현재 카탈로그 버전의 점수 표. 카탈로그가 바뀌었으면 다시 만드는 동안 이전 표를 돌려줄 수 있다
+    """
+    return _table.get(is_blocking)
+
+
+def _build_score_table(version) -> 'ScoreTable':
+    rows = Item.objects.order_by('id').values_list(*SCORE_TABLE_FIELDS).iterator()
+
+    return ScoreTable(rows, version)
+
+
+_table = CatalogSnapshot('profiles', _build_score_table)
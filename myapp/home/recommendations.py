@@ -0,0 +1,80 @@
+import collections
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from myapp.home.snapshots import CatalogSnapshot
+from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS
+from myapp.item.models import Item
+
+
+MAX_RECOMMEND_ITEM_COUNT = 3
+
+class RecommendationTable:
+    """(분류, 피부 타입) 마다 앞쪽 MAX_RECOMMEND_ITEM_COUNT + 1 개 상품을 미리 구해 둔 표
+
+    자기 자신이 들어 있으면 빼고도 추천 개수를 채울 수 있도록 하나 더 둔다
+    """
+
+    def __init__(self, version) -> None:
+        assert isinstance(version, int)
+
+        self.version = version
+        self.entries = {}
+
+        for skin_type in SKIN_TYPE_TO_SCORE_FIELDS:
+            top_entries = query_top_items(None, skin_type, MAX_RECOMMEND_ITEM_COUNT + 1)
+            for category, entries in top_entries.items():
+                self.entries[(category, skin_type)] = entries
+
+    def recommend(self, category, skin_type, item_id) -> '[Item]':
+        """같은 분류에서 item_id 를 뺀 추천 상품
+        """
+        assert isinstance(category, str)
+        assert skin_type in SKIN_TYPE_TO_SCORE_FIELDS
+        assert isinstance(item_id, int)
+
+        entries = self.entries.get((category, skin_type), ())
+        entries = [entry for entry in entries if entry.id != item_id]
+
+        return entries[:MAX_RECOMMEND_ITEM_COUNT]
+
+
+def get_recommendation_table(is_blocking=False) -> 'RecommendationTable':
+    """현재 카탈로그 버전의 추천 표. 점수나 가격이 바뀌어 버전이 오르면 다시 만드는 동안 이전 표를 돌려줄 수 있다
+    """
+    return _table.get(is_blocking)
+
+
+def query_top_items(categories, skin_type, count) -> '{str: [Item]}':
+    """분류마다 피부 타입 순서로 앞의 count 개를 한 번의 조회로 가져옴. categories 가 None 이면 모든 분류
+    """
+    assert categories is None or isinstance(categories, collections.abc.Set)
+    assert skin_type in SKIN_TYPE_TO_SCORE_FIELDS
+    assert isinstance(count, int)
+
+    result = collections.defaultdict(list)
+    entries = Item.objects.all()
+
+    if categories is not None:
+        if not categories:
+            return result
+
+        entries = entries.filter(category__in=categories)
+
+    score_field = SKIN_TYPE_TO_SCORE_FIELDS[skin_type]
+    rank = Window(
+        expression=RowNumber(),
+        partition_by=[F('category')],
+        order_by=[F(score_field).desc(), F('price').asc(), F('id').asc()])
+    entries = entries.annotate(category_rank=rank)
+
+    # 윈도우 함수 결과로는 바로 거를 수 없으므로 파생 테이블로 감싼다
+    sql, params = entries.query.sql_with_params()
+    sql = 'SELECT * FROM ({}) ranked WHERE ranked.category_rank <= %s ORDER BY ranked.category_rank'.format(sql)
+
+    for entry in Item.objects.raw(sql, params + (count,)):
+        result[entry.category].append(entry)
+
+    return result
+
+
+_table = CatalogSnapshot('recommendations', RecommendationTable)
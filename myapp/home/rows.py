@@ -0,0 +1,155 @@
+"""뷰가 쓰는 열만 읽는 상품 조회
+
+Item 모델 대신 필요한 열만 담은 namedtuple 을 만든다. 같은 모양의 조회는 SQL 을 한 번만 컴파일해 두고
+값만 바꿔 실행하므로 요청마다 QuerySet 을 만들고 컴파일하지 않는다.
+"""
+import collections
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, router
+from myapp.home.cache import LRUCache
+from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS
+from myapp.item.models import Item
+
+
+# 목록(products, search, export)에 쓰는 열. 다음 페이지 cursor 를 만들도록 피부 타입 점수를 붙인다
+PRODUCT_FIELDS = ('id', 'imageId', 'name', 'price', 'ingredients', 'monthlySales')
+DETAIL_FIELDS = ('id', 'imageId', 'name', 'price', 'gender', 'category', 'ingredients', 'monthlySales')
+COMPILED_QUERY_CACHE_MAX_BYTES = 1024 * 1024
+# 컴파일할 때 실제 값 대신 넣는 값. 컴파일된 params 에서 찾아 실제 값의 자리를 알아낸다
+MARKER_INT_BASE = -30000
+MARKER_STR_FORMAT = 'marker{}\x00'
+
+PRODUCT_ROW_TYPES = {
+    skin_type: collections.namedtuple('ProductRow', PRODUCT_FIELDS + (score_field,))
+    for skin_type, score_field in SKIN_TYPE_TO_SCORE_FIELDS.items()
+}
+DetailRow = collections.namedtuple('DetailRow', DETAIL_FIELDS)
+ROW_TYPES = tuple(PRODUCT_ROW_TYPES.values()) + (DetailRow,)
+
+_compiled = LRUCache(COMPILED_QUERY_CACHE_MAX_BYTES)
+# 캐시할 수 없는 모양. 매번 ORM 으로 읽는다
+_UNCOMPILABLE = ('', ())
+
+
+def fetch_rows(name, row_type, build, arguments, offset=0, limit=None) -> list:
+    """build(arguments) 가 만드는 Item 조회에서 row_type 의 열만 읽어 offset 부터 limit 개를 row_type 으로 반환
+
+    name 은 arguments 의 값 말고 SQL 을 바꾸는 것(정렬 필드 등)을 모두 담은 키다.
+    arguments 의 값(문자열, 정수와 그 집합/튜플)은 바뀌지 않고 params 로만 들어가야 한다. 처음 보는 모양이면 값을 자리 표시 값으로
+    바꿔 한 번 컴파일해 두고, 이후에는 그 SQL 에 값만 넣어 실행한다
+    """
+    assert isinstance(arguments, collections.abc.Mapping)
+    assert row_type in ROW_TYPES
+    assert isinstance(offset, int)
+
+    alias = router.db_for_read(Item)
+    key = (name, row_type, alias, _shape(arguments))
+
+    compiled = _compiled.get(key)
+    if compiled is None:
+        compiled = _compile(row_type, build, arguments, alias)
+        _compiled.set(key, compiled, len(compiled[0]) + len(compiled[1]))
+
+    sql, positions = compiled
+    if not sql:
+        entries = build(arguments).values_list(*row_type._fields)
+        if limit is None:
+            entries = entries[offset:]
+        else:
+            entries = entries[offset:offset + limit]
+
+        return [row_type._make(entry) for entry in entries]
+
+    values = list(_flatten(arguments))
+    params = [values[position] for position in positions]
+
+    connection = connections[alias]
+    if limit == 0:
+        return []
+    elif offset or limit is not None:
+        sql += connection.ops.limit_offset_sql(offset, None if limit is None else offset + limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+        return [row_type._make(entry) for entry in cursor.fetchall()]
+
+
+def clear_compiled_queries() -> None:
+    _compiled.clear()
+
+
+def _compile(row_type, build, arguments, alias) -> '(str, (int,))':
+    markers = [_marker(index, value) for index, value in enumerate(_flatten(arguments))]
+    marker_arguments = _replace(arguments, iter(markers))
+
+    entries = build(marker_arguments).values_list(*row_type._fields)
+    compiler = entries.query.get_compiler(using=alias)
+    try:
+        sql, params = compiler.as_sql()
+    except EmptyResultSet:
+        return _UNCOMPILABLE
+
+    # 열 값을 바꾸는 변환기가 있으면 cursor 결과를 그대로 쓸 수 없다
+    if compiler.get_converters([column for column, _, _ in compiler.select]):
+        return _UNCOMPILABLE
+
+    # params 가 모두 자리 표시 값이고 모든 값이 들어갔을 때만 자리를 믿을 수 있다. 같은 값이 두 번 쓰일 수는 있다
+    marker_positions = {marker: index for index, marker in enumerate(markers)}
+    positions = tuple(marker_positions.get(param) for param in params)
+    if None in positions or set(positions) != set(range(len(markers))):
+        return _UNCOMPILABLE
+
+    return sql, positions
+
+
+def _marker(index, value) -> 'int or str':
+    if isinstance(value, int):
+        return MARKER_INT_BASE - index
+
+    assert isinstance(value, str)
+
+    return MARKER_STR_FORMAT.format(index)
+
+
+def _shape(arguments) -> tuple:
+    """arguments 에서 값을 뺀 모양. 집합은 크기에 따라 params 수가 달라진다
+    """
+    shape = []
+    for key in sorted(arguments):
+        value = arguments[key]
+        if isinstance(value, (collections.abc.Set, tuple, list)):
+            shape.append((key, type(value), len(value)))
+        else:
+            shape.append((key, type(value)))
+
+    return tuple(shape)
+
+
+def _flatten(arguments) -> 'iterator':
+    """arguments 의 값을 _shape 와 같은 순서로 하나씩. 집합은 정렬해서 순서를 고정한다
+    """
+    for key in sorted(arguments):
+        value = arguments[key]
+        if isinstance(value, collections.abc.Set):
+            yield from sorted(value)
+        elif isinstance(value, (tuple, list)):
+            yield from value
+        else:
+            yield value
+
+
+def _replace(arguments, values) -> dict:
+    """arguments 와 같은 모양에 값을 _flatten 순서대로 values 에서 채움
+    """
+    result = {}
+    for key in sorted(arguments):
+        value = arguments[key]
+        if isinstance(value, collections.abc.Set):
+            result[key] = {next(values) for _ in value}
+        elif isinstance(value, (tuple, list)):
+            result[key] = type(value)(next(values) for _ in value)
+        else:
+            result[key] = next(values)
+
+    return result
@@ -0,0 +1,159 @@
+import array
+import collections
+import numpy
+from myapp.home.snapshots import CatalogSnapshot
+from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS
+from myapp.item.models import Item
+
+
+GRAM_SIZE = 2
+# 가장 짧은 bigram 목록을 이만큼씩 나눠 교집합을 구한다. 한 페이지를 채우면 나머지는 보지 않는다
+BLOCK_SIZE = 256
+SEARCH_FIELDS = ('id', 'name', 'price', 'oilyScore', 'dryScore', 'sensitiveScore')
+
+
+class SearchIndex:
+    """상품 이름의 글자 bigram -> 상품 역색인
+
+    피부 타입마다 상품을 (점수 내림차순, 가격, id) 순위로 바꾸고, bigram 별 목록을 그 순위 순서로 저장한다.
+    따라서 여러 bigram 목록의 교집합이 그대로 products() 와 같은 순서가 된다.
+    bigram 이 모두 들어 있어도 이어져 있지 않을 수 있으므로, bigram 이 둘 이상인 검색어는 호출한 쪽에서 이름을 확인해야 한다
+    """
+
+    def __init__(self, rows, version) -> None:
+        assert isinstance(rows, collections.abc.Iterable)
+        assert isinstance(version, int)
+
+        self.version = version
+
+        columns = {field: array.array('q') for field in SEARCH_FIELDS if field != 'name'}
+        gram_ids = {}
+        name_to_gram_ids = {}
+        pair_gram_ids = array.array('i')
+        pair_positions = array.array('i')
+
+        for position, row in enumerate(rows):
+            for field, value in zip(SEARCH_FIELDS, row):
+                if field != 'name':
+                    columns[field].append(value)
+
+            # 같은 이름의 상품이 많으므로 이름 별로 한 번만 나눈다
+            name = row[1]
+            item_gram_ids = name_to_gram_ids.get(name)
+            if item_gram_ids is None:
+                item_gram_ids = [gram_ids.setdefault(gram, len(gram_ids)) for gram in split_grams(name)]
+                name_to_gram_ids[name] = item_gram_ids
+
+            pair_gram_ids.extend(item_gram_ids)
+            pair_positions.extend([position] * len(item_gram_ids))
+
+        self.count = len(columns['id'])
+        self.gram_ids = gram_ids
+
+        pair_gram_ids = numpy.frombuffer(pair_gram_ids, dtype=numpy.int32) if pair_gram_ids else \
+            numpy.zeros(0, dtype=numpy.int32)
+        pair_positions = numpy.frombuffer(pair_positions, dtype=numpy.int32) if pair_positions else \
+            numpy.zeros(0, dtype=numpy.int32)
+
+        # bigram 별 목록의 시작 위치. 피부 타입과 관계없이 같다
+        counts = numpy.bincount(pair_gram_ids, minlength=len(gram_ids))
+        self.starts = numpy.concatenate(([0], numpy.cumsum(counts))).astype(numpy.int64)
+
+        ids = numpy.array(columns['id'], dtype=numpy.int64)
+        prices = numpy.array(columns['price'], dtype=numpy.int64)
+
+        # 피부 타입 별 순위 -> 상품 id, 그리고 bigram 별로 이어 붙인 순위 목록
+        self.ids = {}
+        self.postings = {}
+        for skin_type, field in SKIN_TYPE_TO_SCORE_FIELDS.items():
+            scores = numpy.array(columns[field], dtype=numpy.int64)
+            order = numpy.lexsort((ids, prices, -scores))
+            ranks = numpy.empty(self.count, dtype=numpy.uint32)
+            ranks[order] = numpy.arange(self.count, dtype=numpy.uint32)
+
+            pair_ranks = ranks[pair_positions]
+            self.postings[skin_type] = pair_ranks[numpy.lexsort((pair_ranks, pair_gram_ids))]
+            self.ids[skin_type] = ids[order].astype(numpy.int32)
+
+    def search(self, query, skin_type) -> 'numpy.ndarray':
+        """검색어의 bigram 이 모두 들어 있는 상품 id 를 정렬 순서대로 반환
+        """
+        blocks = list(self.iter_search(query, skin_type))
+        if not blocks:
+            return numpy.zeros(0, dtype=numpy.int32)
+
+        return numpy.concatenate(blocks)
+
+    def iter_search(self, query, skin_type, block_size=BLOCK_SIZE) -> 'iterator':
+        """search() 결과를 앞에서부터 나눠 돌려줌. 필요한 만큼만 읽으면 뒤쪽의 교집합은 구하지 않는다
+        """
+        assert isinstance(query, str)
+        assert skin_type in self.postings
+        assert isinstance(block_size, int)
+
+        postings = []
+        for gram in split_grams(query):
+            gram_id = self.gram_ids.get(gram)
+            if gram_id is None:
+                return
+
+            postings.append(self.postings[skin_type][self.starts[gram_id]:self.starts[gram_id + 1]])
+
+        if not postings:
+            return
+
+        # 가장 짧은 목록에서 시작해 나머지 목록에서 이진 탐색으로 걸러낸다. 순서는 그대로 유지된다
+        postings.sort(key=len)
+        ids = self.ids[skin_type]
+
+        for start in range(0, len(postings[0]), block_size):
+            ranks = postings[0][start:start + block_size]
+
+            for posting in postings[1:]:
+                indices = numpy.searchsorted(posting, ranks)
+                indices[indices == len(posting)] = 0
+                ranks = ranks[posting[indices] == ranks]
+
+                if not len(ranks):
+                    break
+
+            if len(ranks):
+                yield ids[ranks]
+
+    def is_exact(self, query) -> bool:
+        """search() 결과가 이름을 확인하지 않아도 정답인지. 검색어가 bigram 하나 길이면 이어져 있는지 볼 필요가 없다
+
+        bigram 집합 크기로 가리면 aaa 처럼 같은 bigram 이 되풀이되는 검색어를 aab 에도 맞춘다
+        """
+        assert isinstance(query, str)
+
+        return len(normalize_name(query)) <= GRAM_SIZE
+
+
+def normalize_name(name) -> str:
+    """검색에 쓰는 형태. 대소문자와 공백을 무시한다
+    """
+    assert isinstance(name, str)
+
+    return ''.join(name.lower().split())
+
+
+def split_grams(name) -> '{str}':
+    name = normalize_name(name)
+
+    return {name[index:index + GRAM_SIZE] for index in range(len(name) - GRAM_SIZE + 1)}
+
+
+def get_search_index(is_blocking=False) -> 'SearchIndex':
+    """현재 카탈로그 버전의 검색 색인. 카탈로그가 바뀌었으면 다시 만드는 동안 이전 색인을 돌려줄 수 있다
+    """
+    return _index.get(is_blocking)
+
+
+def _build_search_index(version) -> 'SearchIndex':
+    rows = Item.objects.order_by('id').values_list(*SEARCH_FIELDS).iterator()
+
+    return SearchIndex(rows, version)
+
+
+_index = CatalogSnapshot('search', _build_search_index)
@@ -0,0 +1,182 @@
+import collections
+import json
+import threading
+import urllib.parse
+from django.conf import settings
+from myapp.home.cache import LRUCache
+from myapp.home.engine import ItemRow
+from myapp.home.rows import ROW_TYPES
+from myapp.item.catalog import get_catalog_version
+from myapp.item.models import Item
+
+
+RESOURCE_URL = 'https://grepp-programmers-challenges.s3.ap-northeast-2.amazonaws.com/2020-birdview/'
+JSON_PARAMETERS = {'ensure_ascii': False}
+# 상품 하나의 조각을 저장할 때 본문 외에 드는 대략적인 바이트 수
+FRAGMENT_OVERHEAD = 128
+
+_fragments = None
+_fragments_version = None
+_fragments_lock = threading.Lock()
+
+
+def serialize_entries(entries, fields, is_thumbnail, version=None) -> bytes:
+    """상품 목록을 JSON 배열로 직렬화. 상품마다 미리 인코딩해 둔 조각을 이어 붙인다
+
+    version 은 응답 하나가 따르는 카탈로그 버전이다. 주지 않으면 한 번 읽어 모든 상품에 쓴다
+    """
+    assert isinstance(entries, collections.abc.Iterable)
+
+    if version is None:
+        version = get_catalog_version()
+
+    fragments = [serialize_entry(entry, fields, is_thumbnail, version) for entry in entries]
+
+    return join_fragments(fragments)
+
+
+def join_fragments(fragments) -> bytes:
+    """인코딩된 JSON 객체들을 하나의 배열로 이어 붙임
+    """
+    assert isinstance(fragments, collections.abc.Sequence)
+
+    return b'[' + b', '.join(fragments) + b']'
+
+
+def serialize_entry(entry, fields, is_thumbnail, version) -> bytes:
+    """상품 하나를 JSON 객체로 직렬화. (상품, 필드, 썸네일 여부) 별로 인코딩 결과를 캐시한다
+
+    version 은 get_catalog_version() 으로 응답마다 한 번 읽은 값이다. 조각 캐시가 이미 더 새 버전을 따르고 있으면
+    캐시를 거치지 않는다
+    """
+    assert isinstance(entry, (Item, ItemRow) + ROW_TYPES)
+    assert isinstance(fields, tuple)
+    assert isinstance(is_thumbnail, bool)
+    assert isinstance(version, int)
+
+    cache = _get_fragments(version)
+    if cache is None:
+        return encode_entry(entry, fields, is_thumbnail)
+
+    shape = (fields, is_thumbnail)
+
+    shapes = cache.get(entry.id)
+    if shapes is not None:
+        fragment = shapes.get(shape)
+        if fragment is not None:
+            return fragment
+    else:
+        shapes = {}
+
+    fragment = encode_entry(entry, fields, is_thumbnail)
+
+    shapes = dict(shapes)
+    shapes[shape] = fragment
+    size = sum(len(value) for value in shapes.values()) + FRAGMENT_OVERHEAD * len(shapes)
+    cache.set(entry.id, shapes, size)
+
+    return fragment
+
+
+def encode_entry(entry, fields, is_thumbnail) -> bytes:
+    """캐시를 거치지 않고 상품 하나를 JSON 객체로 인코딩. 한 번만 쓰는 내보내기 등에 쓴다
+    """
+    result = extract_data_from_entry(entry, fields, is_thumbnail)
+
+    return json.dumps(result, **JSON_PARAMETERS).encode('utf-8')
+
+
+def invalidate_fragments(item_ids=None) -> None:
+    """상품 조각을 지움. item_ids 가 None 이면 모두 지운다
+    """
+    assert item_ids is None or isinstance(item_ids, collections.abc.Iterable)
+
+    cache = _get_fragment_cache()
+
+    if item_ids is None:
+        cache.clear()
+    else:
+        for item_id in item_ids:
+            cache.delete(item_id)
+
+
+def on_catalog_changed(sender, version, item_ids, **kwargs) -> None:
+    """이 프로세스에서 일어난 변경은 바뀐 상품만 지운다
+
+    바로 앞 버전까지 따라와 있었을 때만 그렇게 하고, 그 사이 다른 워커의 변경이 끼어 있으면 모두 지운다
+    """
+    global _fragments_version
+
+    if _fragments_version == version - 1:
+        _fragments_version = version
+        invalidate_fragments(item_ids)
+    else:
+        _fragments_version = version
+        invalidate_fragments()
+
+
+def build_image_url(image_id, is_thumbnail = True) -> str:
+    assert isinstance(image_id, str)
+    assert isinstance(is_thumbnail, bool)
+
+    if is_thumbnail:
+        path = 'thumbnail'
+    else:
+        path = 'image'
+
+    file_name = image_id + '.jpg'
+    path = '/'.join((path, file_name))
+
+    return urllib.parse.urljoin(RESOURCE_URL, path)
+
+
+def extract_data_from_entry(entry, fields, is_thumbnail) -> '{str: object}':
+    assert isinstance(entry, (Item, ItemRow) + ROW_TYPES)
+    assert isinstance(fields, collections.abc.Sequence)
+    assert isinstance(is_thumbnail, bool)
+
+    result = {}
+
+    for field in fields:
+        value = getattr(entry, field)
+        result[field] = value
+
+    image_url = build_image_url(entry.imageId, is_thumbnail)
+    result['imgUrl'] = image_url
+
+    return result
+
+
+def _get_fragments(version) -> 'LRUCache or None':
+    """version 의 조각 캐시. 더 새 버전의 응답이 이미 캐시를 채우고 있으면 None
+    """
+    global _fragments_version
+
+    cache = _get_fragment_cache()
+    if _fragments_version == version:
+        return cache
+
+    with _fragments_lock:
+        # 다른 워커에서 일어난 변경은 어떤 상품인지 모르므로 모두 지운다
+        if _fragments_version is None or _fragments_version < version:
+            if _fragments_version is not None:
+                cache.clear()
+
+            _fragments_version = version
+
+        if _fragments_version != version:
+            return None
+
+    return cache
+
+
+def _get_fragment_cache() -> 'LRUCache':
+    global _fragments
+
+    max_bytes = settings.CATALOG_FRAGMENT_CACHE_MAX_BYTES
+    if _fragments is None or _fragments.max_bytes != max_bytes:
+        with _fragments_lock:
+            if _fragments is None or _fragments.max_bytes != max_bytes:
+                _fragments = LRUCache(max_bytes)
+
+    return _fragments
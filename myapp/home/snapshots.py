@@ -0,0 +1,102 @@
+"""카탈로그 버전마다 다시 만드는 메모리 구조
+
+엔진, 추천 표, 점수 표, 검색 색인이 같은 방식으로 쓴다. 카탈로그가 바뀌면 요청을 처리하는 스레드가 아니라
+백그라운드 스레드에서 다시 만들고, 그동안 요청에는 이전 구조를 돌려준다.
+"""
+import threading
+from django.conf import settings
+from django.db import connection, connections
+from myapp.item.catalog import get_catalog_version
+
+
+_served = threading.local()
+
+
+class CatalogSnapshot:
+    """build(version) 이 만드는 구조(version 속성이 있어야 한다)를 카탈로그 버전마다 한 번 만들어 나눠 씀
+
+    버전이 바뀌면 백그라운드 스레드에서 다시 만든다. 요청은 CATALOG_REBUILD_WAIT 초까지 기다리고,
+    그래도 끝나지 않으면 이전 구조를 돌려준다. 돌려줄 구조가 없는 처음 한 번은 끝날 때까지 기다린다.
+    다시 만드는 동안에는 두 벌이 메모리에 있다
+    """
+
+    def __init__(self, name, build) -> None:
+        assert isinstance(name, str)
+        assert callable(build)
+
+        self.name = name
+        self._build = build
+        self._value = None
+        self._error = None
+        self._is_building = False
+        self._condition = threading.Condition()
+
+    def get(self, is_blocking=False) -> object:
+        """현재 카탈로그 버전의 구조. is_blocking 이면 이전 구조를 돌려주지 않고 다 만들 때까지 기다린다
+        """
+        version = get_catalog_version()
+        value = self._value
+        if value is not None and value.version >= version:
+            return value
+
+        # 트랜잭션 안에서 바꾼 데이터는 다른 연결에서 보이지 않으므로 이 연결에서 만든다
+        if connection.in_atomic_block:
+            with self._condition:
+                if self._value is None or self._value.version < version:
+                    self._value = self._build(version)
+
+                return self._value
+
+        with self._condition:
+            if not self._is_building:
+                self._is_building = True
+                self._error = None
+                thread = threading.Thread(target=self._run, name='catalog-' + self.name, daemon=True)
+                thread.start()
+
+            timeout = None if is_blocking or self._value is None else settings.CATALOG_REBUILD_WAIT
+            self._condition.wait_for(lambda: self._is_ready(version), timeout)
+
+            if self._value is None:
+                raise self._error
+
+            if self._value.version < version:
+                _served.stale_count = get_stale_count() + 1
+
+            return self._value
+
+    def _is_ready(self, version) -> bool:
+        if self._value is not None and self._value.version >= version:
+            return True
+
+        return not self._is_building
+
+    def _run(self) -> None:
+        try:
+            while True:
+                version = get_catalog_version()
+                value = self._build(version)
+
+                with self._condition:
+                    self._value = value
+                    self._condition.notify_all()
+
+                    # 만드는 동안 카탈로그가 또 바뀌었으면 한 번 더 만든다
+                    if get_catalog_version() <= version:
+                        self._is_building = False
+
+                        return
+        except Exception as error:
+            with self._condition:
+                self._error = error
+                self._is_building = False
+                self._condition.notify_all()
+        finally:
+            # 이 스레드의 DB 연결은 다시 쓰이지 않는다
+            connections.close_all()
+
+
+def get_stale_count() -> int:
+    """이 스레드에서 CatalogSnapshot.get() 이 이전 버전의 구조를 돌려준 횟수. 응답을 캐시해도 되는지 가릴 때 쓴다
+    """
+    return getattr(_served, 'stale_count', 0)
@@ -1,23 +1,45 @@
 import functools
+import gzip
 import json
 import operator
-from django.db.models import Max, Q
-from django.http import HttpRequest
-from django.test import Client, RequestFactory, TestCase
-from myapp.item.models import Item
-from myapp.home.views import _build_image_url, _get_arguments, product, products, ITEM_PER_PAGE, RESOURCE_URL, \
-    MAX_RECOMMEND_ITEM_COUNT
+import threading
+import time
+import types
+from unittest import mock
+from django.conf import settings
+from django.db import connection, router
+from django.db.models import F, Max, Q
+from django.http import HttpRequest, HttpResponse
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+from myapp.db import check_connections, using_replica
+from myapp.home.cache import LRUCache, SingleFlight, build_cache_key, cached_response, get_response_cache, statistics
+from myapp.home import metrics
+from myapp.home.engine import get_engine
+from myapp.home.profiles import format_profile, parse_profile
+from myapp.home.recommendations import get_recommendation_table
+from myapp.home import rows
+from myapp.home.snapshots import CatalogSnapshot, get_stale_count
+from myapp.home.search import SearchIndex, normalize_name
+from myapp.home import warmup
+from myapp.home.warmup import is_warm, start_warm_up, warm_up
+from myapp.item.catalog import bump_catalog_version, get_catalog_version
+from myapp.item.models import CatalogVersion, Item
+from myapp.home.serializers import RESOURCE_URL, build_image_url, extract_data_from_entry, serialize_entries
+from myapp.home.views import _export_lines, _fetch_products, _get_arguments, _query_products, export_products, product, products, \
+    products_batch, search, ITEM_PER_PAGE, MAX_RECOMMEND_ITEM_COUNT, SKIN_TYPE_TO_DATABASE_FIELDS
 
 
 # Create your tests here.
 class FunctionTest(TestCase):
     def test_buildImageUrl(self) -> None:
-        url = _build_image_url('test')
+        url = build_image_url('test')
         self.assertTrue(url.startswith(RESOURCE_URL))
         self.assertTrue(url.endswith('.jpg'))
         self.assertIn('/thumbnail/', url)
 
-        url = _build_image_url('test', is_thumbnail=False)
+        url = build_image_url('test', is_thumbnail=False)
         self.assertTrue(url.startswith(RESOURCE_URL))
         self.assertTrue(url.endswith('.jpg'))
         self.assertIn('/image/', url)
@@ -62,6 +84,13 @@ class QueryTest(TestCase):
         response = product(request, item_id=17)
         self.assertEqual(500, response.status_code)
 
+        # 음수 page 는 데이터베이스마다 다르게 동작하므로 읽을 때 거른다
+        for query in ('page=-1', 'page=xxxx', 'cursor=xxxx'):
+            for view in (products, search):
+                response = view(self.requestFactory.get('/products?skin_type=oily&q=abc&' + query))
+                self.assertEqual(500, response.status_code, query)
+                self.assertEqual(query.split('=')[0] + ' is wrong', response.content.decode())
+
     def test_productsTest(self) -> None:
         request = self.requestFactory.get('/products?skin_type=dry')
         response = products(request)
@@ -75,12 +104,13 @@ class QueryTest(TestCase):
         response = products(request)
         self.assertGreaterEqual(3, len(json.loads(response.content)))
 
-        # 건성일 때 점수가 같은 것이 나오는 쿼리
+        # 건성일 때 점수가 같은 것이 나오는 쿼리. moral 은 morale 과 다른 성분이므로 9번 상품은 제외되지 않는다
         request = self.requestFactory.get(
             '/products?skin_type=dry&category=skincare&include_ingredient=mechanism&exclude_ingredient=moral')
         response = products(request)
         results = json.loads(response.content)
-        self.assertEqual(2, len(results))
+        self.assertEqual(3, len(results))
+        self.assertIn(9, [result['id'] for result in results])
         self.assertLessEqual(results[0]['price'], results[1]['price'], '점수가 같으면 가격을 오름차순 정렬해야 합니다')
 
         # 엄지 그림이 들었는지 검사
@@ -109,6 +139,74 @@ class QueryTest(TestCase):
         item_ids = set(result['id'] for result in results)
         self.assertEqual(4, len(item_ids), '동일 상품이 나와서는 안됩니다')
 
+    def test_cursorTest(self) -> None:
+        # 커서로 넘긴 페이지는 page 로 넘긴 페이지와 같아야 한다
+        path = '/products?skin_type=dry&category=suncare'
+        response = products(self.requestFactory.get(path))
+        for page in range(1, 4):
+            cursor = response['X-Next-Cursor']
+            response = products(self.requestFactory.get(path + '&cursor=' + cursor))
+            expected = products(self.requestFactory.get(path + '&page=' + str(page)))
+            self.assertEqual(expected.content, response.content)
+
+        last_page = None
+        while response.has_header('X-Next-Cursor'):
+            last_page = json.loads(response.content)
+            response = products(self.requestFactory.get(path + '&cursor=' + response['X-Next-Cursor']))
+
+        self.assertEqual(ITEM_PER_PAGE, len(last_page))
+        self.assertGreater(ITEM_PER_PAGE, len(json.loads(response.content)))
+
+        response = products(self.requestFactory.get(path + '&cursor=xxxx'))
+        self.assertEqual(500, response.status_code)
+
+    def test_ingredientTokenTest(self) -> None:
+        # 부분 문자열이 아니라 성분 단위로 일치해야 한다
+        request = self.requestFactory.get('/products?skin_type=oily&include_ingredient=moral')
+        results = json.loads(products(request).content)
+        self.assertEqual(0, len(results))
+
+        request = self.requestFactory.get('/products?skin_type=oily&include_ingredient=morale')
+        results = json.loads(products(request).content)
+        self.assertIn(9, [result['id'] for result in results])
+
+        # 대소문자는 구분하지 않는다
+        request = self.requestFactory.get('/products?skin_type=oily&include_ingredient=VENUS')
+        upper_results = json.loads(products(request).content)
+        request = self.requestFactory.get('/products?skin_type=oily&include_ingredient=venus')
+        lower_results = json.loads(products(request).content)
+        self.assertTrue(upper_results)
+        self.assertEqual(upper_results, lower_results)
+
+        request = self.requestFactory.get('/products?skin_type=oily&exclude_ingredient=venus')
+        results = json.loads(products(request).content)
+        for result in results:
+            self.assertNotIn('venus', result['ingredients'].lower().split(','))
+
+    def test_candidatePlan(self) -> None:
+        # 게시 목록에서 시작하는 조회와 정렬 인덱스를 따라가는 조회는 같은 결과여야 한다
+        paths = (
+            '/products?skin_type=dry&category=skincare&include_ingredient=mechanism&exclude_ingredient=moral&facets=category',
+            '/products?skin_type=oily&include_ingredient=venus&facets=category,gender',
+            '/products?skin_type=sensitive&include_ingredient=venus,provision&exclude_ingredient=set',
+            '/products?skin_type=oily&include_ingredient=xxxx',
+        )
+        for path in paths:
+            request = self.requestFactory.get(path)
+            with override_settings(CATALOG_CACHE_ENABLED=False):
+                expected = products(request)
+                with mock.patch('myapp.home.views.MAX_CANDIDATE_COUNT', -1):
+                    actual = products(request)
+
+            self.assertEqual(expected.content, actual.content, path)
+            self.assertEqual(expected.get('X-Facets'), actual.get('X-Facets'), path)
+
+        after = (0, 0, 0)
+        arguments = {'include_ingredient': {'venus'}}
+        with mock.patch('myapp.home.views.MAX_CANDIDATE_COUNT', -1):
+            expected = _fetch_products(arguments, 'oily', after, 0, ITEM_PER_PAGE)
+        self.assertEqual(expected, _fetch_products(arguments, 'oily', after, 0, ITEM_PER_PAGE))
+
     def test_categoryQuery(self) -> None:
         """
         select * from mydb.item_item
@@ -153,4 +251,1099 @@ class QueryTest(TestCase):
         ingredient0 = 'multimedia'
         ingredient1 = 'provision'
         result = self.entries.filter(Q(ingredients__icontains=ingredient0) & Q(ingredients__icontains=ingredient1))
-        self.assertEqual(1, len(result))
\ No newline at end of file
+        self.assertEqual(1, len(result))
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class EngineTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def setUp(self) -> None:
+        self.requestFactory = RequestFactory()
+
+    def tearDown(self) -> None:
+        # 테스트 끝의 롤백은 시그널이 없으므로 적재해 둔 엔진을 직접 무효화
+        bump_catalog_version()
+
+    def test_sameAsDatabase(self) -> None:
+        ingredients = ('mechanism', 'moral', 'venus', 'set', 'provision', 'multimedia', 'xxxx')
+        paths = []
+        for skin_type in ('oily', 'dry', 'sensitive'):
+            for category in ('', 'skincare', 'SunCare', 'xxxx'):
+                for page in ('', '1', '5', '30'):
+                    paths.append('/products?skin_type={}&category={}&page={}'.format(skin_type, category, page))
+
+            for include, exclude in zip(ingredients, reversed(ingredients)):
+                paths.append('/products?skin_type={}&include_ingredient={}&exclude_ingredient={}'.format(
+                    skin_type, include, exclude))
+                paths.append('/products?skin_type={}&category=maskpack&exclude_ingredient={},{}'.format(
+                    skin_type, include, exclude))
+                paths.append('/products?skin_type={}&include_ingredient={},provision'.format(skin_type, include))
+
+        for path in paths:
+            request = self.requestFactory.get(path)
+            expected = products(request).content
+
+            with override_settings(CATALOG_ENGINE_ENABLED=True):
+                actual = products(request).content
+
+            self.assertEqual(expected, actual, path)
+
+    def test_cursorSameAsDatabase(self) -> None:
+        for skin_type in ('oily', 'sensitive'):
+            for path in ('/products?skin_type={}', '/products?skin_type={}&category=skincare&exclude_ingredient=venus'):
+                path = path.format(skin_type)
+                cursors = [None, None]
+
+                while True:
+                    responses = []
+                    for cursor, is_engine in zip(cursors, (False, True)):
+                        request = self.requestFactory.get(path + '&cursor=' + cursor if cursor else path)
+                        with override_settings(CATALOG_ENGINE_ENABLED=is_engine):
+                            responses.append(products(request))
+
+                    self.assertEqual(responses[0].content, responses[1].content)
+                    cursors = [response.get('X-Next-Cursor') for response in responses]
+                    self.assertEqual(cursors[0], cursors[1])
+
+                    if cursors[0] is None:
+                        break
+
+    def test_reloadOnChange(self) -> None:
+        engine = get_engine()
+        self.assertIs(engine, get_engine())
+
+        item = Item.objects.get(id=3)
+        item.oilyScore = 100
+        item.save()
+
+        engine = get_engine()
+        rows = engine.select('oily', limit=1)
+        self.assertEqual(3, rows[0].id)
+
+
+class IndexTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def test_productsQueryPlan(self) -> None:
+        for skin_type in SKIN_TYPE_TO_DATABASE_FIELDS:
+            entries = _query_products({'category': 'skincare'}, skin_type)[:ITEM_PER_PAGE]
+            self._assertNoSort(entries)
+
+            entries = _query_products({}, skin_type)[ITEM_PER_PAGE:ITEM_PER_PAGE * 2]
+            self._assertNoSort(entries)
+
+    def test_recommendQueryPlan(self) -> None:
+        for database_field in SKIN_TYPE_TO_DATABASE_FIELDS.values():
+            entries = Item.objects.filter(category__exact='suncare').exclude(id__exact=7)
+            entries = entries.order_by(database_field, 'price', 'id')[:MAX_RECOMMEND_ITEM_COUNT]
+            self._assertNoSort(entries)
+
+    def _assertNoSort(self, entries) -> None:
+        sql, params = entries.query.sql_with_params()
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+                self.assertNotIn('TEMP B-TREE', plan, sql)
+                self.assertIn('USING INDEX', plan, sql)
+            elif connection.vendor == 'mysql':
+                cursor.execute('EXPLAIN ' + sql, params)
+                columns = [column[0] for column in cursor.description]
+                for row in cursor.fetchall():
+                    extra = dict(zip(columns, row)).get('Extra') or ''
+                    self.assertNotIn('Using filesort', extra, sql)
+            else:
+                self.skipTest('EXPLAIN 형식을 모르는 데이터베이스')
+
+
+class CacheTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def setUp(self) -> None:
+        self.requestFactory = RequestFactory()
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_hitAndMiss(self) -> None:
+        request = self.requestFactory.get('/products?skin_type=oily&category=skincare&include_ingredient=venus')
+        hits = statistics['hits']
+        misses = statistics['misses']
+
+        response = products(request)
+        self.assertEqual(misses + 1, statistics['misses'])
+
+        cached_response = products(request)
+        self.assertEqual(hits + 1, statistics['hits'])
+        self.assertEqual(response.content, cached_response.content)
+        self.assertEqual(response['Content-Type'], cached_response['Content-Type'])
+        self.assertEqual(response['X-Next-Cursor'] if response.has_header('X-Next-Cursor') else None,
+                         cached_response['X-Next-Cursor'] if cached_response.has_header('X-Next-Cursor') else None)
+
+        request = self.requestFactory.get('/product/7?skin_type=oily')
+        self.assertEqual(product(request, item_id=7).content, product(request, item_id=7).content)
+        self.assertEqual(hits + 2, statistics['hits'])
+
+    def test_normalizedKey(self) -> None:
+        arguments = _get_arguments(self.requestFactory.get('/products?skin_type=oily&include_ingredient=a,b,c'))
+        same_arguments = _get_arguments(self.requestFactory.get('/products?include_ingredient=c,A,b&skin_type=oily'))
+        self.assertEqual(build_cache_key('products', arguments), build_cache_key('products', same_arguments))
+        self.assertNotEqual(build_cache_key('products', arguments), build_cache_key('product', arguments))
+
+    def test_invalidateOnSave(self) -> None:
+        request = self.requestFactory.get('/product/7?skin_type=oily')
+        results = json.loads(product(request, item_id=7).content)
+
+        item = Item.objects.get(id=7)
+        item.name = 'changed'
+        item.save()
+
+        results = json.loads(product(request, item_id=7).content)
+        self.assertEqual('changed', results[0]['name'])
+
+    def test_otherProcessChange(self) -> None:
+        request = self.requestFactory.get('/products?skin_type=oily')
+        response = products(request)
+        self.assertEqual(response.content, products(request).content)
+
+        # 다른 프로세스(명령, 다른 워커)가 DB 와 카탈로그 버전만 바꾼 경우
+        top_id = json.loads(response.content)[0]['id']
+        Item.objects.filter(id=top_id).update(oilyScore=-100)
+        CatalogVersion.objects.update(version=F('version') + 1, modified=F('modified') + 1)
+
+        with override_settings(CATALOG_VERSION_CHECK_INTERVAL=0):
+            changed = products(request)
+
+        self.assertNotEqual(response['ETag'], changed['ETag'])
+        self.assertNotEqual(top_id, json.loads(changed.content)[0]['id'])
+
+    def test_errorNotCached(self) -> None:
+        request = self.requestFactory.get('/products?skin_type=oily&cursor=xxxx')
+        self.assertEqual(500, products(request).status_code)
+        self.assertEqual(500, products(request).status_code)
+
+    def test_staleNotCached(self) -> None:
+        # 다시 만드는 중인 이전 구조로 만든 응답은 저장하지도, ETag 를 붙이지도 않는다
+        request = self.requestFactory.get('/products?skin_type=oily')
+        render = mock.Mock(return_value=HttpResponse('stale'))
+        with mock.patch('myapp.home.cache.get_stale_count', side_effect=[0, 1, 1, 1]):
+            response = cached_response(request, 'stale', {}, render)
+
+        self.assertEqual('no-store', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+        render.return_value = HttpResponse('fresh')
+        response = cached_response(request, 'stale', {}, render)
+        self.assertEqual(b'fresh', response.content)
+        self.assertTrue(response.has_header('ETag'))
+
+    def test_lruBound(self) -> None:
+        cache = LRUCache(100)
+        cache.set('a', 1, 40)
+        cache.set('b', 2, 40)
+        self.assertEqual(1, cache.get('a'))
+
+        # 가장 오래 쓰지 않은 b 가 밀려난다
+        cache.set('c', 3, 40)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(80, cache.size)
+
+        cache.set('d', 4, 1000)
+        self.assertIsNone(cache.get('d'))
+
+    def test_compression(self) -> None:
+        path = '/products?skin_type=oily'
+        response = products(self.requestFactory.get(path))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+        hits = statistics['hits']
+        compressed = products(self.requestFactory.get(path, HTTP_ACCEPT_ENCODING='gzip, deflate'))
+        self.assertEqual('gzip', compressed['Content-Encoding'])
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(response.content, gzip.decompress(compressed.content))
+        self.assertLess(len(compressed.content), len(response.content))
+        self.assertEqual(response['ETag'][:-1] + '-gzip"', compressed['ETag'])
+        # 압축하지 않은 본문은 캐시에서 읽었다
+        self.assertEqual(hits + 1, statistics['hits'])
+
+        again = products(self.requestFactory.get(path, HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(compressed.content, again.content)
+        self.assertEqual(hits + 2, statistics['hits'])
+
+        not_modified = products(self.requestFactory.get(
+            path, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=compressed['ETag']))
+        self.assertEqual(304, not_modified.status_code)
+        self.assertIn('Accept-Encoding', not_modified['Vary'])
+        self.assertEqual(200, products(self.requestFactory.get(path, HTTP_IF_NONE_MATCH=compressed['ETag'])).status_code)
+
+        for accept_encoding in ('gzip;q=0', 'identity', 'br;q=0, *;q=0'):
+            response = products(self.requestFactory.get(path, HTTP_ACCEPT_ENCODING=accept_encoding))
+            self.assertFalse(response.has_header('Content-Encoding'), accept_encoding)
+
+        self.assertEqual('gzip', products(self.requestFactory.get(path, HTTP_ACCEPT_ENCODING='*'))['Content-Encoding'])
+
+        # 카탈로그가 바뀌면 압축한 본문도 함께 바뀐다
+        item = Item.objects.order_by('-oilyScore', 'price', 'id')[0]
+        item.name = 'changed'
+        item.save()
+
+        changed = products(self.requestFactory.get(path, HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertNotEqual(compressed['ETag'], changed['ETag'])
+        self.assertIn('changed', [entry['name'] for entry in json.loads(gzip.decompress(changed.content))])
+
+    def test_compressionSmall(self) -> None:
+        response = products(self.requestFactory.get('/products?skin_type=oily&category=none',
+                                                    HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(200, response.status_code)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertTrue(response['ETag'].endswith('-gzip"'))
+
+        response = products(self.requestFactory.get('/products?skin_type=oily&cursor=xxxx', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual(500, response.status_code)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_coalesce(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def render() -> 'HttpResponse':
+            calls.append(None)
+            started.set()
+            release.wait(5)
+
+            return HttpResponse(b'rendered', status=200)
+
+        request = self.requestFactory.get('/products?skin_type=oily')
+        arguments = {'skin_type': 'oily', 'category': 'coalesce'}
+        contents = []
+
+        def run() -> None:
+            contents.append(cached_response(request, 'products', arguments, render).content)
+
+        hits = statistics['hits']
+        coalesced = statistics['coalesced']
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        threads[0].start()
+        self.assertTrue(started.wait(5))
+
+        # 첫 요청이 render() 안에 있는 동안 같은 요청이 들어온다
+        for thread in threads[1:]:
+            thread.start()
+
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual([b'rendered'] * 8, contents)
+        self.assertEqual(7, statistics['coalesced'] - coalesced + statistics['hits'] - hits)
+        self.assertIn('myapp_catalog_coalesced_requests_total', metrics.render_metrics())
+
+    def test_coalesceError(self) -> None:
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def fail() -> None:
+            started.set()
+            release.wait(5)
+            raise ValueError('failed')
+
+        def run() -> None:
+            try:
+                flights.do('key', fail)
+            except ValueError as error:
+                errors.append(error)
+
+        leader = threading.Thread(target=run)
+        leader.start()
+        self.assertTrue(started.wait(5))
+
+        follower = threading.Thread(target=run)
+        follower.start()
+        time.sleep(0.1)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        # 기다리던 쪽도 같은 예외를 받고, 끝난 키는 남지 않는다
+        self.assertEqual(2, len(errors))
+        self.assertEqual(0, len(flights))
+        self.assertEqual((1, False), flights.do('key', lambda: 1))
+
+    @override_settings(
+        CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog'},
+        },
+        CATALOG_CACHE_ALIAS='catalog')
+    def test_sharedBackend(self) -> None:
+        self.assertNotIsInstance(get_response_cache(), LRUCache)
+
+        request = self.requestFactory.get('/products?skin_type=dry')
+        hits = statistics['hits']
+        self.assertEqual(products(request).content, products(request).content)
+        self.assertEqual(hits + 1, statistics['hits'])
+
+        key = build_cache_key('products', _get_arguments(request))
+        bump_catalog_version()
+        self.assertNotEqual(key, build_cache_key('products', _get_arguments(request)))
+
+
+class ConditionalTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def setUp(self) -> None:
+        self.requestFactory = RequestFactory()
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_etag(self) -> None:
+        path = '/products?skin_type=oily&category=skincare'
+        response = products(self.requestFactory.get(path))
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        # 304 는 조회와 직렬화 없이 돌려준다
+        with self.assertNumQueries(0):
+            response = products(self.requestFactory.get(path, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(304, response.status_code)
+        self.assertFalse(response.content)
+
+        response = products(self.requestFactory.get(path + '&page=1', HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(200, response.status_code)
+
+        request = self.requestFactory.get('/product/7?skin_type=oily')
+        etag = product(request, item_id=7)['ETag']
+        with self.assertNumQueries(0):
+            response = product(self.requestFactory.get('/product/7?skin_type=oily', HTTP_IF_NONE_MATCH=etag), item_id=7)
+        self.assertEqual(304, response.status_code)
+
+        bump_catalog_version()
+        response = products(self.requestFactory.get(path, HTTP_IF_NONE_MATCH=etag))
+        self.assertEqual(200, response.status_code)
+
+    def test_noLastModified(self) -> None:
+        # 같은 초에 두 번 바뀌어도 다른 응답으로 보도록 ETag 만 쓴다
+        path = '/products?skin_type=dry'
+        response = products(self.requestFactory.get(path))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        bump_catalog_version()
+        response = products(self.requestFactory.get(path, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60)))
+        self.assertEqual(200, response.status_code)
+
+    def test_missingNotModified(self) -> None:
+        # 없는 상품에는 어떤 조건부 요청에도 304 를 주지 않는다
+        for header in ({'HTTP_IF_NONE_MATCH': '*'}, {'HTTP_IF_MODIFIED_SINCE': http_date(time.time() + 60)}):
+            response = product(self.requestFactory.get('/product/999999?skin_type=oily', **header), item_id=999999)
+            self.assertEqual(500, response.status_code, header)
+
+        response = product(self.requestFactory.get('/product/7?skin_type=oily', HTTP_IF_NONE_MATCH='*'), item_id=7)
+        self.assertEqual(304, response.status_code)
+
+    def test_errorNotConditional(self) -> None:
+        response = products(self.requestFactory.get('/products?skin_type=xxxx', HTTP_IF_NONE_MATCH='*'))
+        self.assertEqual(500, response.status_code)
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class SerializerTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_sameAsJson(self) -> None:
+        entries = list(Item.objects.order_by('id')[:20])
+        fields = ('id', 'name', 'price', 'ingredients', 'monthlySales')
+
+        for _ in range(2):
+            content = serialize_entries(entries, fields, True)
+            expected = [extract_data_from_entry(entry, fields, True) for entry in entries]
+            self.assertEqual(expected, json.loads(content.decode('utf-8')))
+
+        self.assertEqual(b'[]', serialize_entries([], fields, True))
+
+    def test_invalidateOnSave(self) -> None:
+        request = RequestFactory().get('/product/7?skin_type=oily')
+        product(request, item_id=7)
+
+        item = Item.objects.get(id=7)
+        item.price = 1
+        item.save()
+
+        results = json.loads(product(request, item_id=7).content)
+        self.assertEqual(1, results[0]['price'])
+
+    def test_versionPerResponse(self) -> None:
+        entries = list(Item.objects.order_by('id')[:20])
+        fields = ('id', 'name', 'price')
+
+        # 응답 하나에서 카탈로그 버전은 한 번만 읽는다
+        with mock.patch('myapp.home.serializers.get_catalog_version', wraps=get_catalog_version) as version:
+            content = serialize_entries(entries, fields, True)
+        self.assertEqual(1, version.call_count)
+
+        # 더 새 버전을 따르는 캐시에 예전 버전의 응답이 조각을 남기지 않는다
+        old_version = get_catalog_version()
+        Item.objects.filter(id=entries[0].id).update(name='changed')
+        new_version = bump_catalog_version()
+        serialize_entries([], fields, True, new_version)
+        self.assertEqual(content, serialize_entries(entries, fields, True, old_version))
+
+        entries = list(Item.objects.order_by('id')[:20])
+        self.assertEqual('changed', json.loads(serialize_entries(entries, fields, True, new_version))[0]['name'])
+
+    def test_invalidateOnBulkChange(self) -> None:
+        fields = ('id', 'name', 'price')
+        entries = list(Item.objects.filter(id__in=(1, 2)).order_by('id'))
+        serialize_entries(entries, fields, True)
+
+        # 시그널 없는 대량 변경은 바뀐 상품을 알려 줘야 한다
+        Item.objects.filter(id=1).update(name='changed')
+        bump_catalog_version((1,))
+
+        entries = list(Item.objects.filter(id__in=(1, 2)).order_by('id'))
+        results = json.loads(serialize_entries(entries, fields, True).decode('utf-8'))
+        self.assertEqual('changed', results[0]['name'])
+
+
+class ExportTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def setUp(self) -> None:
+        self.requestFactory = RequestFactory()
+
+    def test_sameAsPages(self) -> None:
+        path = '/products?skin_type=sensitive&exclude_ingredient=venus'
+
+        response = export_products(self.requestFactory.get(path))
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        exported = [json.loads(line) for line in lines]
+
+        expected = []
+        page = 0
+        while True:
+            results = json.loads(products(self.requestFactory.get(path + '&page=' + str(page))).content)
+            expected.extend(results)
+            page += 1
+
+            if len(results) < ITEM_PER_PAGE:
+                break
+
+        self.assertEqual(expected, exported)
+
+    def test_chunks(self) -> None:
+        # 나눠 읽는 경계에서 빠지거나 겹치는 상품이 없어야 한다
+        arguments = {'skin_type': 'dry', 'category': 'maskpack'}
+        expected = b''.join(_export_lines(arguments, 'dry'))
+
+        for chunk_size in (1, 7, 276):
+            content = b''.join(_export_lines(arguments, 'dry', chunk_size))
+            self.assertEqual(expected, content)
+
+        self.assertEqual(Item.objects.filter(category='maskpack').count(), len(expected.splitlines()))
+
+    def test_error(self) -> None:
+        response = export_products(self.requestFactory.get('/products/export'))
+        self.assertEqual(500, response.status_code)
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class BatchTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def setUp(self) -> None:
+        self.requestFactory = RequestFactory()
+
+    def test_sameAsProduct(self) -> None:
+        item_ids = [7, 1, 500, 3, 7, 999]
+
+        for skin_type in SKIN_TYPE_TO_DATABASE_FIELDS:
+            path = '/products/batch?skin_type={}&ids={}'.format(skin_type, ','.join(map(str, item_ids)))
+
+            # 추천 표가 만들어져 있으면 상품 수와 관계없이 한 번만 조회한다
+            get_recommendation_table()
+            with self.assertNumQueries(1):
+                response = products_batch(self.requestFactory.get(path))
+            results = json.loads(response.content)
+
+            self.assertEqual(len(item_ids), len(results))
+            for item_id, result in zip(item_ids, results):
+                request = self.requestFactory.get('/product/{}?skin_type={}'.format(item_id, skin_type))
+                self.assertEqual(json.loads(product(request, item_id=item_id).content), result)
+
+    def test_error(self) -> None:
+        for path in ('/products/batch?skin_type=oily', '/products/batch?skin_type=oily&ids=1,x',
+                     '/products/batch?skin_type=oily&ids=1,100000', '/products/batch?ids=1'):
+            response = products_batch(self.requestFactory.get(path))
+            self.assertEqual(500, response.status_code, path)
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class RecommendationTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_sameAsDatabase(self) -> None:
+        table = get_recommendation_table()
+
+        for skin_type, database_field in SKIN_TYPE_TO_DATABASE_FIELDS.items():
+            for item in Item.objects.order_by('id')[::37]:
+                entries = Item.objects.filter(category__exact=item.category).exclude(id__exact=item.id)
+                entries = entries.order_by(database_field, 'price', 'id')[:MAX_RECOMMEND_ITEM_COUNT]
+                expected = [entry.id for entry in entries]
+
+                actual = [entry.id for entry in table.recommend(item.category, skin_type, item.id)]
+                self.assertEqual(expected, actual)
+
+    def test_lookup(self) -> None:
+        get_recommendation_table()
+        request = RequestFactory().get('/product/7?skin_type=dry')
+
+        with self.assertNumQueries(1):
+            product(request, item_id=7)
+
+    def test_refreshOnChange(self) -> None:
+        request = RequestFactory().get('/product/7?skin_type=dry')
+        results = json.loads(product(request, item_id=7).content)
+        category = results[0]['category']
+
+        item = Item.objects.filter(category=category).exclude(id=7).order_by('-id')[0]
+        item.dryScore = 100
+        item.save()
+
+        results = json.loads(product(request, item_id=7).content)
+        self.assertEqual(item.id, results[1]['id'])
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class MetricsTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def setUp(self) -> None:
+        metrics.reset()
+
+    def test_histogram(self) -> None:
+        histogram = metrics.Histogram((1, 5))
+        for value in (0, 1, 2, 5, 6):
+            histogram.observe(value)
+
+        self.assertEqual([2, 2, 1], histogram.counts)
+        self.assertEqual((14, 5), (histogram.sum, histogram.count))
+
+    def test_perView(self) -> None:
+        client = Client()
+        paths = ('/products/?skin_type=oily', '/products/?skin_type=dry&category=skincare', '/product/7?skin_type=dry')
+        query_counts = []
+        for path in paths:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(200, client.get(path).status_code)
+            query_counts.append(len(queries))
+        client.get('/nothing')
+
+        response = client.get('/metrics')
+        self.assertEqual(metrics.CONTENT_TYPE, response['Content-Type'])
+        samples = self._parse(response.content.decode('utf-8'))
+
+        self.assertEqual(2, samples['myapp_request_duration_seconds_count{view="products"}'])
+        self.assertEqual(1, samples['myapp_request_duration_seconds_count{view="product"}'])
+        self.assertEqual(1, samples['myapp_request_duration_seconds_count{view="unmatched"}'])
+        self.assertEqual(sum(query_counts[:2]), samples['myapp_db_queries_sum{view="products"}'])
+        self.assertEqual(query_counts[2], samples['myapp_db_queries_sum{view="product"}'])
+        self.assertEqual(2, samples['myapp_db_queries_bucket{view="products",le="+Inf"}'])
+        self.assertGreater(samples['myapp_serialization_duration_seconds_sum{view="products"}'], 0)
+        self.assertIn('myapp_catalog_cache_hits_total', samples)
+
+    def test_disabled(self) -> None:
+        with override_settings(METRICS_ENABLED=False):
+            Client().get('/products/?skin_type=oily')
+
+        samples = self._parse(Client().get('/metrics').content.decode('utf-8'))
+        self.assertNotIn('myapp_request_duration_seconds_count{view="products"}', samples)
+
+    def _parse(self, text) -> '{str: float}':
+        samples = {}
+        for line in text.splitlines():
+            if line and not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+
+        return samples
+
+
+class WarmUpTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_warmUp(self) -> None:
+        bump_catalog_version()
+        self.assertFalse(is_warm())
+
+        timings = warm_up()
+        self.assertTrue(is_warm())
+        self.assertIn('recommendations', timings)
+
+        # 첫 페이지와 추천 표는 조회 없이 응답한다
+        factory = RequestFactory()
+        with self.assertNumQueries(0):
+            response = products(factory.get('/products/?skin_type=dry&category=skincare'))
+        self.assertEqual(200, response.status_code)
+        with self.assertNumQueries(1):
+            product(factory.get('/product/7?skin_type=oily'), item_id=7)
+
+        bump_catalog_version()
+        self.assertFalse(is_warm())
+
+    def test_ready(self) -> None:
+        bump_catalog_version()
+
+        # 프로브는 캐시를 채우지 않고 백그라운드 스레드에 맡긴다
+        with mock.patch('myapp.home.warmup._warm_version', None), \
+                mock.patch('myapp.home.views.start_warm_up') as start_warm_up:
+            response = Client().get('/ready')
+            self.assertEqual(503, response.status_code)
+            self.assertEqual(1, start_warm_up.call_count)
+            self.assertFalse(is_warm())
+
+        with mock.patch('myapp.home.views.start_warm_up') as start_warm_up:
+            warm_up()
+            self.assertEqual(200, Client().get('/ready').status_code)
+            self.assertEqual(0, start_warm_up.call_count)
+
+            # 카탈로그가 바뀌면 다시 채우기 시작하지만 준비된 상태는 그대로다
+            bump_catalog_version()
+            self.assertEqual(200, Client().get('/ready').status_code)
+            self.assertEqual(1, start_warm_up.call_count)
+
+    def test_startWarmUp(self) -> None:
+        release = threading.Event()
+
+        with mock.patch('myapp.home.warmup.warm_up', side_effect=lambda: release.wait(5)) as warm_up_mock:
+            self.assertTrue(start_warm_up())
+            # 진행 중이면 새로 시작하지 않는다
+            self.assertFalse(start_warm_up())
+
+            release.set()
+            warmup._warm_up_thread.join(5)
+
+        self.assertEqual(1, warm_up_mock.call_count)
+
+
+@override_settings(DATABASE_REPLICAS=['replica0', 'replica1'], DATABASE_REPLICA_MAX_LAG=0)
+class RouterTest(TestCase):
+    def test_route(self) -> None:
+        self.assertEqual('default', Item.objects.all().db)
+        self.assertEqual('default', router.db_for_write(Item))
+
+        with using_replica() as alias:
+            self.assertIn(alias, ('replica0', 'replica1'))
+            self.assertEqual(alias, Item.objects.all().db)
+            self.assertEqual('default', router.db_for_write(Item))
+
+            # 중첩되면 안쪽이 끝난 뒤 바깥 복제본으로 돌아간다
+            with using_replica() as inner_alias:
+                self.assertNotEqual(alias, inner_alias)
+            self.assertEqual(alias, Item.objects.all().db)
+
+        self.assertEqual('default', Item.objects.all().db)
+        self.assertFalse(router.allow_migrate('replica0', 'item'))
+        self.assertTrue(router.allow_migrate('default', 'item'))
+
+    def test_primaryAfterChange(self) -> None:
+        with override_settings(DATABASE_REPLICA_MAX_LAG=60):
+            bump_catalog_version()
+            with using_replica() as alias:
+                self.assertIsNone(alias)
+                self.assertEqual('default', Item.objects.all().db)
+
+    def test_noReplica(self) -> None:
+        with override_settings(DATABASE_REPLICAS=[]):
+            with using_replica() as alias:
+                self.assertIsNone(alias)
+
+
+class SnapshotTest(TransactionTestCase):
+    # 백그라운드 스레드가 커밋된 데이터를 읽으므로 TestCase 를 쓰지 않는다
+    def test_rebuildInBackground(self) -> None:
+        release = threading.Event()
+        versions = []
+
+        def build(version) -> 'types.SimpleNamespace':
+            versions.append(version)
+            if len(versions) > 1:
+                release.wait(5)
+
+            return types.SimpleNamespace(version=version)
+
+        snapshot = CatalogSnapshot('test', build)
+        first = snapshot.get()
+        self.assertEqual(get_catalog_version(), first.version)
+
+        # 다시 만드는 동안에는 기다리지 않고 이전 구조를 돌려준다
+        bump_catalog_version()
+        stale_count = get_stale_count()
+        with override_settings(CATALOG_REBUILD_WAIT=0):
+            self.assertIs(first, snapshot.get())
+            self.assertIs(first, snapshot.get())
+        self.assertEqual(stale_count + 2, get_stale_count())
+
+        release.set()
+        self.assertEqual(get_catalog_version(), snapshot.get(is_blocking=True).version)
+        self.assertEqual(2, len(versions))
+
+    def test_firstBuildError(self) -> None:
+        snapshot = CatalogSnapshot('test', mock.Mock(side_effect=ValueError('broken')))
+        with self.assertRaises(ValueError):
+            snapshot.get()
+
+
+class HealthCheckTest(TransactionTestCase):
+    # 트랜잭션 안의 연결은 확인하지 않으므로 TestCase 를 쓰지 않는다
+    def test_healthCheck(self) -> None:
+        Item.objects.exists()
+        connection.health_checked_at = None
+
+        with override_settings(DATABASE_HEALTH_CHECK_INTERVAL=60):
+            check_connections()
+            checked_at = connection.health_checked_at
+            self.assertIsNotNone(checked_at)
+            self.assertIsNotNone(connection.connection)
+
+            # 간격 안에서는 다시 확인하지 않는다
+            with mock.patch.object(connection, 'is_usable', return_value=False):
+                check_connections()
+            self.assertEqual(checked_at, connection.health_checked_at)
+            self.assertIsNotNone(connection.connection)
+
+        # 끊긴 연결은 닫아서 다음 쿼리가 다시 연결하게 한다. 메모리 SQLite 는 실제로 닫지 않으므로 close 호출만 확인
+        with override_settings(DATABASE_HEALTH_CHECK_INTERVAL=0):
+            with mock.patch.object(connection, 'is_usable', return_value=False), \
+                    mock.patch.object(connection, 'close') as close:
+                check_connections()
+            close.assert_called_once_with()
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class SearchTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_sameAsScan(self) -> None:
+        names = [item.name for item in Item.objects.order_by('id')[:5]]
+        queries = [names[0][:2], names[1][-3:], names[2].upper(), ' '.join(names[3][1:4]), '마스크', '크림']
+        # bigram 은 모두 있지만 이어져 있지 않은 검색어
+        queries.append(normalize_name(names[4])[:2] + normalize_name(names[4])[-2:])
+
+        client = Client()
+        for skin_type, database_field in SKIN_TYPE_TO_DATABASE_FIELDS.items():
+            entries = Item.objects.order_by(database_field, 'price', 'id')
+            for query in queries:
+                matched_ids = [entry.id for entry in entries if normalize_name(query) in normalize_name(entry.name)]
+
+                for page in (0, 1):
+                    path = '/search?skin_type={}&q={}&page={}'.format(skin_type, query, page)
+                    response = client.get(path)
+                    self.assertEqual(200, response.status_code, path)
+
+                    expected = matched_ids[page * ITEM_PER_PAGE:(page + 1) * ITEM_PER_PAGE]
+                    self.assertEqual(expected, [result['id'] for result in response.json()], path)
+
+    def test_repeatedGrams(self) -> None:
+        # aaa 의 bigram 은 aa 하나뿐이지만 aab 에는 이어져 있지 않다. 페이지 경계를 넘겨 확인한다
+        items = [Item(id=10000 + index, imageId='a', name='aab', oilyScore=100, price=index) for index in range(60)]
+        items += [Item(id=20000 + index, imageId='a', name='aaa', oilyScore=100, price=60 + index) for index in range(60)]
+        Item.objects.bulk_create(items)
+        bump_catalog_version()
+
+        client = Client()
+        entries = Item.objects.order_by('-oilyScore', 'price', 'id')
+        for query in ('aaa', 'aa'):
+            matched_ids = [entry.id for entry in entries if query in normalize_name(entry.name)]
+
+            for page in range(3):
+                path = '/search?skin_type=oily&q={}&page={}'.format(query, page)
+                expected = matched_ids[page * ITEM_PER_PAGE:(page + 1) * ITEM_PER_PAGE]
+                self.assertEqual(expected, [result['id'] for result in client.get(path).json()], path)
+
+    def test_index(self) -> None:
+        rows = [(1, 'Ab cd', 10, 1, 0, 0), (2, 'abc', 5, 1, 0, 0), (3, 'xcd', 1, 2, 0, 0), (4, 'ab ab', 1, 0, 0, 0)]
+        index = SearchIndex(rows, 0)
+
+        self.assertEqual([2, 1, 4], index.search('ab', 'oily').tolist())
+        self.assertEqual([4, 2, 1], index.search('ab', 'dry').tolist())
+        self.assertEqual([3, 1], index.search('cd', 'oily').tolist())
+        # abd 의 bigram 은 모두 1 번에 있지만 이어져 있지 않다. 확인은 뷰에서 한다
+        self.assertEqual([1], index.search('abcd', 'oily').tolist())
+        self.assertFalse(index.is_exact('abcd'))
+        self.assertFalse(index.is_exact('aaa'))
+        self.assertTrue(index.is_exact('a b'))
+        self.assertEqual([], index.search('zz', 'oily').tolist())
+        self.assertEqual([], SearchIndex([], 0).search('ab', 'oily').tolist())
+
+    def test_error(self) -> None:
+        client = Client()
+        for path in ('/search?skin_type=oily', '/search?skin_type=oily&q=a', '/search?skin_type=oily&q=+a+',
+                     '/search?q=ab', '/search?skin_type=x&q=ab'):
+            self.assertEqual(500, client.get(path).status_code, path)
+
+
+@override_settings(CATALOG_CACHE_ENABLED=False)
+class FacetTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_sameAsCountQueries(self) -> None:
+        factory = RequestFactory()
+        conditions = ('', '&category=SkinCare', '&include_ingredient=set&exclude_ingredient=veil',
+                      '&category=suncare&exclude_ingredient=set,venus')
+
+        for is_engine in (False, True):
+            with override_settings(CATALOG_ENGINE_ENABLED=is_engine):
+                get_engine()
+
+                for condition in conditions:
+                    path = '/products/?skin_type=oily&facets=category,gender' + condition
+                    request = factory.get(path)
+                    arguments = _get_arguments(request)
+
+                    # 목록 한 번과 묶음 집계 한 번. 포함 성분이 있으면 후보를 한 번 찾고 제외 성분을 한 번 확인한다
+                    query_count = 2
+                    if 'include_ingredient' in condition:
+                        query_count += 2
+                    with self.assertNumQueries(0 if is_engine else query_count):
+                        response = products(request)
+
+                    entries = _query_products(arguments, 'oily')
+                    self.assertEqual(str(entries.count()), response['X-Total-Count'], path)
+
+                    without_category = _query_products(
+                        {key: value for key, value in arguments.items() if key != 'category'}, 'oily')
+                    expected = {'category': {}, 'gender': {}}
+                    for category in ('skincare', 'maskpack', 'suncare', 'basemakeup'):
+                        count = without_category.filter(category=category).count()
+                        if count:
+                            expected['category'][category] = count
+                    for gender in ('all', 'female', 'male'):
+                        count = entries.filter(gender=gender).count()
+                        if count:
+                            expected['gender'][gender] = count
+
+                    self.assertEqual(expected, json.loads(response['X-Facets']), path)
+
+    def test_option(self) -> None:
+        factory = RequestFactory()
+
+        response = products(factory.get('/products/?skin_type=oily'))
+        self.assertFalse(response.has_header('X-Total-Count'))
+
+        # 전체 개수는 facets 를 줄 때만 붙는다
+        response = products(factory.get('/products/?skin_type=oily&facets=gender'))
+        self.assertEqual(['gender'], list(json.loads(response['X-Facets'])))
+        self.assertEqual(str(Item.objects.count()), response['X-Total-Count'])
+
+        response = products(factory.get('/products/?skin_type=oily&facets=price'))
+        self.assertEqual(500, response.status_code)
+
+
+class RowsTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def setUp(self) -> None:
+        rows.clear_compiled_queries()
+
+    def test_sameAsQuerySet(self) -> None:
+        conditions = (
+            {},
+            {'category': 'suncare'},
+            {'include_ingredient': {'set'}},
+            {'category': 'skincare', 'exclude_ingredient': {'set', 'venus', 'fruit'}},
+        )
+
+        for skin_type in SKIN_TYPE_TO_DATABASE_FIELDS:
+            for arguments in conditions:
+                entries = _query_products(arguments, skin_type)
+                expected = list(entries.values_list(*rows.PRODUCT_ROW_TYPES[skin_type]._fields)[2:22])
+                self.assertTrue(expected, arguments)
+
+                # 두 번째부터는 컴파일된 SQL 을 쓴다
+                for _ in range(2):
+                    actual = _fetch_products(arguments, skin_type, None, 2, 20)
+                    self.assertEqual(expected, [tuple(row) for row in actual], arguments)
+
+                after = expected[-1]
+                after = (after[-1], after[3], after[0])
+                expected = list(entries.values_list(*rows.PRODUCT_ROW_TYPES[skin_type]._fields)[22:52])
+                actual = _fetch_products(arguments, skin_type, after, 0, 30)
+                self.assertEqual(expected, [tuple(row) for row in actual], arguments)
+
+    def test_compileOnce(self) -> None:
+        build = functools.partial(_query_products, skin_type='dry')
+
+        with mock.patch.object(rows, '_compile', wraps=rows._compile) as compile_query:
+            for category in ('skincare', 'suncare', 'maskpack'):
+                for offset in (0, 50):
+                    rows.fetch_rows('test', rows.PRODUCT_ROW_TYPES['dry'], build, {'category': category}, offset, 50)
+
+            rows.fetch_rows('test', rows.PRODUCT_ROW_TYPES['dry'], build, {}, 0, 50)
+
+        self.assertEqual(2, compile_query.call_count)
+
+    def test_uncompilable(self) -> None:
+        # 값이 아닌 상수가 params 에 들어가면 ORM 으로 읽는다
+        def build(arguments) -> 'QuerySet':
+            return Item.objects.filter(id__in=arguments['ids'], price__gt=0).order_by('id')
+
+        for _ in range(2):
+            actual = rows.fetch_rows('test', rows.DetailRow, build, {'ids': [3, 1, 2]})
+            self.assertEqual([1, 2, 3], [row.id for row in actual])
+
+    def test_missingProduct(self) -> None:
+        response = product(RequestFactory().get('/product/100000?skin_type=oily'), item_id=100000)
+        self.assertEqual(500, response.status_code)
+
+
+class ProfileTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_parse(self) -> None:
+        self.assertEqual({'oily': 0.7, 'sensitive': 0.3}, parse_profile('oily:7, sensitive:3'))
+        self.assertEqual({'dry': 1.0}, parse_profile('dry:0.5,oily:0'))
+        self.assertEqual('oily:0.5,sensitive:0.5', format_profile(parse_profile('sensitive,oily')))
+        self.assertEqual('dry', format_profile(parse_profile('dry:2')))
+
+        for value in ('oily:x', 'oily:-1', 'oily:0', 'oily:nan', 'normal:1', 'oily:1,oily:2', '', 'oily:1e308,dry:1e308'):
+            with self.assertRaises(ValueError, msg=value):
+                parse_profile(value)
+
+    def _rank(self, entries, weights) -> '[int]':
+        def key(entry) -> tuple:
+            score = round(sum(getattr(entry, field) * weight for field, weight in weights.items()), 6)
+
+            return -score, entry.price, entry.id
+
+        return [entry.id for entry in sorted(entries, key=key)]
+
+    def test_products(self) -> None:
+        factory = RequestFactory()
+        weights = {'oilyScore': 0.7, 'sensitiveScore': 0.3}
+        conditions = ('', '&category=SkinCare', '&include_ingredient=set', '&category=suncare&exclude_ingredient=set')
+
+        for is_engine in (False, True):
+            with override_settings(CATALOG_ENGINE_ENABLED=is_engine):
+                for condition in conditions:
+                    for page in (0, 1):
+                        path = '/products/?skin_type=oily:0.7,sensitive:0.3&page={}{}'.format(page, condition)
+                        request = factory.get(path)
+                        response = products(request)
+                        self.assertEqual(200, response.status_code, path)
+                        self.assertFalse(response.has_header('X-Next-Cursor'), path)
+
+                        entries = _query_products(_get_arguments(request), 'oily')
+                        expected = self._rank(entries, weights)[ITEM_PER_PAGE * page:ITEM_PER_PAGE * (page + 1)]
+                        actual = [result['id'] for result in json.loads(response.content)]
+                        self.assertEqual(expected, actual, path)
+
+        # 피부 타입이 하나뿐이면 기존 정렬과 같다
+        self.assertEqual(
+            products(factory.get('/products/?skin_type=dry')).content,
+            products(factory.get('/products/?skin_type=dry:3')).content)
+
+    def test_product(self) -> None:
+        factory = RequestFactory()
+        item_entry = Item.objects.get(id=7)
+        weights = {'dryScore': 0.5, 'sensitiveScore': 0.5}
+
+        response = product(factory.get('/product/7?skin_type=dry:1,sensitive:1'), item_id=7)
+        results = json.loads(response.content)
+
+        entries = Item.objects.filter(category=item_entry.category).exclude(id=7)
+        expected = self._rank(entries, weights)[:MAX_RECOMMEND_ITEM_COUNT]
+        self.assertEqual(item_entry.id, results[0]['id'])
+        self.assertEqual(expected, [result['id'] for result in results[1:]])
+
+    def test_error(self) -> None:
+        factory = RequestFactory()
+        cursor = products(factory.get('/products/?skin_type=oily'))['X-Next-Cursor']
+
+        for path in ('/products/?skin_type=oily:x', '/products/?skin_type=oily,normal',
+                     '/products/?skin_type=oily:1,dry:1&cursor=' + cursor):
+            self.assertEqual(500, products(factory.get(path)).status_code, path)
+
+        self.assertEqual(500, product(factory.get('/product/7?skin_type=oily:0'), item_id=7).status_code)
+
+        # 가중치 합이 넘쳐도 렌더링 중에 실패하지 않고 잘못된 값으로 답한다
+        path = '/products/?skin_type=oily:1e308,dry:1e308'
+        self.assertEqual(500, products(factory.get(path)).status_code)
+        self.assertEqual(b'skin_type is wrong', products(factory.get(path)).content)
+
+    def test_batchAndExport(self) -> None:
+        factory = RequestFactory()
+        profile = 'dry:1,sensitive:1'
+
+        response = products_batch(factory.get('/products/batch?ids=7,3&skin_type=' + profile))
+        self.assertEqual(200, response.status_code)
+        expected = [json.loads(product(factory.get('/product/{}?skin_type={}'.format(item_id, profile)),
+                                       item_id=item_id).content) for item_id in (7, 3)]
+        self.assertEqual(expected, json.loads(response.content))
+
+        # 내보내기는 같은 조건의 목록을 모든 페이지에 걸쳐 이어 붙인 것과 같다
+        request = factory.get('/products/?skin_type={}&category=skincare&exclude_ingredient=set'.format(profile))
+        response = export_products(request)
+        self.assertEqual(200, response.status_code)
+        exported = [json.loads(line)['id'] for line in b''.join(response.streaming_content).splitlines()]
+
+        weights = {'dryScore': 0.5, 'sensitiveScore': 0.5}
+        self.assertEqual(self._rank(_query_products(_get_arguments(request), 'dry'), weights), exported)
+
+        arguments = _get_arguments(request)
+        arguments['skin_type'] = format_profile(parse_profile(profile))
+        self.assertEqual(b''.join(_export_lines(arguments, arguments['skin_type'])),
+                         b''.join(_export_lines(arguments, arguments['skin_type'], 7)))
+
+
+@override_settings(ROOT_URLCONF='myapp.urls_api', MIDDLEWARE=settings.API_MIDDLEWARE)
+class ApiProfileTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def test_urls(self) -> None:
+        client = Client()
+
+        response = client.get('/products/?skin_type=oily')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(response.content, products(RequestFactory().get('/products/?skin_type=oily')).content)
+        # 세션과 CSRF 미들웨어가 없으므로 쿠키를 만들지 않는다
+        self.assertFalse(response.cookies)
+
+        self.assertEqual(301, client.get('/products?skin_type=oily').status_code)
+        self.assertEqual(200, client.get('/product/7?skin_type=dry').status_code)
+        self.assertEqual(404, client.get('/admin/').status_code)
+
+    def test_sameViews(self) -> None:
+        # API 프로필의 URL 은 전체 프로필과 같은 뷰를 가리킨다
+        from myapp import urls, urls_api
+
+        patterns = {pattern.name: pattern.callback for pattern in urls.urlpatterns if hasattr(pattern, 'name')}
+        for pattern in urls_api.urlpatterns:
+            self.assertIs(patterns[pattern.name], pattern.callback, pattern.name)
@@ -1,26 +1,47 @@
+import bisect
 import collections
 import functools
+import json
 import operator
-import urllib.parse
-from django.db.models import Q
-from django.http import HttpRequest, HttpResponse, JsonResponse
+import numpy
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Count, Q
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render
-from myapp.item.models import Item
+from myapp.db import read_from_replica, using_replica
+from myapp.home.cache import cached_response
+from myapp.home.engine import get_engine
+from myapp.home.metrics import CONTENT_TYPE, measure_serialization, render_metrics
+from myapp.home.pagination import decode_cursor, encode_cursor
+from myapp.home.profiles import format_profile, get_score_table, parse_profile
+from myapp.home.recommendations import MAX_RECOMMEND_ITEM_COUNT, get_recommendation_table
+from myapp.home.rows import PRODUCT_ROW_TYPES, DetailRow, fetch_rows
+from myapp.home.search import GRAM_SIZE, get_search_index, normalize_name
+from myapp.home.serializers import encode_entry, join_fragments, serialize_entries, serialize_entry
+from myapp.home.warmup import has_warmed_up, is_warm, start_warm_up
+from myapp.item.catalog import get_catalog_version, split_ingredients
+from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS
+from myapp.item.models import Item, ItemToIngredient
 
 
 SKIN_TYPE_TO_DATABASE_FIELDS = {
     'oily' : '-oilyScore',
     'dry' : '-dryScore',
-    'sensitive' : '-sensitive',
+    'sensitive' : '-sensitiveScore',
 }
 ITEM_PER_PAGE = 50
-JSON_PARAMETERS = {'ensure_ascii': False}
-if __debug__:
-    JSON_PARAMETERS['indent'] = 4
-    JSON_PARAMETERS['sort_keys'] = True
-
-MAX_RECOMMEND_ITEM_COUNT = 3
-RESOURCE_URL = 'https://grepp-programmers-challenges.s3.ap-northeast-2.amazonaws.com/2020-birdview/'
+EXPORT_CHUNK_SIZE = 2000
+MAX_BATCH_ITEM_COUNT = 100
+FACET_FIELDS = ('category', 'gender')
+# 목록 조회 조건. 이 값들은 SQL 의 params 로만 들어간다
+PRODUCT_QUERY_ARGUMENTS = ('category', 'include_ingredient', 'exclude_ingredient')
+# 검색 결과의 이름을 확인할 때 한 번에 읽는 상품 수
+SEARCH_VERIFY_CHUNK_SIZE = 200
+# 포함 성분의 게시 목록이 이보다 짧으면 정렬 인덱스 대신 게시 목록에서 시작한다
+MAX_CANDIDATE_COUNT = 2000
+# 후보 상품을 한 번에 확인하는 수. SQLite 의 params 개수 제한(999)보다 작게 둔다
+CANDIDATE_CHUNK_SIZE = 500
 
 
 # Create your views here.
@@ -30,81 +51,192 @@ def index(request) -> 'HttpResponse':
     return render(request, 'index.html', {})
 
 
+@read_from_replica
 def products(request) -> 'HttpResponse':
     """제품 목록을 반환
+
+    skin_type 에 oily:0.7,sensitive:0.3 처럼 가중치를 주면 점수의 가중 합 순서로 정렬한다. 이때는 cursor 를 쓸 수 없다.
+    facets 를 주면 조건에 맞는 전체 개수를 X-Total-Count 로, 분류/성별 개수를 X-Facets 에 JSON 으로 붙인다.
+    X-Total-Count 는 facets 를 줄 때만 붙는다. 전체 개수는 목록과 따로 모든 상품을 세야 하므로 패싯 집계와 함께 구한다.
+    개수만 필요하면 facets=gender 처럼 하나만 준다
     """
     assert isinstance(request, HttpRequest)
 
-    arguments = _get_arguments(request)
+    try:
+        arguments = _get_arguments(request)
+    except ValueError as error:
+        return HttpResponse(str(error), status=500)
 
-    skin_type_key = 'skin_type'
-    skin_type = arguments.get(skin_type_key)
-    if skin_type is None:
-        return HttpResponse('skin_type field must be exist', status=500)
-    else:
-        assert isinstance(skin_type, str)
+    error_response = _check_profile(arguments)
+    if error_response is not None:
+        return error_response
 
-    entries = Item.objects
+    if not arguments.get('facets', set()) <= set(FACET_FIELDS):
+        return HttpResponse('facets is wrong', status=500)
 
-    if skin_type not in SKIN_TYPE_TO_DATABASE_FIELDS:
-        return HttpResponse('skin_type is wrong', status=500)
+    # cursor 가 있으면 page 보다 우선한다
+    after = arguments.get('after')
+    if after is not None and arguments['skin_type'] not in SKIN_TYPE_TO_SCORE_FIELDS:
+        return HttpResponse('cursor is wrong', status=500)
 
-    database_field = SKIN_TYPE_TO_DATABASE_FIELDS[skin_type]
-    entries = entries.order_by(database_field, 'price')
+    return cached_response(request, 'products', arguments, functools.partial(_render_products, arguments, after))
 
-    if entries:
-        category = arguments.get('category')
-        if category is not None:
-            entries = entries.filter(category__iexact=category)
 
-        queries = _build_ingredient_queries(arguments, 'exclude_ingredient', operator.or_)
-        if queries is not None:
-            entries = entries.exclude(queries)
+@read_from_replica
+def product(request, item_id) -> 'HttpResponse':
+    """상품 세부 정보를 반환. skin_type 에 가중치를 주면 추천 상품도 그 순서로 고른다
+    """
+    assert isinstance(request, HttpRequest)
+    assert isinstance(item_id, int)
 
-        queries = _build_ingredient_queries(arguments, 'include_ingredient', operator.and_)
-        if queries is not None:
-            entries = entries.filter(queries)
+    try:
+        arguments = _get_arguments(request)
+    except ValueError as error:
+        return HttpResponse(str(error), status=500)
 
-        page = arguments.get('page')
-        if page is None:
-            entries = entries[:ITEM_PER_PAGE]
-        else:
-            current_count = ITEM_PER_PAGE * page
-            entries = entries[current_count:current_count + ITEM_PER_PAGE]
+    error_response = _check_profile(arguments)
+    if error_response is not None:
+        return error_response
 
-        if entries:
-            fields = (
-                'id',
-                'name',
-                'price',
-                'ingredients',
-                'monthlySales',
-            )
-            results = []
-            for entry in entries:
-                result = _extract_data_from_entry(entry, fields, True)
-                results.append(result)
+    skin_type = arguments['skin_type']
+    arguments = {'item_id': item_id, 'skin_type': skin_type}
 
-            return JsonResponse(results, safe=False, json_dumps_params=JSON_PARAMETERS)
+    return cached_response(request, 'product', arguments, functools.partial(_render_product, item_id, skin_type))
 
-    return JsonResponse([], safe=False)
 
+@read_from_replica
+def products_batch(request) -> 'HttpResponse':
+    """여러 상품의 세부 정보를 한 번에 반환. ids 순서대로 각 상품에 대한 product() 결과를 담은 배열
+    """
+    assert isinstance(request, HttpRequest)
 
-def product(request, item_id) -> 'HttpResponse':
-    """상품 세부 정보를 반환
+    try:
+        arguments = _get_arguments(request)
+    except ValueError as error:
+        return HttpResponse(str(error), status=500)
+
+    error_response = _check_profile(arguments)
+    if error_response is not None:
+        return error_response
+
+    skin_type = arguments['skin_type']
+
+    value = request.GET.get('ids')
+    if not value:
+        return HttpResponse('ids field must be exist', status=500)
+
+    try:
+        item_ids = [int(item_id) for item_id in value.split(',')]
+    except ValueError:
+        return HttpResponse('ids is wrong', status=500)
+
+    if len(item_ids) > MAX_BATCH_ITEM_COUNT:
+        return HttpResponse('too many ids', status=500)
+
+    arguments = {'ids': item_ids, 'skin_type': skin_type}
+
+    return cached_response(request, 'products_batch', arguments, functools.partial(_render_batch, item_ids, skin_type))
+
+
+@read_from_replica
+def search(request) -> 'HttpResponse':
+    """이름에 q 가 들어 있는 상품을 products() 와 같은 순서로 반환. 대소문자와 공백은 무시한다
     """
     assert isinstance(request, HttpRequest)
-    assert isinstance(item_id, int)
 
-    entries = Item.objects
-    item_entry = entries.get(id__exact=item_id)
+    try:
+        arguments = _get_arguments(request)
+    except ValueError as error:
+        return HttpResponse(str(error), status=500)
 
-    if item_entry is None:
-        return HttpResponse('item is not exists', status=500)
+    error_response = _check_skin_type(arguments.get('skin_type'))
+    if error_response is not None:
+        return error_response
+
+    query = arguments.get('q')
+    if query is None:
+        return HttpResponse('q field must be exist', status=500)
+
+    query = normalize_name(query)
+    if len(query) < GRAM_SIZE:
+        return HttpResponse('q is too short', status=500)
+
+    arguments = {'q': query, 'skin_type': arguments['skin_type'], 'page': arguments.get('page', 0)}
+
+    return cached_response(request, 'search', arguments, functools.partial(_render_search, arguments))
+
+
+def export_products(request) -> 'HttpResponse':
+    """products() 와 같은 조건에 맞는 상품 전체를 한 줄에 하나씩 JSON 으로 내려보냄
 
-    arguments = _get_arguments(request)
+    결과 전체를 메모리에 올리지 않도록 정렬 키 기준으로 EXPORT_CHUNK_SIZE 개씩 나눠 읽는다.
+    skin_type 이 가중치 목록이면 점수 표에서 구한 순서대로 id 를 나눠 읽는다
+    """
+    assert isinstance(request, HttpRequest)
+
+    try:
+        arguments = _get_arguments(request)
+    except ValueError as error:
+        return HttpResponse(str(error), status=500)
+
+    error_response = _check_profile(arguments)
+    if error_response is not None:
+        return error_response
+
+    skin_type = arguments['skin_type']
+
+    return StreamingHttpResponse(_export_lines(arguments, skin_type), content_type='application/x-ndjson')
+
+
+def metrics(request) -> 'HttpResponse':
+    """이 워커의 지표를 Prometheus 텍스트 형식으로 반환
+    """
+    assert isinstance(request, HttpRequest)
+
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
+
+
+def ready(request) -> 'HttpResponse':
+    """요청을 받을 준비가 됐는지 반환. 카탈로그 캐시를 채우는 일은 프로브 밖의 스레드에서 한다
+
+    한 번도 채우지 않았거나 데이터베이스에 연결할 수 없으면 503. 카탈로그가 바뀐 뒤에는 다시 채우는 동안에도 준비된 것으로 본다
+    """
+    assert isinstance(request, HttpRequest)
+
+    if not is_warm():
+        start_warm_up()
+
+        if not has_warmed_up():
+            return HttpResponse('catalog is not ready', status=503)
+
+    try:
+        connection.ensure_connection()
+        if not connection.is_usable():
+            return HttpResponse('database is not ready', status=503)
+    except DatabaseError:
+        return HttpResponse('database is not ready', status=503)
+
+    return HttpResponse('ready')
+
+
+def _check_profile(arguments) -> 'None or HttpResponse':
+    """skin_type 이 피부 타입 하나가 아니면 가중치 목록으로 읽어 정규화한 문자열로 바꿔 둠
+    """
+    assert isinstance(arguments, collections.abc.MutableMapping)
 
     skin_type = arguments.get('skin_type')
+    if skin_type is None or skin_type in SKIN_TYPE_TO_DATABASE_FIELDS:
+        return _check_skin_type(skin_type)
+
+    try:
+        arguments['skin_type'] = format_profile(parse_profile(skin_type))
+    except ValueError:
+        return HttpResponse('skin_type is wrong', status=500)
+
+    return None
+
+
+def _check_skin_type(skin_type) -> 'None or HttpResponse':
     if skin_type is None:
         return HttpResponse('skin_type field must be exist', status=500)
     else:
@@ -114,6 +246,282 @@ def product(request, item_id) -> 'HttpResponse':
     if skin_type not in SKIN_TYPE_TO_DATABASE_FIELDS:
         return HttpResponse('skin_type is wrong', status=500)
 
+    return None
+
+
+def _export_lines(arguments, skin_type, chunk_size=EXPORT_CHUNK_SIZE) -> 'iterator':
+    assert isinstance(chunk_size, int)
+
+    # 응답을 보내는 동안 읽으므로 뷰가 아니라 여기서 복제본을 고른다
+    with using_replica():
+        yield from _export_chunks(arguments, skin_type, chunk_size)
+
+
+def _export_chunks(arguments, skin_type, chunk_size) -> 'iterator':
+    fields = (
+        'id',
+        'name',
+        'price',
+        'ingredients',
+        'monthlySales',
+    )
+
+    # 가중치 목록은 점수 표에서 전체 순서를 한 번에 구하고 id 로 나눠 읽는다
+    if skin_type not in SKIN_TYPE_TO_SCORE_FIELDS:
+        ranked_ids = _rank_weighted_products(arguments)
+        row_type = PRODUCT_ROW_TYPES[next(iter(parse_profile(skin_type)))]
+
+        for start in range(0, len(ranked_ids), chunk_size):
+            chunk = _fetch_ranked_rows(ranked_ids[start:start + chunk_size].tolist(), row_type)
+            if chunk:
+                yield b'\n'.join(encode_entry(entry, fields, True) for entry in chunk) + b'\n'
+
+        return
+
+    # 후보는 조각마다 다시 찾지 않는다
+    arguments = dict(arguments, candidate_ids=_find_candidate_ids(arguments))
+    chunk = _fetch_products(arguments, skin_type, None, 0, chunk_size)
+    score_field = SKIN_TYPE_TO_SCORE_FIELDS[skin_type]
+
+    while chunk:
+        lines = [encode_entry(entry, fields, True) for entry in chunk]
+        yield b'\n'.join(lines) + b'\n'
+
+        if len(chunk) < chunk_size:
+            break
+
+        entry = chunk[-1]
+        after = (getattr(entry, score_field), entry.price, entry.id)
+        chunk = _fetch_products(arguments, skin_type, after, 0, chunk_size)
+
+
+def _render_products(arguments, after) -> 'HttpResponse':
+    assert isinstance(arguments, collections.abc.Mapping)
+
+    skin_type = arguments['skin_type']
+
+    page = arguments.get('page')
+    if page is None or after is not None:
+        offset = 0
+    else:
+        offset = ITEM_PER_PAGE * page
+
+    if skin_type not in SKIN_TYPE_TO_SCORE_FIELDS:
+        entries = _fetch_weighted_products(arguments, offset, ITEM_PER_PAGE)
+    elif settings.CATALOG_ENGINE_ENABLED:
+        entries = get_engine().select(
+            skin_type,
+            arguments.get('category'),
+            arguments.get('include_ingredient'),
+            arguments.get('exclude_ingredient'),
+            offset,
+            ITEM_PER_PAGE,
+            after)
+    else:
+        # 목록과 개수에 같은 후보를 쓴다
+        arguments = dict(arguments, candidate_ids=_find_candidate_ids(arguments))
+        entries = _fetch_products(arguments, skin_type, after, offset, ITEM_PER_PAGE)
+
+    fields = (
+        'id',
+        'name',
+        'price',
+        'ingredients',
+        'monthlySales',
+    )
+    with measure_serialization():
+        content = serialize_entries(entries, fields, True)
+
+    response = HttpResponse(content, content_type='application/json')
+
+    # 다음 페이지는 마지막 상품의 정렬 키 다음부터 찾는다
+    if len(entries) == ITEM_PER_PAGE and skin_type in SKIN_TYPE_TO_SCORE_FIELDS:
+        entry = entries[-1]
+        score = getattr(entry, SKIN_TYPE_TO_SCORE_FIELDS[skin_type])
+        response['X-Next-Cursor'] = encode_cursor(score, entry.price, entry.id)
+
+    facet_fields = arguments.get('facets')
+    if facet_fields:
+        # 개수는 정렬과 관계없으므로 가중치 목록이면 아무 피부 타입으로 센다
+        if skin_type not in SKIN_TYPE_TO_SCORE_FIELDS:
+            skin_type = next(iter(parse_profile(skin_type)))
+
+        if settings.CATALOG_ENGINE_ENABLED:
+            total_count, facets = get_engine().count_facets(
+                skin_type,
+                arguments.get('category'),
+                arguments.get('include_ingredient'),
+                arguments.get('exclude_ingredient'))
+        else:
+            total_count, facets = _count_facets(arguments, skin_type)
+
+        facets = {field: facets[field] for field in facet_fields}
+        # 패싯 집계에서 함께 나오는 값이므로 facets 가 없으면 보내지 않는다
+        response['X-Total-Count'] = str(total_count)
+        response['X-Facets'] = json.dumps(facets, sort_keys=True, separators=(',', ':'))
+
+    return response
+
+
+def _count_facets(arguments, skin_type) -> '(int, {str: {str: int}})':
+    """products() 와 같은 조건의 전체 개수와 분류/성별 개수를 (분류, 성별) 로 묶은 쿼리 한 번으로 셈
+
+    분류 개수는 성분 조건만 적용해서 다른 분류로 옮겨 갈 때의 개수를 보여 준다
+    """
+    assert isinstance(arguments, collections.abc.Mapping)
+
+    category = arguments.get('category')
+    if category is not None:
+        category = category.lower()
+
+    candidate_ids = _get_candidate_ids(arguments)
+    if candidate_ids is None:
+        entries = _query_products({key: value for key, value in arguments.items() if key != 'category'}, skin_type)
+        rows = entries.order_by().values_list('category', 'gender').annotate(count=Count('id'))
+    else:
+        rows = []
+        for start in range(0, len(candidate_ids), CANDIDATE_CHUNK_SIZE):
+            entries = Item.objects.filter(id__in=candidate_ids[start:start + CANDIDATE_CHUNK_SIZE])
+            rows.extend(entries.values_list('category', 'gender').annotate(count=Count('id')))
+
+    total_count = 0
+    categories = collections.Counter()
+    genders = collections.Counter()
+    for row_category, gender, count in rows:
+        categories[row_category] += count
+
+        if category is None or row_category == category:
+            genders[gender] += count
+            total_count += count
+
+    return total_count, {'category': dict(categories), 'gender': dict(genders)}
+
+
+def _render_search(arguments) -> 'HttpResponse':
+    assert isinstance(arguments, collections.abc.Mapping)
+
+    query = arguments['q']
+    offset = ITEM_PER_PAGE * arguments['page']
+
+    index = get_search_index()
+    blocks = index.iter_search(query, arguments['skin_type'])
+    # 다시 만드는 중이라 이전 색인이면 그 사이 이름이 바뀌었을 수 있으므로 모두 확인한다
+    is_exact = index.is_exact(query) and index.version >= get_catalog_version()
+    entries = _select_matching_names(blocks, query, arguments['skin_type'], is_exact, offset, ITEM_PER_PAGE)
+
+    fields = (
+        'id',
+        'name',
+        'price',
+        'ingredients',
+        'monthlySales',
+    )
+    with measure_serialization():
+        content = serialize_entries(entries, fields, True)
+
+    return HttpResponse(content, content_type='application/json')
+
+
+def _select_matching_names(blocks, query, skin_type, is_exact, offset, limit) -> '[ProductRow]':
+    """검색 후보 중 이름에 query 가 이어져 들어 있는 상품을 순서대로 offset 부터 limit 개 반환
+
+    bigram 이 모두 들어 있어도 떨어져 있을 수 있으므로 is_exact 가 아니면 앞에서부터 필요한 만큼만 읽어 확인한다
+    """
+    row_type = PRODUCT_ROW_TYPES[skin_type]
+    results = []
+    skipped = 0
+
+    for item_ids in blocks:
+        item_ids = item_ids.tolist()
+
+        # 확인할 필요가 없으면 건너뛸 상품은 읽지 않는다
+        if is_exact and skipped < offset:
+            count = min(offset - skipped, len(item_ids))
+            item_ids = item_ids[count:]
+            skipped += count
+
+        position = 0
+        while position < len(item_ids):
+            # 정답이면 남은 개수만큼만 읽는다. 그 사이 지워진 상품이 있으면 다음 조각에서 이어 읽는다
+            size = SEARCH_VERIFY_CHUNK_SIZE
+            if is_exact:
+                size = min(size, limit - len(results))
+
+            chunk = item_ids[position:position + size]
+            position += len(chunk)
+
+            rows = fetch_rows('items', row_type, _query_items, {'ids': chunk})
+            item_entries = {row.id: row for row in rows}
+
+            for item_id in chunk:
+                item_entry = item_entries.get(item_id)
+                if item_entry is None or query not in normalize_name(item_entry.name):
+                    continue
+
+                if skipped < offset:
+                    skipped += 1
+                else:
+                    results.append(item_entry)
+
+                    if len(results) == limit:
+                        return results
+
+    return results
+
+
+def _render_product(item_id, skin_type) -> 'HttpResponse':
+    assert isinstance(item_id, int)
+    assert isinstance(skin_type, str)
+
+    entries = fetch_rows('items', DetailRow, _query_items, {'ids': [item_id]})
+    if not entries:
+        return HttpResponse('item is not exists', status=500)
+
+    item_entry = entries[0]
+
+    # 추천은 카탈로그 버전마다 미리 구해 둔 표에서 찾는다
+    if skin_type in SKIN_TYPE_TO_SCORE_FIELDS:
+        recommend_item_entries = get_recommendation_table().recommend(item_entry.category, skin_type, item_id)
+    else:
+        recommend_item_entries = _recommend_weighted(item_entry.category, skin_type, item_id)
+    with measure_serialization():
+        content = _serialize_product(item_entry, recommend_item_entries, get_catalog_version())
+
+    return HttpResponse(content, content_type='application/json')
+
+
+def _render_batch(item_ids, skin_type) -> 'HttpResponse':
+    assert isinstance(item_ids, list)
+    assert isinstance(skin_type, str)
+
+    rows = fetch_rows('items', DetailRow, _query_items, {'ids': item_ids})
+    item_entries = {row.id: row for row in rows}
+    if len(item_entries) != len(set(item_ids)):
+        return HttpResponse('item is not exists', status=500)
+
+    products = []
+    if skin_type in SKIN_TYPE_TO_SCORE_FIELDS:
+        table = get_recommendation_table()
+        for item_id in item_ids:
+            item_entry = item_entries[item_id]
+            products.append((item_entry, table.recommend(item_entry.category, skin_type, item_id)))
+    else:
+        for item_id in item_ids:
+            item_entry = item_entries[item_id]
+            products.append((item_entry, _recommend_weighted(item_entry.category, skin_type, item_id)))
+
+    with measure_serialization():
+        version = get_catalog_version()
+        contents = [_serialize_product(item_entry, recommend_item_entries, version)
+                    for item_entry, recommend_item_entries in products]
+        content = join_fragments(contents)
+
+    return HttpResponse(content, content_type='application/json')
+
+
+def _serialize_product(item_entry, recommend_item_entries, version) -> bytes:
+    """상세 정보 뒤에 추천 상품을 이어 붙인 하나의 배열
+    """
     fields = (
         'id',
         'name',
@@ -123,27 +531,268 @@ def product(request, item_id) -> 'HttpResponse':
         'ingredients',
         'monthlySales',
     )
-    result = _extract_data_from_entry(item_entry, fields, False)
-    results = [result]
-
-    recommend_item_entries = entries.filter(category__exact=item_entry.category)
-    recommend_item_entries = recommend_item_entries.exclude(id__exact=item_id)
-    database_field = SKIN_TYPE_TO_DATABASE_FIELDS[skin_type]
-    recommend_item_entries = recommend_item_entries.order_by(database_field, 'price')
+    fragments = [serialize_entry(item_entry, fields, False, version)]
 
     fields = (
         'id',
         'name',
         'price',
     )
-    for entry in recommend_item_entries[:MAX_RECOMMEND_ITEM_COUNT]:
-        result = _extract_data_from_entry(entry, fields, True)
-        results.append(result)
+    for entry in recommend_item_entries:
+        fragment = serialize_entry(entry, fields, True, version)
+        fragments.append(fragment)
+
+    return join_fragments(fragments)
+
+
+def _query_products(arguments, skin_type) -> 'QuerySet':
+    assert isinstance(arguments, collections.abc.Mapping)
+    assert skin_type in SKIN_TYPE_TO_DATABASE_FIELDS
+
+    # 전체 목록을 평가하지 않도록 조건을 모두 붙인 뒤에 한 번만 조회한다
+    database_field = SKIN_TYPE_TO_DATABASE_FIELDS[skin_type]
+    entries = Item.objects.order_by(database_field, 'price', 'id')
+
+    # 분류는 소문자로 저장되어 있다. iexact 는 LIKE 로 바뀌어 정렬 인덱스를 쓰지 못하므로 exact 로 찾는다
+    category = arguments.get('category')
+    if category is not None:
+        entries = entries.filter(category__exact=category.lower())
+
+    queries = _build_ingredient_queries(arguments, 'exclude_ingredient', operator.or_)
+    if queries is not None:
+        entries = entries.exclude(queries)
+
+    queries = _build_ingredient_queries(arguments, 'include_ingredient', operator.and_)
+    if queries is not None:
+        entries = entries.filter(queries)
+
+    return entries
+
+
+def _fetch_products(arguments, skin_type, after, offset, limit) -> '[ProductRow]':
+    """products() 조건에 맞는 상품을 정렬 순서대로 offset 부터 limit 개 반환. 목록에 쓰는 열만 읽는다
+
+    after 로 (점수, 가격, id) 를 주면 그 다음 상품부터 센다
+    """
+    assert isinstance(arguments, collections.abc.Mapping)
+    assert skin_type in SKIN_TYPE_TO_SCORE_FIELDS
+    assert isinstance(limit, int)
+
+    row_type = PRODUCT_ROW_TYPES[skin_type]
+    candidate_ids = _get_candidate_ids(arguments)
+    arguments = {key: arguments[key] for key in PRODUCT_QUERY_ARGUMENTS if key in arguments}
+    # 컴파일된 SQL 에는 값이 그대로 들어가므로 _query_products 가 바꾸는 값은 미리 바꿔 둔다
+    if 'category' in arguments:
+        arguments['category'] = arguments['category'].lower()
+
+    if candidate_ids is not None:
+        return _fetch_candidate_products(arguments, skin_type, candidate_ids, after, offset, limit)
+
+    build = functools.partial(_query_products, skin_type=skin_type)
+
+    if after is None:
+        return fetch_rows(('products', skin_type), row_type, build, arguments, offset, limit)
+
+    return _select_after(arguments, skin_type, after, limit)
+
+
+def _find_candidate_ids(arguments) -> 'None or [int]':
+    """성분 조건에 맞는 상품 id 를 게시 목록이 가장 짧은 포함 성분에서 시작해 찾음. 그 목록도 MAX_CANDIDATE_COUNT 보다 길면 None
+
+    드문 성분을 포함하는 조건은 정렬 인덱스를 따라가면 거의 모든 상품을 읽어야 한다.
+    짧은 게시 목록에서 후보를 구하고 나머지 성분 조건은 후보에만 확인하면 카탈로그 크기와 관계없다
+    """
+    assert isinstance(arguments, collections.abc.Mapping)
+
+    include = arguments.get('include_ingredient')
+    if not include:
+        return None
+
+    rarest = None
+    candidate_ids = None
+    for ingredient in sorted(include):
+        entries = ItemToIngredient.objects.filter(ingredient=ingredient).values_list('item_id', flat=True)
+        item_ids = list(entries[:MAX_CANDIDATE_COUNT + 1])
+        if len(item_ids) <= MAX_CANDIDATE_COUNT and (candidate_ids is None or len(item_ids) < len(candidate_ids)):
+            rarest = ingredient
+            candidate_ids = item_ids
+
+    if candidate_ids is None:
+        return None
+
+    for ingredient in sorted(include):
+        if ingredient != rarest:
+            candidate_ids = _match_ingredients(candidate_ids, (ingredient,))
+
+    exclude = arguments.get('exclude_ingredient')
+    if exclude:
+        excluded_ids = set(_match_ingredients(candidate_ids, exclude))
+        candidate_ids = [item_id for item_id in candidate_ids if item_id not in excluded_ids]
+
+    return candidate_ids
+
+
+def _get_candidate_ids(arguments) -> 'None or [int]':
+    """arguments 에 미리 찾아 둔 candidate_ids 가 있으면 그것을, 없으면 새로 찾은 후보
+    """
+    if 'candidate_ids' in arguments:
+        return arguments['candidate_ids']
+
+    return _find_candidate_ids(arguments)
+
+
+def _match_ingredients(item_ids, ingredients) -> '[int]':
+    """item_ids 중 ingredients 를 하나라도 포함하는 상품 id
+    """
+    assert isinstance(item_ids, list)
+
+    result = []
+    for start in range(0, len(item_ids), CANDIDATE_CHUNK_SIZE):
+        chunk = item_ids[start:start + CANDIDATE_CHUNK_SIZE]
+        entries = ItemToIngredient.objects.filter(ingredient__in=ingredients, item_id__in=chunk)
+        result.extend(entries.values_list('item_id', flat=True).distinct())
+
+    return result
+
+
+def _fetch_candidate_products(arguments, skin_type, candidate_ids, after, offset, limit) -> '[ProductRow]':
+    """후보 상품 중 분류 조건에 맞는 것을 정렬 순서대로 offset 부터 limit 개 반환. 정렬은 후보만 읽어서 한다
+    """
+    assert skin_type in SKIN_TYPE_TO_SCORE_FIELDS
+    assert isinstance(candidate_ids, list)
+
+    row_type = PRODUCT_ROW_TYPES[skin_type]
+    score_field = SKIN_TYPE_TO_SCORE_FIELDS[skin_type]
+    category = arguments.get('category')
+
+    rows = []
+    for start in range(0, len(candidate_ids), CANDIDATE_CHUNK_SIZE):
+        entries = Item.objects.filter(id__in=candidate_ids[start:start + CANDIDATE_CHUNK_SIZE])
+        if category is not None:
+            entries = entries.filter(category__exact=category)
+
+        rows.extend(row_type._make(entry) for entry in entries.values_list(*row_type._fields))
+
+    keys = sorted((-getattr(row, score_field), row.price, row.id) for row in rows)
+    rows = {row.id: row for row in rows}
+
+    if after is not None:
+        score, price, item_id = after
+        keys = keys[bisect.bisect_right(keys, (-score, price, item_id)):]
+
+    return [rows[item_id] for _, _, item_id in keys[offset:offset + limit]]
+
+
+def _fetch_weighted_products(arguments, offset, limit) -> '[ProductRow]':
+    """products() 조건에 맞는 상품을 가중치 목록 순서로 offset 부터 limit 개 반환
+    """
+    assert isinstance(arguments, collections.abc.Mapping)
+    assert isinstance(limit, int)
+
+    ranked_ids = _rank_weighted_products(arguments, offset + limit)
+    row_type = PRODUCT_ROW_TYPES[next(iter(parse_profile(arguments['skin_type'])))]
+
+    return _fetch_ranked_rows(ranked_ids[offset:offset + limit].tolist(), row_type)
+
+
+def _rank_weighted_products(arguments, count=None) -> 'numpy.ndarray':
+    """products() 조건에 맞는 상품 id 를 가중치 목록 순서로. count 를 주면 앞의 count 개만
+
+    성분 조건에 걸리는 상품 id 만 역색인에서 찾고, 정렬은 점수 표에서 NumPy 로 한다
+    """
+    assert isinstance(arguments, collections.abc.Mapping)
+
+    profile = parse_profile(arguments['skin_type'])
+    skin_type = next(iter(profile))
+
+    # 포함 조건은 맞는 상품을, 제외 조건은 뺄 상품을 찾는다. 둘 다 전체 상품보다 훨씬 적다
+    item_ids = None
+    if arguments.get('include_ingredient'):
+        entries = _query_products({'include_ingredient': arguments['include_ingredient']}, skin_type)
+        item_ids = numpy.fromiter(entries.order_by().values_list('id', flat=True), dtype=numpy.int64)
 
-    return JsonResponse(results, safe=False, json_dumps_params=JSON_PARAMETERS)
+    excluded_ids = None
+    if arguments.get('exclude_ingredient'):
+        entries = ItemToIngredient.objects.filter(ingredient__in=arguments['exclude_ingredient'])
+        excluded_ids = numpy.fromiter(entries.values_list('item_id', flat=True), dtype=numpy.int64)
+
+    return get_score_table().rank(profile, arguments.get('category'), item_ids, excluded_ids, count)
+
+
+def _fetch_ranked_rows(item_ids, row_type) -> list:
+    """item_ids 순서대로 row_type 의 열만 읽음. 그 사이 지워진 상품은 뺀다
+    """
+    assert isinstance(item_ids, list)
+
+    if not item_ids:
+        return []
+
+    item_entries = {row.id: row for row in fetch_rows('items', row_type, _query_items, {'ids': item_ids})}
+
+    return [item_entries[item_id] for item_id in item_ids if item_id in item_entries]
+
+
+def _recommend_weighted(category, skin_type, item_id) -> '[DetailRow]':
+    """같은 분류에서 item_id 를 뺀 가중치 목록 순서의 추천 상품
+    """
+    assert isinstance(category, str)
+    assert isinstance(item_id, int)
+
+    ranked_ids = get_score_table().rank(parse_profile(skin_type), category, count=MAX_RECOMMEND_ITEM_COUNT + 1)
+    item_ids = [ranked_id for ranked_id in ranked_ids.tolist() if ranked_id != item_id][:MAX_RECOMMEND_ITEM_COUNT]
+
+    return _fetch_ranked_rows(item_ids, DetailRow)
+
+
+def _select_after(arguments, skin_type, after, limit) -> '[ProductRow]':
+    """정렬 키 after 다음의 상품을 limit 개 반환
+
+    (점수 내림차순, 가격, id) 순서에서 after 뒤의 범위를 같은 점수 구간과 더 낮은 점수 구간으로 나눠 찾는다.
+    둘 다 복합 인덱스에서 바로 시작 위치를 찾을 수 있으므로 OFFSET 처럼 앞의 행을 읽지 않는다
+    """
+    assert skin_type in SKIN_TYPE_TO_SCORE_FIELDS
+    assert isinstance(limit, int)
+
+    row_type = PRODUCT_ROW_TYPES[skin_type]
+    score, price, item_id = after
+
+    build = functools.partial(_query_same_score, skin_type=skin_type)
+    same_score_arguments = dict(arguments, after=(score, price, item_id))
+    results = fetch_rows(('same_score', skin_type), row_type, build, same_score_arguments, 0, limit)
+
+    if len(results) < limit:
+        build = functools.partial(_query_lower_score, skin_type=skin_type)
+        results.extend(fetch_rows(
+            ('lower_score', skin_type), row_type, build, dict(arguments, score=score), 0, limit - len(results)))
+
+    return results
+
+
+def _query_same_score(arguments, skin_type) -> 'QuerySet':
+    score_field = SKIN_TYPE_TO_SCORE_FIELDS[skin_type]
+    score, price, item_id = arguments['after']
+
+    entries = _query_products(arguments, skin_type)
+    entries = entries.filter(**{score_field: score, 'price__gte': price})
+
+    return entries.filter(Q(price__gt=price) | Q(id__gt=item_id))
+
+
+def _query_lower_score(arguments, skin_type) -> 'QuerySet':
+    score_field = SKIN_TYPE_TO_SCORE_FIELDS[skin_type]
+
+    return _query_products(arguments, skin_type).filter(**{score_field + '__lt': arguments['score']})
+
+
+def _query_items(arguments) -> 'QuerySet':
+    return Item.objects.filter(id__in=arguments['ids'])
 
 
 def _get_arguments(request) -> '{str: object}':
+    """요청 인자를 읽음. page 가 음수이거나 정수가 아니면, cursor 를 읽을 수 없으면 '... is wrong' 을 담은 ValueError
+
+    cursor 는 풀어서 after 에 (점수, 가격, id) 로 넣어 둔다
+    """
     assert isinstance(request, HttpRequest)
 
     result = {}
@@ -152,18 +801,34 @@ def _get_arguments(request) -> '{str: object}':
         ('skin_type', str),
         ('category', str),
         ('page', int),
+        ('cursor', str),
+        ('q', str),
     )
     for argument, valueType in single_arguments:
         value = request.GET.get(argument)
         if value:
-            value = valueType(value)
+            try:
+                value = valueType(value)
+            except ValueError as error:
+                raise ValueError('{} is wrong'.format(argument)) from error
+
             result[argument] = value
 
+    if result.get('page', 0) < 0:
+        raise ValueError('page is wrong')
+
+    if 'cursor' in result:
+        result['after'] = decode_cursor(result['cursor'])
+
     multiple_arguments = ('exclude_ingredient', 'include_ingredient')
     for argument in multiple_arguments:
         value = request.GET.get(argument)
         if value:
-            result[argument] = set(value.split(','))
+            result[argument] = split_ingredients(value)
+
+    value = request.GET.get('facets')
+    if value:
+        result['facets'] = {field.strip() for field in value.split(',') if field.strip()}
 
     return result
 
@@ -174,44 +839,18 @@ def _build_ingredient_queries(arguments, keyword, operator_type) -> 'None or Q':
     assert operator_type in (operator.or_, operator.and_)
 
     ingredients = arguments.get(keyword)
-    if ingredients is None:
+    if not ingredients:
         return None
+    elif operator_type is operator.or_:
+        # 하나라도 포함하면 되므로 역색인을 한 번만 찾는다
+        item_ids = ItemToIngredient.objects.filter(ingredient__in=ingredients).values('item_id')
+
+        return Q(id__in=item_ids)
     else:
         queries = []
         for ingredient in ingredients:
-            query = Q(ingredients__icontains=ingredient)
+            item_ids = ItemToIngredient.objects.filter(ingredient=ingredient).values('item_id')
+            query = Q(id__in=item_ids)
             queries.append(query)
 
         return functools.reduce(operator_type, queries)
-
-
-def _build_image_url(image_id, is_thumbnail = True) -> str:
-    assert isinstance(image_id, str)
-    assert isinstance(is_thumbnail, bool)
-
-    if is_thumbnail:
-        path = 'thumbnail'
-    else:
-        path = 'image'
-
-    file_name = image_id + '.jpg'
-    path = '/'.join((path, file_name))
-
-    return urllib.parse.urljoin(RESOURCE_URL, path)
-
-
-def _extract_data_from_entry(entry, fields, is_thumbnail) -> '{str: object}':
-    assert isinstance(entry, Item)
-    assert isinstance(fields, collections.abc.Sequence)
-    assert isinstance(is_thumbnail, bool)
-
-    result = {}
-
-    for field in fields:
-        value = entry.__getattribute__(field)
-        result[field] = value
-
-    image_url = _build_image_url(entry.imageId, is_thumbnail)
-    result['imgUrl'] = image_url
-
-    return result
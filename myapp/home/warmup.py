@@ -0,0 +1,118 @@
+import threading
+import time
+import urllib.parse
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import resolve
+from myapp.home.engine import get_engine
+from myapp.home.profiles import get_score_table
+from myapp.home.recommendations import get_recommendation_table
+from myapp.home.search import get_search_index
+from myapp.item.catalog import get_catalog_version
+from myapp.item.fields import SKIN_TYPE_TO_SCORE_FIELDS
+from myapp.item.models import Item
+
+
+# 미리 응답을 만들어 둘 목록 조회. 분류 별 첫 페이지가 가장 많이 요청된다
+WARM_UP_PATH = '/products/'
+
+_warm_version = None
+_warm_up_lock = threading.Lock()
+_warm_up_thread = None
+_warm_up_thread_lock = threading.Lock()
+
+
+def warm_up() -> '{str: float}':
+    """카탈로그에서 만드는 객체(추천 표, 검색 색인, 점수 표, 엔진, 상품 조각, 첫 페이지 응답)를 미리 만듦. 단계별 소요 시간(초)을 반환
+
+    gunicorn 마스터에서 fork 전에 부르면 워커들이 이 객체들을 copy-on-write 로 나눠 쓴다
+    """
+    global _warm_version
+
+    # 뷰가 이 모듈을 쓸 수 있으므로 순환 import 를 피한다
+    from myapp.home.views import products
+
+    with _warm_up_lock:
+        version = get_catalog_version()
+        timings = {}
+
+        start = time.perf_counter()
+        resolve(WARM_UP_PATH)
+        timings['urls'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # 미리 만드는 것이므로 이전 구조를 받지 않고 기다린다
+        get_recommendation_table(is_blocking=True)
+        timings['recommendations'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_search_index(is_blocking=True)
+        timings['search'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_score_table(is_blocking=True)
+        timings['profiles'] = time.perf_counter() - start
+
+        if settings.CATALOG_ENGINE_ENABLED:
+            start = time.perf_counter()
+            get_engine(is_blocking=True)
+            timings['engine'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        categories = sorted(Item.objects.values_list('category', flat=True).distinct())
+        for skin_type in SKIN_TYPE_TO_SCORE_FIELDS:
+            products(_build_request(skin_type=skin_type))
+
+            for category in categories:
+                products(_build_request(skin_type=skin_type, category=category))
+        timings['responses'] = time.perf_counter() - start
+
+        _warm_version = version
+
+        return timings
+
+
+def start_warm_up() -> bool:
+    """요청을 처리하는 스레드를 막지 않도록 warm_up() 을 백그라운드 스레드에서 시작. 이미 진행 중이면 False
+    """
+    global _warm_up_thread
+
+    with _warm_up_thread_lock:
+        if _warm_up_thread is not None and _warm_up_thread.is_alive():
+            return False
+
+        _warm_up_thread = threading.Thread(target=_run_warm_up, name='catalog-warm-up', daemon=True)
+        _warm_up_thread.start()
+
+        return True
+
+
+def is_warm() -> bool:
+    """현재 카탈로그 버전으로 warm_up() 을 마쳤는지
+    """
+    return _warm_version is not None and _warm_version == get_catalog_version()
+
+
+def has_warmed_up() -> bool:
+    """이 프로세스에서 어떤 카탈로그 버전으로든 warm_up() 을 한 번이라도 마쳤는지
+    """
+    return _warm_version is not None
+
+
+def _run_warm_up() -> None:
+    try:
+        warm_up()
+    finally:
+        # 이 스레드의 DB 연결은 다시 쓰이지 않는다
+        connections.close_all()
+
+
+def _build_request(**parameters) -> 'HttpRequest':
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = WARM_UP_PATH
+    request.META['QUERY_STRING'] = urllib.parse.urlencode(parameters)
+    request.GET = QueryDict(request.META['QUERY_STRING'])
+
+    return request
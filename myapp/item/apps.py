@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class ItemConfig(AppConfig):
-    name = 'item'
+    name = 'myapp.item'
+    label = 'item'
+
+    def ready(self) -> None:
+        from myapp.item import signals
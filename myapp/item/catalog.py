@@ -0,0 +1,162 @@
+import collections
+import time
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.dispatch import Signal
+from myapp.item.models import CatalogVersion, Item, ItemToIngredient
+
+
+INDEX_BATCH_SIZE = 1000
+CATALOG_VERSION_ID = 1
+
+# bump_catalog_version 뒤에 보냄. item_ids 가 None 이면 어떤 상품이 바뀌었는지 모른다는 뜻
+catalog_changed = Signal(providing_args=['version', 'item_ids'])
+
+# 마지막으로 읽은 (버전, 바뀐 시각, 읽은 때의 time.monotonic()). 여러 스레드가 읽으므로 한 번에 바꾼다
+_catalog_state = None
+# 이 프로세스가 쓴 가장 큰 버전. 되돌려진 트랜잭션 안에서 올린 번호를 다른 내용으로 다시 쓰지 않게 한다
+_max_version = 0
+
+
+def get_catalog_version() -> int:
+    """카탈로그가 바뀔 때마다 증가하는 번호. 카탈로그로부터 만든 캐시는 이 번호로 유효성을 확인한다
+
+    모든 프로세스가 같은 번호를 보도록 DB 의 CatalogVersion 행에 둔다. 다른 프로세스의 변경은
+    CATALOG_VERSION_CHECK_INTERVAL 초 안에 보인다
+    """
+    return _get_catalog_state()[0]
+
+
+def get_catalog_modified() -> float:
+    """카탈로그가 마지막으로 바뀐 시각(epoch 초)
+    """
+    return _get_catalog_state()[1]
+
+
+def bump_catalog_version(item_ids=None) -> int:
+    """카탈로그가 바뀌었음을 알림. 대량 적재처럼 시그널이 발생하지 않는 변경 뒤에는 직접 불러야 한다
+
+    바뀐 상품을 알면 item_ids 로 넘겨 상품 단위 캐시가 그 상품만 지우게 한다
+    """
+    assert item_ids is None or isinstance(item_ids, collections.abc.Iterable)
+
+    version = _increase_catalog_version()
+    catalog_changed.send(sender=Item, version=version, item_ids=item_ids)
+
+    return version
+
+
+def _get_catalog_state() -> '(int, float, float)':
+    global _catalog_state
+
+    state = _catalog_state
+    if state is None or time.monotonic() - state[2] >= settings.CATALOG_VERSION_CHECK_INTERVAL:
+        version, modified = _load_catalog_version()
+        state = _catalog_state = (version, modified, time.monotonic())
+
+    return state
+
+
+def _load_catalog_version() -> '(int, float)':
+    # 복제 DB 는 늦을 수 있고 복제 DB 를 고를 때 이 값을 쓰므로 기본 DB 에서 읽는다
+    objects = CatalogVersion.objects.using(router.db_for_write(CatalogVersion))
+    row = objects.filter(id=CATALOG_VERSION_ID).values_list('version', 'modified').first()
+    if row is not None:
+        return row
+
+    # 행이 지워진 뒤에도 예전 번호로 돌아가지 않도록 시각으로 시작
+    now = time.time()
+    version = max(int(now * 1000), _max_version + 1)
+    entry, _ = objects.get_or_create(id=CATALOG_VERSION_ID, defaults={'version': version, 'modified': now})
+
+    return entry.version, entry.modified
+
+
+def _increase_catalog_version() -> int:
+    global _catalog_state, _max_version
+
+    objects = CatalogVersion.objects.using(router.db_for_write(CatalogVersion))
+    now = time.time()
+
+    # 한 문장으로 올리므로 동시에 올려도 번호가 겹치지 않는다
+    updates = {'version': Greatest(F('version') + 1, Value(_max_version + 1)), 'modified': now}
+    if not objects.filter(id=CATALOG_VERSION_ID).update(**updates):
+        _load_catalog_version()
+        objects.filter(id=CATALOG_VERSION_ID).update(**updates)
+
+    version = objects.values_list('version', flat=True).get(id=CATALOG_VERSION_ID)
+
+    _max_version = version
+    _catalog_state = (version, now, time.monotonic())
+
+    return version
+
+
+def split_ingredients(ingredients) -> '{str}':
+    """성분 문자열을 색인에 쓰는 토큰 집합으로 나눔
+    """
+    assert isinstance(ingredients, str)
+
+    return set(_tokenize(ingredients))
+
+
+def count_ingredients(ingredients) -> '{str: int}':
+    """성분 토큰 별 등장 횟수. 같은 성분이 두 번 들어 있는 상품이 있다
+    """
+    assert isinstance(ingredients, str)
+
+    return collections.Counter(_tokenize(ingredients))
+
+
+def rebuild_ingredient_index(items) -> None:
+    """주어진 상품들의 성분 역색인을 다시 만듦
+    """
+    assert isinstance(items, collections.abc.Iterable)
+
+    items = list(items)
+    if not items:
+        return
+
+    with transaction.atomic():
+        for start in range(0, len(items), INDEX_BATCH_SIZE):
+            batch = items[start:start + INDEX_BATCH_SIZE]
+            ItemToIngredient.objects.filter(item_id__in=[item.id for item in batch]).delete()
+            ItemToIngredient.objects.bulk_create(_build_index_entries(batch))
+
+
+def rebuild_full_ingredient_index() -> None:
+    """전체 카탈로그의 성분 역색인을 다시 만듦
+    """
+    with transaction.atomic():
+        ItemToIngredient.objects.all().delete()
+
+        entries = Item.objects.only('id', 'ingredients').order_by('id').iterator(chunk_size=INDEX_BATCH_SIZE)
+        batch = []
+        for item in entries:
+            batch.append(item)
+
+            if len(batch) == INDEX_BATCH_SIZE:
+                ItemToIngredient.objects.bulk_create(_build_index_entries(batch))
+                batch = []
+
+        if batch:
+            ItemToIngredient.objects.bulk_create(_build_index_entries(batch))
+
+
+def _tokenize(ingredients) -> '[str]':
+    tokens = (token.strip().lower() for token in ingredients.split(','))
+
+    return [token for token in tokens if token]
+
+
+def _build_index_entries(items) -> '[ItemToIngredient]':
+    entries = []
+
+    for item in items:
+        for ingredient, count in count_ingredients(item.ingredients).items():
+            entry = ItemToIngredient(item_id=item.id, ingredient=ingredient, count=count)
+            entries.append(entry)
+
+    return entries
@@ -0,0 +1,26 @@
+"""상품 필드와 피부 타입
+
+모델을 읽지 않으므로 Django 를 설정하기 전(벤치마크, 합성 데이터 생성)에도 import 할 수 있다.
+"""
+
+
+SKIN_TYPES = ('oily', 'dry', 'sensitive')
+SKIN_TYPE_TO_SCORE_FIELDS = {
+    'oily': 'oilyScore',
+    'dry': 'dryScore',
+    'sensitive': 'sensitiveScore',
+}
+# Item 의 모든 필드. 한 번에 읽고 쓸 때 이 순서를 쓴다
+ITEM_FIELDS = (
+    'id',
+    'imageId',
+    'name',
+    'price',
+    'gender',
+    'category',
+    'ingredients',
+    'monthlySales',
+    'oilyScore',
+    'dryScore',
+    'sensitiveScore',
+)
@@ -0,0 +1,533 @@
+import collections
+import csv
+import json
+import resource
+import numpy
+from django.db import connections, router, transaction
+from django.db.models import F
+from myapp.item.catalog import bump_catalog_version, count_ingredients
+from myapp.item.fields import ITEM_FIELDS, SKIN_TYPE_TO_SCORE_FIELDS, SKIN_TYPES
+from myapp.item.models import Ingredient, Item, ItemToIngredient
+
+
+INGEST_BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+RATING_TO_SCORE = {
+    'O': 1,
+    'X': -1,
+    '': 0,
+}
+SCORE_TO_RATING = {score: rating for rating, score in RATING_TO_SCORE.items()}
+# 대량 갱신에서 바꿀 수 있는 필드. 점수는 성분에서 다시 계산한다
+UPDATE_FIELDS = (
+    'imageId',
+    'name',
+    'price',
+    'gender',
+    'category',
+    'ingredients',
+    'monthlySales',
+)
+GENDERS = ('all', 'female', 'male')
+# 바뀐 상품이 이보다 많으면 id 를 모아 두지 않고 모든 상품 단위 캐시를 지운다
+MAX_CHANGED_ITEM_IDS = 10000
+
+
+class IngredientRatings:
+    """성분 이름 -> 피부 타입 별 점수 행렬
+
+    마지막 행은 모르는 성분을 위한 0 점이다
+    """
+
+    def __init__(self, records) -> None:
+        assert isinstance(records, collections.abc.Iterable)
+
+        self.indices = {}
+        scores = []
+
+        for record in records:
+            name = record['name'].strip().lower()
+            if name in self.indices:
+                raise ValueError('duplicated ingredient: ' + name)
+
+            self.indices[name] = len(scores)
+            scores.append([RATING_TO_SCORE[record[skin_type] or ''] for skin_type in SKIN_TYPES])
+
+        scores.append([0] * len(SKIN_TYPES))
+        self.scores = numpy.array(scores, dtype=numpy.int32)
+        self.unknown_index = len(scores) - 1
+
+    def score(self, ingredient_lists) -> 'numpy.ndarray':
+        """상품마다 성분 점수를 더해 (상품 수, 피부 타입 수) 행렬로 반환. 같은 성분이 두 번 있으면 두 번 더한다
+        """
+        assert isinstance(ingredient_lists, collections.abc.Sequence)
+
+        indices = []
+        offsets = []
+
+        for ingredients in ingredient_lists:
+            offsets.append(len(indices))
+            tokens = [token.strip().lower() for token in ingredients.split(',')]
+            tokens = [token for token in tokens if token]
+
+            if tokens:
+                indices.extend(self.indices.get(token, self.unknown_index) for token in tokens)
+            else:
+                indices.append(self.unknown_index)
+
+        if not offsets:
+            return numpy.zeros((0, len(SKIN_TYPES)), dtype=numpy.int32)
+
+        return numpy.add.reduceat(self.scores[numpy.array(indices)], numpy.array(offsets), axis=0)
+
+
+def iter_json_array(file, read_size=READ_SIZE) -> 'iterator':
+    """JSON 배열 파일을 통째로 읽지 않고 원소를 하나씩 돌려줌
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    is_started = False
+    is_eof = False
+
+    while True:
+        # 공백과 구분자를 건너뜀
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+
+        if position < len(buffer):
+            if not is_started:
+                if buffer[position] != '[':
+                    raise ValueError('JSON array is expected')
+
+                is_started = True
+                position += 1
+                continue
+
+            if buffer[position] == ']':
+                return
+
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if is_eof:
+                    raise
+            else:
+                # 버퍼 끝에서 끝난 숫자 등은 뒤가 더 있을 수 있으므로 다음 조각을 읽은 뒤 다시 해석한다
+                if end < len(buffer) or is_eof:
+                    yield value
+                    position = end
+                    continue
+        elif is_eof:
+            raise ValueError('unexpected end of JSON array')
+
+        chunk = file.read(read_size)
+        is_eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def load_ingredient_ratings(file) -> 'IngredientRatings':
+    return IngredientRatings(iter_json_array(file))
+
+
+def ingest_items(records, ratings, batch_size=INGEST_BATCH_SIZE) -> int:
+    """상품 레코드를 batch_size 개씩 점수를 계산해 한 트랜잭션 안에서 넣거나 갱신. 넣은 상품 수를 반환
+    """
+    assert isinstance(records, collections.abc.Iterable)
+    assert isinstance(ratings, IngredientRatings)
+    assert isinstance(batch_size, int)
+
+    count = 0
+
+    with transaction.atomic(using=router.db_for_write(Item)):
+        _write_ingredients(ratings)
+
+        batch = []
+        for record in records:
+            batch.append(record)
+
+            if len(batch) == batch_size:
+                _write_items(batch, ratings)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            _write_items(batch, ratings)
+            count += len(batch)
+
+    bump_catalog_version()
+
+    return count
+
+
+def update_ingredient_rating(name, rating, batch_size=INGEST_BATCH_SIZE) -> '[int]':
+    """성분 하나의 평가를 바꾸고 그 성분이 든 상품 점수에 차이만큼만 더함. 점수가 바뀐 상품 id 를 반환
+
+    rating 은 피부 타입 -> 'O', 'X', '' 이며 빠진 피부 타입은 그대로 둔다. 성분 평가가 하나도 저장되어 있지 않으면
+    지금 점수가 어떤 평가로 계산됐는지 알 수 없으므로 ValueError
+    """
+    assert isinstance(name, str)
+    assert isinstance(rating, collections.abc.Mapping)
+    assert set(rating) <= set(SKIN_TYPES)
+
+    name = name.strip().lower()
+    item_ids = []
+
+    with transaction.atomic(using=router.db_for_write(Item)):
+        _check_ratings_stored()
+
+        try:
+            ingredient = Ingredient.objects.select_for_update().get(name=name)
+        except Ingredient.DoesNotExist:
+            # 모르는 성분은 지금까지 0 점으로 계산돼 있었다
+            ingredient = Ingredient(name=name)
+
+        deltas = {}
+        for skin_type, mark in rating.items():
+            score = RATING_TO_SCORE[mark or '']
+            deltas[skin_type] = score - getattr(ingredient, skin_type)
+            setattr(ingredient, skin_type, score)
+
+        ingredient.save()
+
+        deltas = {skin_type: delta for skin_type, delta in deltas.items() if delta}
+        if not deltas:
+            return item_ids
+
+        # 같은 성분이 두 번 든 상품은 두 배를 더해야 하므로 등장 횟수 별로 나눠 갱신
+        count_to_item_ids = collections.defaultdict(list)
+        for item_id, count in ItemToIngredient.objects.filter(ingredient=name).values_list('item_id', 'count'):
+            count_to_item_ids[count].append(item_id)
+
+        for count, ids in count_to_item_ids.items():
+            updates = {
+                SKIN_TYPE_TO_SCORE_FIELDS[skin_type]: F(SKIN_TYPE_TO_SCORE_FIELDS[skin_type]) + delta * count
+                for skin_type, delta in deltas.items()}
+
+            for start in range(0, len(ids), batch_size):
+                Item.objects.filter(id__in=ids[start:start + batch_size]).update(**updates)
+
+            item_ids.extend(ids)
+
+    if item_ids:
+        bump_catalog_version(item_ids)
+
+    return item_ids
+
+
+def iter_csv_records(lines) -> 'iterator':
+    """머리글이 있는 CSV 를 한 줄씩 (줄 번호, 레코드) 로 돌려줌. 빈 칸은 바꾸지 않는 필드다
+    """
+    assert isinstance(lines, collections.abc.Iterable)
+
+    reader = csv.DictReader(lines)
+    if reader.fieldnames is None or 'id' not in reader.fieldnames:
+        raise ValueError('line 1: id column must be exist')
+
+    for record in reader:
+        if None in record:
+            raise ValueError('line {}: too many columns'.format(reader.line_num))
+
+        yield reader.line_num, {key: value for key, value in record.items() if value not in ('', None)}
+
+
+def iter_ndjson_records(lines) -> 'iterator':
+    """한 줄에 JSON 객체 하나인 NDJSON 을 (줄 번호, 레코드) 로 돌려줌. 빈 줄은 건너뛴다
+    """
+    assert isinstance(lines, collections.abc.Iterable)
+
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise ValueError('line {}: JSON is wrong'.format(line_number)) from error
+
+        if not isinstance(record, dict):
+            raise ValueError('line {}: JSON object is expected'.format(line_number))
+
+        yield line_number, record
+
+
+def clean_update(record) -> '{str: object}':
+    """대량 갱신 레코드 하나를 검사해 모델 값으로 바꿈. 잘못된 값이면 ValueError
+    """
+    assert isinstance(record, collections.abc.Mapping)
+
+    if 'id' not in record:
+        raise ValueError('id field must be exist')
+
+    result = {'id': _to_int(record['id'], 'id')}
+
+    for field, value in record.items():
+        if field == 'id':
+            continue
+        elif field not in UPDATE_FIELDS:
+            raise ValueError('{} is unknown field'.format(field))
+        elif field in ('price', 'monthlySales'):
+            value = _to_int(value, field)
+            if value < 0:
+                raise ValueError('{} is wrong'.format(field))
+        elif not isinstance(value, str):
+            raise ValueError('{} is wrong'.format(field))
+        elif field == 'gender' and value not in GENDERS:
+            raise ValueError('gender is wrong')
+        elif field == 'category':
+            # 목록 조회가 분류를 소문자로 찾는다
+            value = value.lower()
+
+        max_length = Item._meta.get_field(field).max_length
+        if isinstance(value, str) and max_length is not None and len(value) > max_length:
+            raise ValueError('{} is too long'.format(field))
+
+        result[field] = value
+
+    return result
+
+
+def update_items(records, batch_size=INGEST_BATCH_SIZE) -> '(int, int)':
+    """(줄 번호, 레코드) 를 batch_size 개씩 검사해 한 트랜잭션 안에서 바뀐 필드만 갱신. (레코드 수, 바뀐 상품 수) 를 반환
+
+    성분이 바뀐 상품만 저장된 성분 평가로 점수와 역색인을 다시 만든다. 잘못된 레코드가 있으면 모두 되돌리고
+    줄 번호가 붙은 ValueError 를 낸다
+    """
+    assert isinstance(records, collections.abc.Iterable)
+    assert isinstance(batch_size, int)
+
+    count = 0
+    changed_count = 0
+    changed_ids = []
+
+    with transaction.atomic(using=router.db_for_write(Item)):
+        for batch in _iter_clean_batches(records, batch_size):
+            item_ids = _update_items(batch)
+            count += len(batch)
+            changed_count += len(item_ids)
+
+            if changed_ids is not None:
+                changed_ids.extend(item_ids)
+                if len(changed_ids) > MAX_CHANGED_ITEM_IDS:
+                    changed_ids = None
+
+    if changed_count:
+        bump_catalog_version(changed_ids)
+
+    return count, changed_count
+
+
+def build_item(record, scores) -> 'Item':
+    assert isinstance(record, collections.abc.Mapping)
+
+    oily_score, dry_score, sensitive_score = (int(score) for score in scores)
+
+    return Item(
+        id=int(record['id']),
+        imageId=record.get('imageId'),
+        name=record['name'],
+        price=int(record['price']),
+        gender=record.get('gender') or 'all',
+        # 목록 조회가 분류를 소문자로 찾는다
+        category=(record.get('category') or 'etc').lower(),
+        ingredients=record.get('ingredients') or '',
+        monthlySales=int(record.get('monthlySales') or 0),
+        oilyScore=oily_score,
+        dryScore=dry_score,
+        sensitiveScore=sensitive_score,
+    )
+
+
+def get_peak_rss() -> float:
+    """이 프로세스의 최대 RSS(MiB). 적재 명령이 결과와 함께 출력한다
+    """
+    # 리눅스에서 ru_maxrss 는 KiB 단위
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _iter_clean_batches(records, batch_size) -> 'iterator':
+    batch = []
+    for line_number, record in records:
+        try:
+            batch.append((line_number, clean_update(record)))
+        except ValueError as error:
+            raise ValueError('line {}: {}'.format(line_number, error)) from error
+
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _update_items(batch) -> '{int}':
+    """검사한 레코드들을 지금 값과 비교해 바뀐 필드만 갱신. 바뀐 상품 id 를 반환
+    """
+    # 같은 상품이 여러 번 나오면 뒤의 값이 이긴다
+    updates = collections.OrderedDict()
+    line_numbers = {}
+    for line_number, record in batch:
+        item_id = record['id']
+        updates.setdefault(item_id, {}).update(record)
+        line_numbers.setdefault(item_id, line_number)
+
+    fields = ('id',) + UPDATE_FIELDS + tuple(SKIN_TYPE_TO_SCORE_FIELDS.values())
+    entries = Item.objects.select_for_update().filter(id__in=list(updates)).values_list(*fields)
+    current = {entry[0]: dict(zip(fields, entry)) for entry in entries}
+
+    for item_id in updates:
+        if item_id not in current:
+            raise ValueError('line {}: item {} is not exists'.format(line_numbers[item_id], item_id))
+
+    changes = {}
+    for item_id, record in updates.items():
+        item_changes = {field: value for field, value in record.items() if current[item_id][field] != value}
+        if item_changes:
+            changes[item_id] = item_changes
+
+    # 점수는 성분에만 달려 있으므로 성분이 바뀐 상품만 다시 계산한다
+    ingredient_ids = [item_id for item_id, item_changes in changes.items() if 'ingredients' in item_changes]
+    if ingredient_ids:
+        _check_ratings_stored()
+
+        ingredient_lists = [changes[item_id]['ingredients'] for item_id in ingredient_ids]
+        ratings = _load_ratings(ingredient_lists)
+
+        for item_id, item_scores in zip(ingredient_ids, ratings.score(ingredient_lists).tolist()):
+            for skin_type, score in zip(SKIN_TYPES, item_scores):
+                field = SKIN_TYPE_TO_SCORE_FIELDS[skin_type]
+                if current[item_id][field] != score:
+                    changes[item_id][field] = score
+
+    # bulk_update 의 CASE 식은 컴파일과 실행 모두 묶음 크기에 비례해 느려지므로 바뀐 필드 조합 별로 executemany 한다
+    field_sets = collections.defaultdict(list)
+    for item_id, item_changes in changes.items():
+        fields = tuple(sorted(item_changes))
+        field_sets[fields].append(tuple(item_changes[field] for field in fields) + (item_id,))
+
+    for fields, rows in field_sets.items():
+        _update_rows(Item, fields, rows)
+
+    # 시그널이 없으므로 역색인을 직접 다시 만든다
+    if ingredient_ids:
+        ItemToIngredient.objects.filter(item_id__in=ingredient_ids).delete()
+
+        rows = []
+        for item_id in ingredient_ids:
+            for ingredient, count in count_ingredients(changes[item_id]['ingredients']).items():
+                rows.append((item_id, ingredient, count))
+
+        _insert_rows(ItemToIngredient, ('item', 'ingredient', 'count'), rows)
+
+    return set(changes)
+
+
+def _check_ratings_stored() -> None:
+    # loaddata 처럼 상품만 넣은 DB 에서 모든 성분을 0 점으로 보면 점수가 틀어진다
+    if not Ingredient.objects.exists() and Item.objects.exists():
+        raise ValueError('ingredient ratings are not stored. run ingest_catalog first')
+
+
+def _load_ratings(ingredient_lists) -> 'IngredientRatings':
+    """ingredient_lists 에 나오는 성분의 저장된 평가. 평가가 없는 성분은 0 점이다
+    """
+    names = set()
+    for ingredients in ingredient_lists:
+        names.update(count_ingredients(ingredients))
+
+    records = []
+    names = sorted(names)
+    for start in range(0, len(names), INGEST_BATCH_SIZE):
+        entries = Ingredient.objects.filter(name__in=names[start:start + INGEST_BATCH_SIZE])
+        for entry in entries.values_list('name', *SKIN_TYPES):
+            record = {'name': entry[0]}
+            record.update(zip(SKIN_TYPES, (SCORE_TO_RATING[score] for score in entry[1:])))
+            records.append(record)
+
+    return IngredientRatings(records)
+
+
+def _to_int(value, field) -> int:
+    # JSON 의 true/false 와 소수는 받지 않는다. 번들 데이터처럼 숫자 문자열은 받는다
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            pass
+
+    raise ValueError('{} is wrong'.format(field))
+
+
+def _write_ingredients(ratings) -> None:
+    rows = [(name,) + tuple(int(score) for score in ratings.scores[index]) for name, index in ratings.indices.items()]
+
+    existing_names = set()
+    for start in range(0, len(rows), INGEST_BATCH_SIZE):
+        names = [row[0] for row in rows[start:start + INGEST_BATCH_SIZE]]
+        existing_names.update(Ingredient.objects.filter(name__in=names).values_list('name', flat=True))
+
+    _insert_rows(Ingredient, ('name',) + SKIN_TYPES, [row for row in rows if row[0] not in existing_names])
+
+    old_ingredients = [Ingredient(*row) for row in rows if row[0] in existing_names]
+    if old_ingredients:
+        Ingredient.objects.bulk_update(old_ingredients, SKIN_TYPES)
+
+
+def _write_items(records, ratings) -> None:
+    scores = ratings.score([record.get('ingredients') or '' for record in records])
+    items = [build_item(record, item_scores) for record, item_scores in zip(records, scores)]
+
+    existing_ids = set(Item.objects.filter(id__in=[item.id for item in items]).values_list('id', flat=True))
+    new_items = [item for item in items if item.id not in existing_ids]
+    old_items = [item for item in items if item.id in existing_ids]
+
+    # 새 상품은 ORM 인스턴스 처리 비용 없이 executemany 로 넣는다
+    rows = [tuple(getattr(item, field) for field in ITEM_FIELDS) for item in new_items]
+    _insert_rows(Item, ITEM_FIELDS, rows)
+
+    if old_items:
+        Item.objects.bulk_update(old_items, ITEM_FIELDS[1:])
+        ItemToIngredient.objects.filter(item_id__in=existing_ids).delete()
+
+    # 시그널이 없으므로 역색인을 직접 만든다
+    rows = []
+    for item in items:
+        for ingredient, count in count_ingredients(item.ingredients).items():
+            rows.append((item.id, ingredient, count))
+
+    _insert_rows(ItemToIngredient, ('item', 'ingredient', 'count'), rows)
+
+
+def _insert_rows(model, fields, rows) -> None:
+    if not rows:
+        return
+
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(model._meta.get_field(field).column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(quote_name(model._meta.db_table), columns, placeholders)
+
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _update_rows(model, fields, rows) -> None:
+    """rows 의 각 행은 fields 값 뒤에 기본 키가 붙은 튜플
+    """
+    if not rows:
+        return
+
+    connection = connections[router.db_for_write(model)]
+    quote_name = connection.ops.quote_name
+    assignments = ', '.join('{} = %s'.format(quote_name(model._meta.get_field(field).column)) for field in fields)
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote_name(model._meta.db_table), assignments, quote_name(model._meta.pk.column))
+
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
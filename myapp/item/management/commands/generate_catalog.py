@@ -0,0 +1,51 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from myapp.item.ingest import INGEST_BATCH_SIZE, IngredientRatings, get_peak_rss, ingest_items
+from myapp.item.synthetic import CATEGORIES, generate_ingredients, generate_items, write_json_array
+
+
+class Command(BaseCommand):
+    help = 'etc/item-data.json, etc/ingredient-data.json 과 같은 형식의 합성 카탈로그를 만들어 파일이나 데이터베이스에 넣습니다'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--items', type=int, required=True)
+        parser.add_argument('--ingredients', type=int, required=True)
+        parser.add_argument('--categories', type=int, default=len(CATEGORIES))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+
+        # call_command 가 필수 상호 배타 그룹을 처리하지 못하므로 handle 에서 확인한다
+        destination = parser.add_mutually_exclusive_group()
+        destination.add_argument('--output', help='item-data.json 과 ingredient-data.json 을 쓸 디렉터리')
+        destination.add_argument('--database', action='store_true', help='ingest_catalog 와 같은 방식으로 바로 적재')
+
+    def handle(self, *args, **options) -> None:
+        if options['output'] is None and not options['database']:
+            raise CommandError('one of --output, --database is required')
+
+        start = time.perf_counter()
+
+        ingredients = generate_ingredients(options['ingredients'], options['seed'])
+        items = generate_items(
+            options['items'],
+            [ingredient['name'] for ingredient in ingredients],
+            options['categories'],
+            options['seed'])
+
+        if options['database']:
+            count = ingest_items(items, IngredientRatings(ingredients), options['batch_size'])
+        else:
+            os.makedirs(options['output'], exist_ok=True)
+
+            with open(os.path.join(options['output'], 'ingredient-data.json'), 'w', encoding='utf-8') as file:
+                write_json_array(file, ingredients)
+
+            with open(os.path.join(options['output'], 'item-data.json'), 'w', encoding='utf-8') as file:
+                count = write_json_array(file, items)
+
+        elapsed = time.perf_counter() - start
+        peak_rss = get_peak_rss()
+
+        self.stdout.write('generated {} items, {} ingredients in {:.2f}s, peak RSS {:.1f} MiB'.format(
+            count, len(ingredients), elapsed, peak_rss))
@@ -0,0 +1,33 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from myapp.item.ingest import INGEST_BATCH_SIZE, get_peak_rss, ingest_items, iter_json_array, \
+    load_ingredient_ratings
+
+
+DATA_DIR = os.path.join(os.path.dirname(settings.BASE_DIR), 'etc')
+
+
+class Command(BaseCommand):
+    help = '상품/성분 JSON 파일을 스트리밍으로 읽어 피부 타입 별 점수를 계산해 카탈로그에 넣습니다'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--items', default=os.path.join(DATA_DIR, 'item-data.json'))
+        parser.add_argument('--ingredients', default=os.path.join(DATA_DIR, 'ingredient-data.json'))
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+
+    def handle(self, *args, **options) -> None:
+        start = time.perf_counter()
+
+        with open(options['ingredients'], encoding='utf-8') as file:
+            ratings = load_ingredient_ratings(file)
+
+        with open(options['items'], encoding='utf-8') as file:
+            count = ingest_items(iter_json_array(file), ratings, options['batch_size'])
+
+        elapsed = time.perf_counter() - start
+        peak_rss = get_peak_rss()
+
+        self.stdout.write('ingested {} items, {} ingredients in {:.2f}s, peak RSS {:.1f} MiB'.format(
+            count, len(ratings.indices), elapsed, peak_rss))
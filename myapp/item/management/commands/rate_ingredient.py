@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from myapp.item.fields import SKIN_TYPES
+from myapp.item.ingest import RATING_TO_SCORE, update_ingredient_rating
+
+
+class Command(BaseCommand):
+    help = '성분 하나의 피부 타입 별 O/X 평가를 바꾸고 그 성분이 든 상품 점수만 다시 계산합니다'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('name')
+        for skin_type in SKIN_TYPES:
+            # 빈 문자열은 평가 없음. 주지 않은 피부 타입은 그대로 둔다
+            parser.add_argument('--' + skin_type, choices=sorted(RATING_TO_SCORE))
+
+    def handle(self, *args, **options) -> None:
+        rating = {skin_type: options[skin_type] for skin_type in SKIN_TYPES if options[skin_type] is not None}
+        if not rating:
+            raise CommandError('at least one of --oily, --dry, --sensitive is required')
+
+        try:
+            item_ids = update_ingredient_rating(options['name'], rating)
+        except ValueError as error:
+            raise CommandError(str(error)) from error
+
+        self.stdout.write('updated {} items'.format(len(item_ids)))
@@ -0,0 +1,42 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from myapp.item.ingest import INGEST_BATCH_SIZE, get_peak_rss, iter_csv_records, iter_ndjson_records, update_items
+
+
+EXTENSION_TO_READER = {
+    '.csv': iter_csv_records,
+    '.ndjson': iter_ndjson_records,
+    '.jsonl': iter_ndjson_records,
+}
+
+
+class Command(BaseCommand):
+    help = 'CSV/NDJSON 파일을 스트리밍으로 읽어 상품의 바뀐 필드만 갱신합니다. 성분이 바뀐 상품만 점수를 다시 계산합니다'
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('file')
+        parser.add_argument('--format', choices=('csv', 'ndjson'), help='없으면 파일 확장자로 정한다')
+        parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+
+    def handle(self, *args, **options) -> None:
+        if options['format'] is None:
+            reader = EXTENSION_TO_READER.get(os.path.splitext(options['file'])[1].lower())
+            if reader is None:
+                raise CommandError('--format must be given')
+        else:
+            reader = EXTENSION_TO_READER['.' + options['format']]
+
+        start = time.perf_counter()
+
+        with open(options['file'], encoding='utf-8', newline='') as file:
+            try:
+                count, changed_count = update_items(reader(file), options['batch_size'])
+            except ValueError as error:
+                raise CommandError(str(error)) from error
+
+        elapsed = time.perf_counter() - start
+        peak_rss = get_peak_rss()
+
+        self.stdout.write('updated {} of {} rows in {:.2f}s, peak RSS {:.1f} MiB'.format(
+            changed_count, count, elapsed, peak_rss))
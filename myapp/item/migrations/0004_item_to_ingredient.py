@@ -0,0 +1,47 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:18
+
+from django.db import migrations, models
+import collections
+import django.db.models.deletion
+
+
+def build_ingredient_index(apps, schema_editor):
+    Item = apps.get_model('item', 'Item')
+    ItemToIngredient = apps.get_model('item', 'ItemToIngredient')
+
+    entries = []
+    for item in Item.objects.only('id', 'ingredients').iterator():
+        tokens = (token.strip().lower() for token in item.ingredients.split(','))
+        counts = collections.Counter(token for token in tokens if token)
+
+        for ingredient, count in counts.items():
+            entries.append(ItemToIngredient(item_id=item.id, ingredient=ingredient, count=count))
+
+        if len(entries) >= 1000:
+            ItemToIngredient.objects.bulk_create(entries)
+            entries = []
+
+    ItemToIngredient.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item', '0003_auto_20200124_0123'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemToIngredient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ingredient', models.CharField(max_length=100)),
+                ('count', models.PositiveSmallIntegerField(default=1)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='item.Item', verbose_name='itemID')),
+            ],
+            options={
+                'unique_together': {('ingredient', 'item')},
+            },
+        ),
+        migrations.RunPython(build_ingredient_index, migrations.RunPython.noop),
+    ]
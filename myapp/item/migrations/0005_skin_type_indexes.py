@@ -0,0 +1,37 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item', '0004_item_to_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', '-oilyScore', 'price', 'id'], name='item_category_oily_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', '-dryScore', 'price', 'id'], name='item_category_dry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', '-sensitiveScore', 'price', 'id'], name='item_category_sensitive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-oilyScore', 'price', 'id'], name='item_oily_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-dryScore', 'price', 'id'], name='item_dry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['-sensitiveScore', 'price', 'id'], name='item_sensitive_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.4 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item', '0005_skin_type_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('oily', models.SmallIntegerField(default=0)),
+                ('dry', models.SmallIntegerField(default=0)),
+                ('sensitive', models.SmallIntegerField(default=0)),
+            ],
+        ),
+    ]
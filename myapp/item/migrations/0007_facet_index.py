@@ -0,0 +1,17 @@
+# Generated by Django 2.2.4 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item', '0006_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['category', 'gender'], name='item_category_gender_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.2.4 on 2026-10-18 13:05
+
+import json
+import os
+from django.conf import settings
+from django.db import migrations
+
+
+RATING_TO_SCORE = {'O': 1, 'X': -1, '': 0}
+
+
+def load_ingredient_ratings(apps, schema_editor):
+    # 이미 상품이 있는 DB 의 점수는 번들 성분 평가로 계산되어 있다. 평가 차이로 점수를 고치려면 그 평가가 있어야 한다
+    Ingredient = apps.get_model('item', 'Ingredient')
+    Item = apps.get_model('item', 'Item')
+    if Ingredient.objects.exists() or not Item.objects.exists():
+        return
+
+    path = os.path.join(os.path.dirname(settings.BASE_DIR), 'etc', 'ingredient-data.json')
+    with open(path, encoding='utf-8') as file:
+        records = json.load(file)
+
+    entries = [
+        Ingredient(
+            name=record['name'].strip().lower(),
+            oily=RATING_TO_SCORE[record['oily'] or ''],
+            dry=RATING_TO_SCORE[record['dry'] or ''],
+            sensitive=RATING_TO_SCORE[record['sensitive'] or ''])
+        for record in records]
+    Ingredient.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('item', '0008_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(load_ingredient_ratings, migrations.RunPython.noop),
+    ]
@@ -14,4 +14,50 @@ class Item(models.Model):
     monthlySales = models.IntegerField(default=0)
     oilyScore = models.SmallIntegerField(default=0)
     dryScore = models.SmallIntegerField(default=0)
-    sensitiveScore = models.SmallIntegerField(default=0)
\ No newline at end of file
+    sensitiveScore = models.SmallIntegerField(default=0)
+
+    class Meta:
+        # 피부 타입 별 정렬(점수 내림차순, 가격, id)을 인덱스 순서대로 읽어 filesort 를 피한다
+        indexes = [
+            models.Index(fields=['category', '-oilyScore', 'price', 'id'], name='item_category_oily_idx'),
+            models.Index(fields=['category', '-dryScore', 'price', 'id'], name='item_category_dry_idx'),
+            models.Index(fields=['category', '-sensitiveScore', 'price', 'id'], name='item_category_sensitive_idx'),
+            models.Index(fields=['-oilyScore', 'price', 'id'], name='item_oily_idx'),
+            models.Index(fields=['-dryScore', 'price', 'id'], name='item_dry_idx'),
+            models.Index(fields=['-sensitiveScore', 'price', 'id'], name='item_sensitive_idx'),
+            # 패싯 집계(분류, 성별 별 개수)를 테이블 대신 인덱스만 읽어 구한다
+            models.Index(fields=['category', 'gender'], name='item_category_gender_idx'),
+        ]
+
+
+class Ingredient(models.Model):
+    """성분의 피부 타입 별 평가. O 는 1, X 는 -1, 없으면 0
+
+    상품 점수는 이 값을 성분 수만큼 더한 것이다
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    oily = models.SmallIntegerField(default=0)
+    dry = models.SmallIntegerField(default=0)
+    sensitive = models.SmallIntegerField(default=0)
+
+
+class ItemToIngredient(models.Model):
+    """성분 -> 상품 역색인
+
+    Item.ingredients 를 정규화한 토큰 하나당 한 행. (ingredient, item) 복합 인덱스로 성분별 상품 목록을 바로 찾는다
+    """
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, verbose_name='itemID')
+    ingredient = models.CharField(max_length=100)
+    count = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = (('ingredient', 'item'),)
+
+
+class CatalogVersion(models.Model):
+    """카탈로그 버전과 마지막으로 바뀐 시각(epoch 초). 한 행만 둔다
+
+    모든 프로세스가 이 행을 읽어 카탈로그로부터 만든 캐시가 유효한지 확인한다
+    """
+    version = models.BigIntegerField(default=0)
+    modified = models.FloatField(default=0)
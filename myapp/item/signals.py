@@ -0,0 +1,25 @@
+import functools
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from myapp.item.catalog import bump_catalog_version, rebuild_ingredient_index
+from myapp.item.models import Item
+
+
+@receiver(post_save, sender=Item)
+def _update_ingredient_index(sender, instance, **kwargs) -> None:
+    # loaddata 의 raw 저장도 여기를 거치므로 시드 단계에서 색인이 채워진다
+    rebuild_ingredient_index((instance,))
+    _bump_catalog_version(instance.id)
+
+
+@receiver(post_delete, sender=Item)
+def _remove_item(sender, instance, **kwargs) -> None:
+    # 역색인은 CASCADE 로 함께 지워진다
+    _bump_catalog_version(instance.id)
+
+
+def _bump_catalog_version(item_id) -> None:
+    # 커밋 전에 다른 연결이 예전 데이터로 새 버전의 캐시를 채울 수 있으므로 커밋 뒤에 한 번 더 올린다
+    bump_catalog_version((item_id,))
+    transaction.on_commit(functools.partial(bump_catalog_version, (item_id,)))
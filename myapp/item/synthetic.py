@@ -0,0 +1,151 @@
+import collections
+import json
+import uuid
+import numpy
+from myapp.item.fields import SKIN_TYPES
+
+
+# 번들 데이터의 분류. 더 많이 만들면 EXTRA_CATEGORIES, 그 뒤로는 번호를 붙인다
+CATEGORIES = ('skincare', 'maskpack', 'suncare', 'basemakeup')
+EXTRA_CATEGORIES = ('cleansing', 'lipmakeup', 'eyemakeup', 'haircare', 'bodycare', 'fragrance', 'nailcare')
+GENDERS = ('all', 'female', 'male')
+RATINGS = ('O', 'X', '')
+MIN_INGREDIENT_COUNT = 3
+MAX_INGREDIENT_COUNT = 8
+# 순위 r 인 성분이 쓰일 확률은 1 / r ** INGREDIENT_POPULARITY_EXPONENT 에 비례
+INGREDIENT_POPULARITY_EXPONENT = 1.0
+CATEGORY_SIZE_EXPONENT = 0.8
+GENERATE_BATCH_SIZE = 10000
+SYLLABLES = (
+    'ba', 'ce', 'di', 'fo', 'gu', 'ha', 'ke', 'li', 'mo', 'nu',
+    'pa', 're', 'si', 'to', 'vu', 'xa', 'ze', 'lan', 'mer', 'tri',
+)
+SUFFIXES = ('ol', 'ine', 'ate', 'ide', 'ium', 'in', 'ene', 'ose')
+BRANDS = ('리더스', '라운드랩', '이니스프리', '닥터자르트', '마몽드', '아이오페', '설화수', '미샤', '토니모리', '에뛰드')
+ADJECTIVES = ('링클', '수분', '진정', '브라이트닝', '데일리', '프레시', '딥', '마일드', '시카', '비타')
+NOUNS = ('콜라겐 마스크', '선크림', '토너', '세럼', '크림', '쿠션', '에센스', '클렌징폼', '앰플', '로션')
+
+
+def ingredient_name(index) -> str:
+    """index 마다 서로 다른 성분 이름. 음절을 자리 수로 쓰는 bijective 진법이라 겹치지 않는다
+    """
+    assert isinstance(index, int)
+
+    suffix = SUFFIXES[index % len(SUFFIXES)]
+    number = index // len(SUFFIXES) + 1
+    syllables = []
+    while number:
+        number, digit = divmod(number - 1, len(SYLLABLES))
+        syllables.append(SYLLABLES[digit])
+
+    return ''.join(reversed(syllables)) + suffix
+
+
+def category_names(count) -> '[str]':
+    assert isinstance(count, int)
+
+    names = CATEGORIES + EXTRA_CATEGORIES
+    names = names + tuple('category{}'.format(index) for index in range(len(names), count))
+
+    return list(names[:count])
+
+
+def zipf_probabilities(count, exponent) -> 'numpy.ndarray':
+    """순위 별 선택 확률. 앞 순위일수록 크다
+    """
+    assert isinstance(count, int)
+
+    weights = 1 / numpy.arange(1, count + 1, dtype=numpy.float64) ** exponent
+
+    return weights / weights.sum()
+
+
+def generate_ingredients(count, seed=0) -> '[{str: str}]':
+    """ingredient-data.json 형식의 성분 목록. 피부 타입 별 O/X/'' 는 고르게 나눈다
+    """
+    assert isinstance(count, int)
+
+    random = numpy.random.default_rng(seed)
+    ratings = random.integers(0, len(RATINGS), size=(count, len(SKIN_TYPES))).tolist()
+
+    records = []
+    for index, indices in enumerate(ratings):
+        record = {'name': ingredient_name(index)}
+        record.update(zip(SKIN_TYPES, (RATINGS[rating] for rating in indices)))
+        records.append(record)
+
+    return records
+
+
+def generate_items(count, ingredient_names, category_count=len(CATEGORIES), seed=0,
+                   batch_size=GENERATE_BATCH_SIZE) -> 'iterator':
+    """item-data.json 형식의 상품을 하나씩 만듦. 메모리에는 batch_size 개만 올린다
+
+    성분은 Zipf 분포의 인기 순위로 고르고(한 상품에 같은 성분이 두 번 나올 수 있다), 분류 크기에도 차이를 둔다
+    """
+    assert isinstance(count, int)
+    assert isinstance(ingredient_names, collections.abc.Sequence)
+    assert isinstance(category_count, int)
+
+    random = numpy.random.default_rng(seed)
+    # 인기 순위를 이름 순서와 무관하게 섞는다
+    popularity = random.permutation(len(ingredient_names))
+    ingredient_probabilities = zipf_probabilities(len(ingredient_names), INGREDIENT_POPULARITY_EXPONENT)
+    categories = category_names(category_count)
+    category_probabilities = zipf_probabilities(category_count, CATEGORY_SIZE_EXPONENT)
+    category_probabilities = category_probabilities[random.permutation(category_count)]
+
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+
+        ingredient_counts = random.integers(MIN_INGREDIENT_COUNT, MAX_INGREDIENT_COUNT + 1, size=size)
+        ranks = random.choice(len(ingredient_names), size=int(ingredient_counts.sum()), p=ingredient_probabilities)
+        picks = popularity[ranks]
+        offsets = numpy.concatenate(([0], numpy.cumsum(ingredient_counts))).tolist()
+        picks = picks.tolist()
+
+        columns = zip(
+            random.choice(category_count, size=size, p=category_probabilities).tolist(),
+            random.integers(0, len(GENDERS), size=size).tolist(),
+            (random.integers(100, 1000, size=size) * 10).tolist(),
+            random.integers(0, 10000, size=size).tolist(),
+            random.integers(0, len(BRANDS), size=size).tolist(),
+            random.integers(0, len(ADJECTIVES), size=size).tolist(),
+            random.integers(0, len(NOUNS), size=size).tolist(),
+            numpy.frombuffer(random.bytes(16 * size), dtype='>u8').reshape(size, 2).tolist(),
+        )
+
+        for index, (category, gender, price, sales, brand, adjective, noun, bits) in enumerate(columns):
+            ingredients = (ingredient_names[pick] for pick in picks[offsets[index]:offsets[index + 1]])
+
+            yield {
+                'id': start + index + 1,
+                'imageId': str(uuid.UUID(int=bits[0] << 64 | bits[1], version=4)),
+                'name': '{} {} {}'.format(BRANDS[brand], ADJECTIVES[adjective], NOUNS[noun]),
+                # 번들 데이터처럼 가격은 문자열이다
+                'price': str(price),
+                'gender': GENDERS[gender],
+                'category': categories[category],
+                'ingredients': ','.join(ingredients),
+                'monthlySales': sales,
+            }
+
+
+def write_json_array(file, records) -> int:
+    """records 를 하나씩 JSON 배열로 씀. 쓴 개수를 반환
+    """
+    assert isinstance(records, collections.abc.Iterable)
+
+    count = 0
+    file.write('[')
+
+    for record in records:
+        if count:
+            file.write(',\n')
+
+        file.write(json.dumps(record, ensure_ascii=False))
+        count += 1
+
+    file.write(']\n')
+
+    return count
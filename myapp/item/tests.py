@@ -1,3 +1,375 @@
-from django.test import TestCase
+import collections
+import importlib
+import io
+import json
+import os
+import tempfile
+from django.apps import apps
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from myapp.item.catalog import bump_catalog_version, count_ingredients, get_catalog_modified, get_catalog_version, \
+    rebuild_full_ingredient_index, split_ingredients
+from myapp.item.ingest import IngredientRatings, iter_csv_records, iter_json_array, update_ingredient_rating, \
+    update_items
+from myapp.item.models import CatalogVersion, Ingredient, Item, ItemToIngredient
+from myapp.item.synthetic import generate_ingredients, generate_items, ingredient_name
+
+
+DATA_DIR = os.path.join(os.path.dirname(settings.BASE_DIR), 'etc')
+FIXTURE_PATH = os.path.join(settings.BASE_DIR, 'item', 'fixtures', 'items-data.json')
+
 
 # Create your tests here.
+class IngredientIndexTest(TestCase):
+    fixtures = ['items-data.json']
+
+    def tearDown(self) -> None:
+        # 테스트 끝의 롤백은 시그널이 없으므로 카탈로그 캐시를 직접 무효화
+        bump_catalog_version()
+
+    def test_splitIngredients(self) -> None:
+        self.assertEqual({'venus', 'set'}, split_ingredients('Venus, set,,'))
+        self.assertEqual(2, count_ingredients('set,Set,veil')['set'])
+
+    def test_indexBuiltFromFixture(self) -> None:
+        item = Item.objects.get(id=3)
+        ingredients = set(ItemToIngredient.objects.filter(item=item).values_list('ingredient', flat=True))
+        self.assertEqual(split_ingredients(item.ingredients), ingredients)
+
+    def test_indexFollowsSave(self) -> None:
+        item = Item.objects.get(id=3)
+        item.ingredients = 'set,Settlement'
+        item.save()
+
+        ingredients = set(ItemToIngredient.objects.filter(item=item).values_list('ingredient', flat=True))
+        self.assertEqual({'set', 'settlement'}, ingredients)
+
+    def test_rebuildFullIndex(self) -> None:
+        count = ItemToIngredient.objects.count()
+        ItemToIngredient.objects.all().delete()
+        rebuild_full_ingredient_index()
+        self.assertEqual(count, ItemToIngredient.objects.count())
+
+
+class CatalogVersionTest(TestCase):
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_sharedVersion(self) -> None:
+        version = bump_catalog_version()
+        self.assertEqual(version, get_catalog_version())
+        self.assertEqual(version, CatalogVersion.objects.get().version)
+
+        # 다른 프로세스가 올린 버전은 확인 간격이 지나야 보인다
+        CatalogVersion.objects.update(version=F('version') + 10, modified=1.0)
+        self.assertEqual(version, get_catalog_version())
+
+        with override_settings(CATALOG_VERSION_CHECK_INTERVAL=0):
+            self.assertEqual(version + 10, get_catalog_version())
+            self.assertEqual(1.0, get_catalog_modified())
+
+        self.assertEqual(version + 11, bump_catalog_version())
+
+    def test_missingRow(self) -> None:
+        version = bump_catalog_version()
+        CatalogVersion.objects.all().delete()
+
+        # 행이 지워져도 예전 번호로 돌아가지 않는다
+        with override_settings(CATALOG_VERSION_CHECK_INTERVAL=0):
+            self.assertGreater(get_catalog_version(), version)
+
+
+class IngestTest(TestCase):
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_iterJsonArray(self) -> None:
+        values = [{'id': 1, 'name': '가, "나"'}, [1, 2], 123456789, 'x', None, {}]
+        text = ' [ ' + ' ,\n'.join(json.dumps(value, ensure_ascii=False) for value in values) + ' ] '
+
+        # 읽는 조각 크기와 관계없이 같은 결과
+        for read_size in (1, 2, 7, 1024):
+            self.assertEqual(values, list(iter_json_array(io.StringIO(text), read_size)))
+
+        self.assertEqual([], list(iter_json_array(io.StringIO('[]'))))
+
+        with self.assertRaises(ValueError):
+            list(iter_json_array(io.StringIO('[{"id": 1}, {"id"')))
+
+    def test_scores(self) -> None:
+        ratings = IngredientRatings([
+            {'name': 'a', 'oily': 'O', 'dry': 'X', 'sensitive': ''},
+            {'name': 'B', 'oily': 'O', 'dry': '', 'sensitive': 'X'},
+        ])
+        scores = ratings.score(['a,b', 'a,a,unknown', '', 'b'])
+        self.assertEqual([[2, -1, -1], [2, -2, 0], [0, 0, 0], [1, 0, -1]], scores.tolist())
+
+    def test_sameAsFixture(self) -> None:
+        output = io.StringIO()
+        call_command(
+            'ingest_catalog',
+            items=os.path.join(DATA_DIR, 'item-data.json'),
+            ingredients=os.path.join(DATA_DIR, 'ingredient-data.json'),
+            batch_size=300,
+            stdout=output)
+        self.assertIn('ingested 1000 items', output.getvalue())
+
+        # 예전 변환 스크립트로 만든 fixture 와 같은 점수
+        with open(FIXTURE_PATH, encoding='utf-8') as file:
+            records = json.load(file)
+
+        items = {item.id: item for item in Item.objects.all()}
+        self.assertEqual(len(records), len(items))
+        for record in records:
+            fields = record['fields']
+            item = items[fields['id']]
+            for field, value in fields.items():
+                self.assertEqual(value, getattr(item, field), field)
+
+        item = items[3]
+        ingredients = set(ItemToIngredient.objects.filter(item=item).values_list('ingredient', flat=True))
+        self.assertEqual(split_ingredients(item.ingredients), ingredients)
+
+        # 다시 넣으면 갱신된다
+        Item.objects.filter(id=3).update(price=1)
+        call_command('ingest_catalog', stdout=output)
+        self.assertEqual(1000, Item.objects.count())
+        price = next(record['fields']['price'] for record in records if record['fields']['id'] == 3)
+        self.assertEqual(price, Item.objects.get(id=3).price)
+
+
+class RatingTest(TestCase):
+    def setUp(self) -> None:
+        call_command('ingest_catalog', stdout=io.StringIO())
+
+        with open(os.path.join(DATA_DIR, 'ingredient-data.json'), encoding='utf-8') as file:
+            self.records = json.load(file)
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_ingredientsPersisted(self) -> None:
+        self.assertEqual(len(self.records), Ingredient.objects.count())
+
+        record = self.records[0]
+        ingredient = Ingredient.objects.get(name=record['name'])
+        self.assertEqual({'O': 1, 'X': -1, '': 0}[record['oily']], ingredient.oily)
+
+    def test_sameAsFullRecomputation(self) -> None:
+        name = split_ingredients(Item.objects.get(id=3).ingredients).pop()
+        record = next(record for record in self.records if record['name'] == name)
+        rating = {
+            'oily': 'X' if record['oily'] == 'O' else 'O',
+            'sensitive': '' if record['sensitive'] else 'X',
+        }
+
+        output = io.StringIO()
+        call_command('rate_ingredient', name, oily=rating['oily'], sensitive=rating['sensitive'], stdout=output)
+        expected_count = ItemToIngredient.objects.filter(ingredient=name).count()
+        self.assertEqual('updated {} items\n'.format(expected_count), output.getvalue())
+
+        # 바뀐 평가로 전체를 다시 계산한 것과 같아야 한다
+        record.update(rating)
+        ratings = IngredientRatings(self.records)
+        items = list(Item.objects.order_by('id'))
+        scores = ratings.score([item.ingredients for item in items])
+        for item, item_scores in zip(items, scores.tolist()):
+            self.assertEqual(item_scores, [item.oilyScore, item.dryScore, item.sensitiveScore], item.id)
+
+        ingredient = Ingredient.objects.get(name=name)
+        self.assertEqual(record['dry'], {1: 'O', -1: 'X', 0: ''}[ingredient.dry])
+
+        # 같은 평가로 다시 바꾸면 아무것도 갱신하지 않는다
+        self.assertEqual([], update_ingredient_rating(name, rating))
+
+    def test_ratingsNotStored(self) -> None:
+        # loaddata 로 상품만 넣은 DB 에서는 평가 차이를 계산할 기준이 없다
+        Ingredient.objects.all().delete()
+        name = split_ingredients(Item.objects.get(id=3).ingredients).pop()
+        scores = list(Item.objects.order_by('id').values_list('oilyScore', flat=True))
+
+        with self.assertRaises(CommandError):
+            call_command('rate_ingredient', name, oily='X', stdout=io.StringIO())
+
+        with self.assertRaises(ValueError):
+            update_items(iter_csv_records(['id,ingredients\n', '3,{}\n'.format(name)]))
+
+        self.assertEqual(scores, list(Item.objects.order_by('id').values_list('oilyScore', flat=True)))
+
+    def test_loadRatingsMigration(self) -> None:
+        Ingredient.objects.all().delete()
+        migration = importlib.import_module('myapp.item.migrations.0009_ingredient_data')
+        migration.load_ingredient_ratings(apps, None)
+
+        self.assertEqual(len(self.records), Ingredient.objects.count())
+        record = self.records[-1]
+        ingredient = Ingredient.objects.get(name=record['name'])
+        self.assertEqual({'O': 1, 'X': -1, '': 0}[record['dry']], ingredient.dry)
+
+        # 채운 평가를 기준으로 차이만 더해도 전체를 다시 계산한 것과 같다
+        name = split_ingredients(Item.objects.get(id=43).ingredients).pop()
+        record = next(record for record in self.records if record['name'] == name)
+        rating = {'oily': 'X' if record['oily'] == 'O' else 'O'}
+        update_ingredient_rating(name, rating)
+
+        record.update(rating)
+        items = list(Item.objects.order_by('id'))
+        scores = IngredientRatings(self.records).score([item.ingredients for item in items])
+        for item, item_scores in zip(items, scores.tolist()):
+            self.assertEqual(item_scores, [item.oilyScore, item.dryScore, item.sensitiveScore], item.id)
+
+    def test_repeatedIngredient(self) -> None:
+        item = Item.objects.get(id=3)
+        item.ingredients = 'newingredient, NewIngredient'
+        item.save()
+        scores = (item.oilyScore, item.dryScore)
+
+        self.assertEqual([3], update_ingredient_rating('NewIngredient', {'oily': 'O', 'dry': 'X'}))
+
+        item.refresh_from_db()
+        self.assertEqual((scores[0] + 2, scores[1] - 2), (item.oilyScore, item.dryScore))
+
+
+class SyntheticTest(TestCase):
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def test_sameSchemaAsBundledData(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('generate_catalog', items=300, ingredients=50, output=directory, stdout=io.StringIO())
+
+            for file_name in ('item-data.json', 'ingredient-data.json'):
+                with open(os.path.join(DATA_DIR, file_name), encoding='utf-8') as file:
+                    expected = next(iter_json_array(file))
+                with open(os.path.join(directory, file_name), encoding='utf-8') as file:
+                    records = list(iter_json_array(file))
+
+                for record in records:
+                    self.assertEqual(set(expected), set(record), file_name)
+                    self.assertEqual({key: type(value) for key, value in expected.items()},
+                                     {key: type(value) for key, value in record.items()}, file_name)
+
+    def test_distribution(self) -> None:
+        names = [ingredient_name(index) for index in range(500)]
+        self.assertEqual(len(names), len(set(names)))
+
+        items = list(generate_items(2000, names, 6, seed=1))
+        self.assertEqual(list(range(1, 2001)), [item['id'] for item in items])
+        self.assertEqual(items, list(generate_items(2000, names, 6, seed=1)))
+        self.assertNotEqual(items, list(generate_items(2000, names, 6, seed=2)))
+
+        # 인기 성분과 큰 분류가 두드러져야 한다
+        ingredient_counts = collections.Counter(
+            ingredient for item in items for ingredient in item['ingredients'].split(','))
+        self.assertGreater(ingredient_counts.most_common(1)[0][1], 20 * len(items) * 5.5 / len(names))
+        category_counts = collections.Counter(item['category'] for item in items).most_common()
+        self.assertEqual(6, len(category_counts))
+        self.assertGreater(category_counts[0][1], 2 * category_counts[-1][1])
+
+    def test_database(self) -> None:
+        call_command('generate_catalog', items=300, ingredients=50, database=True, stdout=io.StringIO())
+
+        self.assertEqual(300, Item.objects.count())
+        self.assertEqual(50, Ingredient.objects.count())
+
+        ratings = IngredientRatings(generate_ingredients(50))
+        item = Item.objects.get(id=7)
+        scores = ratings.score([item.ingredients]).tolist()[0]
+        self.assertEqual(scores, [item.oilyScore, item.dryScore, item.sensitiveScore])
+
+
+@override_settings(CATALOG_UPDATE_TOKEN='secret')
+class BulkUpdateTest(TestCase):
+    def setUp(self) -> None:
+        call_command('ingest_catalog', stdout=io.StringIO())
+
+        with open(os.path.join(DATA_DIR, 'ingredient-data.json'), encoding='utf-8') as file:
+            self.ratings = IngredientRatings(json.load(file))
+
+    def tearDown(self) -> None:
+        bump_catalog_version()
+
+    def assertScores(self, item) -> None:
+        scores = self.ratings.score([item.ingredients]).tolist()[0]
+        self.assertEqual(scores, [item.oilyScore, item.dryScore, item.sensitiveScore], item.id)
+        self.assertEqual(dict(count_ingredients(item.ingredients)),
+                         dict(ItemToIngredient.objects.filter(item=item).values_list('ingredient', 'count')))
+
+    def test_csv(self) -> None:
+        old_item = Item.objects.get(id=5)
+        ingredients = Item.objects.get(id=9).ingredients
+        lines = [
+            'id,price,monthlySales,ingredients,category\n',
+            '3,12345,,,SkinCare\n',
+            '5,,{},"{}",\n'.format(old_item.monthlySales, ingredients),
+            '7,{},,,\n'.format(Item.objects.get(id=7).price),
+        ]
+        version = get_catalog_version()
+
+        # 7 은 같은 값이라 바뀌지 않는다
+        self.assertEqual((3, 2), update_items(iter_csv_records(lines), batch_size=2))
+        self.assertGreater(get_catalog_version(), version)
+
+        item = Item.objects.get(id=3)
+        self.assertEqual((12345, 'skincare'), (item.price, item.category))
+        self.assertScores(item)
+
+        item = Item.objects.get(id=5)
+        self.assertEqual((ingredients, old_item.name, old_item.price), (item.ingredients, item.name, item.price))
+        self.assertScores(item)
+
+    def test_invalid(self) -> None:
+        price = Item.objects.get(id=3).price
+        cases = (
+            ['id,price\n', '3,1\n', '4,x\n'],
+            ['id,price\n', '3,1\n', '4,-1\n'],
+            ['id,score\n', '3,1\n'],
+            ['id,gender\n', '3,unknown\n'],
+            ['id,price\n', '3,1\n', '100000,1\n'],
+            ['id,price\n', '3,1,2\n'],
+            ['price\n', '1\n'],
+        )
+
+        for lines in cases:
+            with self.assertRaises(ValueError, msg=lines):
+                update_items(iter_csv_records(lines), batch_size=1)
+
+            # 앞의 묶음까지 모두 되돌린다
+            self.assertEqual(price, Item.objects.get(id=3).price, lines)
+
+    def test_view(self) -> None:
+        client = Client()
+        body = '{"id": 3, "price": "777", "name": "새 이름"}\n\n{"id": 4, "monthlySales": 10}\n'
+
+        response = client.post('/items/update', body, content_type='application/x-ndjson')
+        self.assertEqual(401, response.status_code)
+
+        response = client.post('/items/update', body, content_type='application/x-ndjson',
+                               HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual({'rows': 2, 'changed': 2}, json.loads(response.content))
+        self.assertEqual((777, '새 이름'), (Item.objects.get(id=3).price, Item.objects.get(id=3).name))
+        self.assertEqual(10, Item.objects.get(id=4).monthlySales)
+
+        response = client.post('/items/update', '{"id": 3, "price": 1.5}\n', content_type='application/x-ndjson',
+                               HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(500, response.status_code)
+        self.assertIn(b'line 1', response.content)
+
+        response = client.post('/items/update', 'id,price\n3,1\n', content_type='text/plain',
+                               HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(500, response.status_code)
+
+    def test_command(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'update.csv')
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write('id,price\n3,4321\n4,4321\n')
+
+            output = io.StringIO()
+            call_command('update_catalog', path, stdout=output)
+
+        self.assertTrue(output.getvalue().startswith('updated 2 of 2 rows'))
+        self.assertEqual(4321, Item.objects.get(id=4).price)
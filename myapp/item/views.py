@@ -1,3 +1,46 @@
-from django.shortcuts import render
+import codecs
+import json
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from myapp.item.ingest import INGEST_BATCH_SIZE, iter_csv_records, iter_ndjson_records, update_items
+
+
+CONTENT_TYPE_TO_READER = {
+    'text/csv': iter_csv_records,
+    'application/x-ndjson': iter_ndjson_records,
+}
+
 
 # Create your views here.
+@csrf_exempt
+@require_POST
+def update_catalog(request) -> 'HttpResponse':
+    """본문의 CSV 나 NDJSON 으로 상품을 한꺼번에 고침. Authorization: Bearer <CATALOG_UPDATE_TOKEN> 이 필요하다
+
+    본문을 한 번에 읽지 않고 줄 단위로 읽으며 INGEST_BATCH_SIZE 개씩 검사하고 갱신한다. 하나라도 잘못되면 모두 되돌린다
+    """
+    assert isinstance(request, HttpRequest)
+
+    token = settings.CATALOG_UPDATE_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not constant_time_compare(authorization, 'Bearer ' + token):
+        return HttpResponse('token is wrong', status=401)
+
+    reader = CONTENT_TYPE_TO_READER.get(request.content_type)
+    if reader is None:
+        return HttpResponse('content type is wrong', status=500)
+
+    # request 를 순회하면 본문을 한 줄씩 읽는다
+    lines = codecs.iterdecode(request, request.encoding or 'utf-8')
+
+    try:
+        count, changed_count = update_items(reader(lines), INGEST_BATCH_SIZE)
+    except (ValueError, UnicodeDecodeError) as error:
+        return HttpResponse(str(error), status=500)
+
+    content = json.dumps({'rows': count, 'changed': changed_count})
+
+    return HttpResponse(content, content_type='application/json')
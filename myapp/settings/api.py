@@ -0,0 +1,23 @@
+"""JSON API 만 받는 프로필
+
+    $ DJANGO_SETTINGS_MODULE=myapp.settings.api gunicorn myapp.wsgi_api -c python:myapp.gunicorn_config
+
+admin 과 정적 파일은 production 프로필(myapp.wsgi)에서 따로 띄운다. 마이그레이션도 그쪽에서 한다.
+"""
+from .production import *
+
+INSTALLED_APPS = API_INSTALLED_APPS
+MIDDLEWARE = API_MIDDLEWARE
+ROOT_URLCONF = 'myapp.urls_api'
+WSGI_APPLICATION = 'myapp.wsgi_api.application'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [],
+        },
+    },
+]
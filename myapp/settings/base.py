@@ -38,11 +38,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'myapp.home',
-    'myapp.item'
+    'myapp.home.apps.HomeConfig',
+    'myapp.item.apps.ItemConfig',
 ]
 
+DATABASE_ROUTERS = ['myapp.db.ReplicaRouter']
+
 MIDDLEWARE = [
+    # 다른 미들웨어의 시간까지 재도록 맨 앞에 둔다
+    'myapp.home.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -55,6 +59,19 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'myapp.urls'
 
+# API 프로필(myapp.settings.api). JSON 뷰는 admin, 인증, 세션, 메시지, CSRF, 정적 파일을 쓰지 않는다
+API_INSTALLED_APPS = [
+    'myapp.home.apps.HomeConfig',
+    'myapp.item.apps.ItemConfig',
+]
+
+API_MIDDLEWARE = [
+    'myapp.home.metrics.MetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    # /products 를 /products/ 로 보내는 APPEND_SLASH 는 그대로 둔다
+    'django.middleware.common.CommonMiddleware',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -120,3 +137,50 @@ STATICFILES_DIRS = (
 )
 
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+
+# Catalog
+
+# 상품 전체를 워커 메모리에 올려 /products/ 를 DB 조회 없이 처리한다
+CATALOG_ENGINE_ENABLED = False
+
+# products()/product() 응답 캐시. 키에 카탈로그 버전이 들어가므로 상품이 바뀌면 자동으로 무효화된다
+CATALOG_CACHE_ENABLED = True
+
+# 워커마다 따로 갖는 LRU 의 최대 크기. 컨테이너 메모리 512 MiB 를 워커들이 나눠 쓰므로 작게 잡는다
+CATALOG_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+# CACHES 의 별칭을 주면 LRU 대신 그 캐시를 워커끼리 나눠 쓴다
+CATALOG_CACHE_ALIAS = None
+
+# 카탈로그 버전은 모든 워커와 명령이 나눠 쓰도록 DB 에 둔다. 이 초 동안은 읽은 버전을 다시 쓰므로
+# 다른 프로세스의 변경은 늦어도 이만큼 뒤에 캐시와 ETag 에 반영된다
+CATALOG_VERSION_CHECK_INTERVAL = 1.0
+
+# 카탈로그가 바뀌면 엔진, 추천 표, 점수 표, 검색 색인을 백그라운드에서 다시 만든다. 요청은 이 초까지만 기다리고
+# 그 뒤에는 이전 구조로 만든 응답을 캐시하지 않고 돌려준다
+CATALOG_REBUILD_WAIT = 0.1
+
+# 상품 별로 미리 인코딩해 둔 JSON 조각 캐시의 최대 크기(워커마다)
+CATALOG_FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+# /items/update 에 Authorization: Bearer 로 보내야 하는 값. 없으면 대량 갱신 API 를 쓸 수 없다
+CATALOG_UPDATE_TOKEN = os.environ.get('CATALOG_UPDATE_TOKEN')
+
+
+# Metrics
+
+# 요청마다 URL 패턴 별 처리 시간, 쿼리 수와 시간, 직렬화 시간, 응답 크기를 모아 /metrics 로 내보낸다
+METRICS_ENABLED = True
+
+
+# Database
+
+# 카탈로그 조회 뷰가 읽을 복제본의 DATABASES 별칭. 비어 있으면 모두 default 에서 읽는다
+DATABASE_REPLICAS = []
+
+# 카탈로그가 바뀐 뒤 이 시간(초) 동안은 복제 지연으로 예전 데이터가 캐시되지 않도록 default 에서 읽는다
+DATABASE_REPLICA_MAX_LAG = 5
+
+# 영구 연결이 살아 있는지 요청 시작 때 확인하는 최소 간격(초)
+DATABASE_HEALTH_CHECK_INTERVAL = 10
@@ -1,3 +1,4 @@
+import os
 from .base import *
 
 DEBUG = True
@@ -13,4 +14,9 @@ DATABASES = {
         'USER': 'root',
         'PASSWORD': 'konan415',
     }
-}
\ No newline at end of file
+}
+
+# LOCAL_REPLICA 를 주면 같은 데이터베이스를 다른 연결로 읽는 복제본을 흉내 내 라우팅을 확인할 수 있다
+if os.environ.get('LOCAL_REPLICA'):
+    DATABASES['replica0'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS = ['replica0']
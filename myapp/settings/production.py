@@ -8,5 +8,14 @@ DATABASES = {
         'NAME': os.environ['MYSQL_DATABASE'],
         'USER': os.environ['MYSQL_USER'],
         'PASSWORD': os.environ['MYSQL_ROOT_PASSWORD'],
+        # 요청마다 새로 연결하지 않는다. 끊긴 연결은 myapp.db.check_connections 가 걸러낸다
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 300)),
     }
-}
\ No newline at end of file
+}
+
+# 쉼표로 구분한 읽기 전용 복제본 호스트. 계정과 데이터베이스 이름은 default 와 같다
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('MYSQL_REPLICA_HOSTS', '').split(','))):
+    alias = 'replica{}'.format(index)
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host.strip(), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
\ No newline at end of file
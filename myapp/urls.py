@@ -16,10 +16,17 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from myapp.home import views
+from myapp.item import views as item_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path(r'', views.index),
-    path('products/', views.products),
-    path('product/<int:item_id>', views.product),
+    path(r'', views.index, name='index'),
+    path('products/', views.products, name='products'),
+    path('products/export', views.export_products, name='export_products'),
+    path('products/batch', views.products_batch, name='products_batch'),
+    path('product/<int:item_id>', views.product, name='product'),
+    path('search', views.search, name='search'),
+    path('metrics', views.metrics, name='metrics'),
+    path('ready', views.ready, name='ready'),
+    path('items/update', item_views.update_catalog, name='update_catalog'),
 ]
@@ -0,0 +1,16 @@
+"""API 프로필(myapp.settings.api)의 URL. admin 과 첫 화면은 없다
+"""
+from django.urls import path
+from myapp.home import views
+from myapp.item import views as item_views
+
+urlpatterns = [
+    path('products/', views.products, name='products'),
+    path('products/export', views.export_products, name='export_products'),
+    path('products/batch', views.products_batch, name='products_batch'),
+    path('product/<int:item_id>', views.product, name='product'),
+    path('search', views.search, name='search'),
+    path('metrics', views.metrics, name='metrics'),
+    path('ready', views.ready, name='ready'),
+    path('items/update', item_views.update_catalog, name='update_catalog'),
+]
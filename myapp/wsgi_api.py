@@ -0,0 +1,13 @@
+"""
+WSGI config for the API profile.
+
+Unlike myapp.wsgi it does not wrap the application with WhiteNoise, since the API serves no static files.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "myapp.settings.api")
+
+application = get_wsgi_application()